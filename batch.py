@@ -0,0 +1,48 @@
+from typing import Dict, List, Optional
+import threading
+
+def split_prompts(text: str, count: int) -> List[str]:
+    """Prompts for ``count`` images: one per line if the lines match the images, else one shared"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if count > 1 and len(lines) == count:
+        return lines
+    return [text.strip()] * count
+
+class BatchProgress:
+    """Outcome tracking for the images of one batch request
+
+    Every image is resolved exactly once, as soon as its result is known:
+    failed to upload or submit, or its task finished. Resolving the last
+    image returns the summary message for the whole batch, so the user gets
+    one report instead of a message per image.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self._errors: Dict[int, str] = {}
+        self._resolved = set()
+        self._lock = threading.Lock()
+
+    def resolve(self, index: int, error: Optional[str] = None) -> Optional[str]:
+        """Record the outcome of an image, returning the summary once all are known"""
+        with self._lock:
+            if index in self._resolved:
+                return None
+            self._resolved.add(index)
+            if error:
+                self._errors[index] = error
+            if len(self._resolved) < self.total:
+                return None
+            return self.summary()
+
+    @property
+    def failed(self) -> int:
+        return len(self._errors)
+
+    def summary(self) -> str:
+        """Message describing the results known so far"""
+        message = f"Batch finished: {len(self._resolved) - self.failed} of {self.total} videos sent"
+        if self._errors:
+            message += f", {self.failed} failed:\n" + "\n".join(
+                f"#{index + 1}: {error}" for index, error in sorted(self._errors.items()))
+        return message
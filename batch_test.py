@@ -0,0 +1,21 @@
+from .batch import BatchProgress, split_prompts
+
+def test_split_prompts():
+    assert split_prompts("wave\nsmile", 2) == ["wave", "smile"]
+    assert split_prompts("wave\n\nsmile\n", 2) == ["wave", "smile"]
+    assert split_prompts("wave\nsmile", 3) == ["wave\nsmile"] * 3
+    assert split_prompts("wave", 1) == ["wave"]
+
+def test_summary_once_every_image_is_resolved():
+    progress = BatchProgress(3)
+    assert progress.resolve(1, "Failed to upload") is None
+    assert progress.resolve(0) is None
+    # Resolving twice does not count twice
+    assert progress.resolve(0) is None
+    summary = progress.resolve(2)
+    assert summary == "Batch finished: 2 of 3 videos sent, 1 failed:\n#2: Failed to upload"
+    assert progress.resolve(2) is None
+
+def test_summary_without_failures():
+    progress = BatchProgress(1)
+    assert progress.resolve(0) == "Batch finished: 1 of 1 videos sent"
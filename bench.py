@@ -0,0 +1,291 @@
+"""Microbenchmarks of the in-process paths every message goes through
+
+Run from the chatgpt-on-wechat root so the framework modules import:
+
+    python -m plugins.image2video.bench --save      # record a baseline
+    python -m plugins.image2video.bench             # compare against it
+
+No network is involved. Each case is calibrated to run for at least
+``--min-time`` seconds per repeat and the fastest repeat is reported, which
+keeps results stable across runs on one machine. Baselines are only
+comparable on the machine that recorded them. The command exits with
+status 1 when a case got slower than the baseline by more than
+``--threshold``.
+"""
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import argparse
+import base64
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from common.log import logger
+from .hooks import HookManager, ImageView
+from .pipeline import Pipeline, PipelineContext
+from .sessions import SessionState, SessionStore
+from .tokens import TokenProvider
+
+MB = 2 ** 20
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+
+# name -> setup returning the operation to time and an optional cleanup
+CASES: Dict[str, Callable[[], Tuple[Callable[[], Any], Optional[Callable[[], None]]]]] = {}
+
+def case(name: str):
+    """Decorator registering a benchmark setup function"""
+    def decorator(setup):
+        CASES[name] = setup
+        return setup
+    return decorator
+
+def measure(fn: Callable[[], Any], repeat: int = 5, min_time: float = 0.1) -> Dict[str, float]:
+    """Time an operation
+
+    Args:
+        fn: Operation to time
+        repeat: Number of timed repeats
+        min_time: Minimum seconds per repeat, used to pick the loop count
+
+    Returns:
+        {'loops', 'best', 'median'} with times in seconds per operation
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / elapsed * 1.2) if elapsed > 0 else loops * 10)
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - started) / loops)
+    return {'loops': loops, 'best': min(timings), 'median': statistics.median(timings)}
+
+def _step(context: PipelineContext) -> PipelineContext:
+    return context
+
+def _pipeline_case(steps: int):
+    def setup():
+        pipeline = Pipeline("bench", [_step] * steps)
+        return lambda: pipeline.run({'value': 1}), None
+    return setup
+
+for _steps in (1, 5, 20):
+    case(f"pipeline.run[steps={_steps}]")(_pipeline_case(_steps))
+
+def _hooks_case(hooks: int):
+    def setup():
+        manager = HookManager()
+        for _ in range(hooks):
+            manager.register_hook("before_image_upload", lambda image_data, **kwargs: image_data.size)
+        view = ImageView(b"x" * 1024)
+        return lambda: manager.run_hooks("before_image_upload", image_data=view), None
+    return setup
+
+for _hooks in (0, 1, 10):
+    case(f"hooks.run_hooks[hooks={_hooks}]")(_hooks_case(_hooks))
+
+def _base64_case(size_mb: int):
+    def setup():
+        encoded = base64.b64encode(os.urandom(size_mb * MB)).decode('ascii')
+        return lambda: ImageView(encoded).size, None
+    return setup
+
+for _size in (1, 20):
+    case(f"image_view.size[base64,{_size}MB]")(_base64_case(_size))
+
+@case("sessions.get[hit,10000 sessions]")
+def _sessions_hit():
+    store = SessionStore(ttl=3600, max_entries=20000)
+    for index in range(10000):
+        store.begin(f"user-{index}", SessionState.WAITING_FOR_IMAGE)
+    return lambda: store.get("user-5000"), None
+
+@case("sessions.get[miss,10000 sessions]")
+def _sessions_miss():
+    store = SessionStore(ttl=3600, max_entries=20000)
+    for index in range(10000):
+        store.begin(f"user-{index}", SessionState.WAITING_FOR_IMAGE)
+    return lambda: store.get("someone-else"), None
+
+@case("tokens.get_token[mint]")
+def _tokens_mint():
+    # A margin as long as the lifetime makes every call mint
+    provider = TokenProvider({'default': ('bench-ak', 'bench-sk-0123456789abcdef0123456789')},
+                             ttl=1800, refresh_margin=1800)
+    return provider.get_token, None
+
+@case("tokens.get_token[cached]")
+def _tokens_cached():
+    provider = TokenProvider({'default': ('bench-ak', 'bench-sk-0123456789abcdef0123456789')})
+    provider.get_token()
+    return provider.get_token, None
+
+def _plugin():
+    """Started plugin with a config that never reaches the network"""
+    from .plugin import Image2Video
+
+    class BenchPlugin(Image2Video):
+        def _load_config(self) -> Dict[str, Any]:
+            return {
+                'api_url': 'http://127.0.0.1:9/v1/videos/image2video',
+                'ak': 'bench-ak', 'sk': 'bench-sk-0123456789abcdef0123456789',
+                'imgbb_api_key': 'bench',
+                'upload_cache_size': 0, 'journal_file': '', 'image_max_edge': 0,
+                'config_watch': False, 'warmup_enabled': False, 'max_sessions': 20000,
+            }
+
+    plugin = BenchPlugin()
+    plugin.start()
+    return plugin
+
+def _image_data_case(size_mb: int, encoded: bool):
+    def setup():
+        from .loadtest import FakeImage, FakeMessage
+        plugin = _plugin()
+        data = os.urandom(size_mb * MB)
+        raw = {'Content': base64.b64encode(data).decode('ascii')} if encoded else FakeImage(data)
+        msg = FakeMessage("bench-user", raw)
+        return lambda: plugin.get_image_data(msg, "image.jpg"), plugin.stop
+    return setup
+
+for _size in (1, 5, 20):
+    case(f"get_image_data[download,{_size}MB]")(_image_data_case(_size, False))
+for _size in (1, 5, 20):
+    case(f"get_image_data[base64,{_size}MB]")(_image_data_case(_size, True))
+
+def _handle_context_case(content: str, with_session: bool):
+    def setup():
+        from bridge.context import Context, ContextType
+        from .loadtest import FakeMessage
+        plugin = _plugin()
+        for index in range(10000):
+            plugin.sessions.begin(f"user-{index}", SessionState.SUBMITTING)
+        user_id = "user-5000" if with_session else "bench-user"
+        context = Context(ContextType.TEXT, content, {'msg': FakeMessage(user_id), 'receiver': user_id,
+                                                      'isgroup': False, 'session_id': user_id})
+        e_context = {'context': context, 'channel': None}
+        return lambda: plugin.on_handle_context(e_context), plugin.stop
+    return setup
+
+case("on_handle_context[no session]")(_handle_context_case("hello", False))
+case("on_handle_context[session busy]")(_handle_context_case("hello", True))
+case("on_handle_context[command]")(_handle_context_case("动起来", False))
+
+def run_benchmarks(selected: Optional[List[str]] = None,
+                   repeat: int = 5,
+                   min_time: float = 0.1) -> Dict[str, Dict[str, float]]:
+    """Run the cases whose names contain any of ``selected``, or all of them"""
+    results = {}
+    for name, setup in CASES.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        fn, cleanup = setup()
+        try:
+            results[name] = measure(fn, repeat, min_time)
+        finally:
+            if cleanup:
+                cleanup()
+    return results
+
+def compare(baseline: Dict[str, Dict[str, float]],
+            current: Dict[str, Dict[str, float]],
+            threshold: float = 0.15) -> List[Dict[str, Any]]:
+    """Compare best times against a baseline
+
+    Returns:
+        One row per case with 'name', 'baseline', 'current', 'change' (relative,
+        None for new cases) and 'status': 'slower', 'faster', 'ok' or 'new'
+    """
+    rows = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append({'name': name, 'baseline': None, 'current': result['best'],
+                         'change': None, 'status': 'new'})
+            continue
+        change = result['best'] / before['best'] - 1
+        status = 'slower' if change > threshold else 'faster' if change < -threshold else 'ok'
+        rows.append({'name': name, 'baseline': before['best'], 'current': result['best'],
+                     'change': change, 'status': status})
+    return rows
+
+def _format_time(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    """Render compare rows as a text table"""
+    width = max([len(row['name']) for row in rows] + [4])
+    lines = [f"{'case':<{width}}  {'baseline':>10}  {'current':>10}  {'change':>8}  status"]
+    for row in rows:
+        change = "-" if row['change'] is None else f"{row['change']:+.1%}"
+        lines.append(f"{row['name']:<{width}}  {_format_time(row['baseline']):>10}  "
+                     f"{_format_time(row['current']):>10}  {change:>8}  {row['status']}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the Image2Video plugin's hot paths")
+    parser.add_argument('-k', dest='selected', action='append', help="only run cases containing this text")
+    parser.add_argument('--list', action='store_true', help="list the cases and exit")
+    parser.add_argument('--repeat', type=int, default=5, help="timed repeats per case")
+    parser.add_argument('--min-time', type=float, default=0.1, help="minimum seconds per repeat")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.15, help="relative slowdown reported as a regression")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    parser.add_argument('--log-level', default='WARNING',
+                        help="plugin log level while benchmarking; INFO includes log formatting and I/O in the timings")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    previous_level = logger.level
+    logger.setLevel(getattr(logging, args.log_level.upper()))
+    try:
+        results = run_benchmarks(args.selected, args.repeat, args.min_time)
+    finally:
+        logger.setLevel(previous_level)
+
+    baseline: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file).get('results', {})
+    rows = compare(baseline, results, args.threshold)
+    print(format_report(rows))
+
+    document = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'machine': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+    if args.save:
+        # Keep cases that were not run this time
+        document['results'] = dict(baseline, **results)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    return 1 if any(row['status'] == 'slower' for row in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+from .bench import CASES, compare, measure, run_benchmarks
+
+def test_measure_calibrates_loops():
+    calls = []
+    result = measure(lambda: calls.append(1), repeat=3, min_time=0.01)
+    assert result['loops'] > 1
+    assert 0 < result['best'] <= result['median']
+    assert len(calls) >= 3 * result['loops']
+
+def test_compare_flags_regressions():
+    baseline = {'a': {'best': 1.0}, 'b': {'best': 1.0}, 'c': {'best': 1.0}}
+    current = {'a': {'best': 1.05}, 'b': {'best': 1.5}, 'c': {'best': 0.5}, 'd': {'best': 1.0}}
+    statuses = {row['name']: row['status'] for row in compare(baseline, current, threshold=0.15)}
+    assert statuses == {'a': 'ok', 'b': 'slower', 'c': 'faster', 'd': 'new'}
+
+def test_standalone_cases_run():
+    assert "tokens.get_token[mint]" in CASES
+    results = run_benchmarks(["pipeline.run[steps=1]", "hooks.run_hooks[hooks=1]"], repeat=1, min_time=0.001)
+    assert set(results) == {"pipeline.run[steps=1]", "hooks.run_hooks[hooks=1]"}
@@ -0,0 +1,129 @@
+from typing import Dict, Tuple, Union
+from urllib.parse import urlparse
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from common.log import logger
+from .metrics import metrics
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to an endpoint that is down"""
+    pass
+
+class CircuitBreaker:
+    """Failure tracking for one endpoint
+
+    Closed: requests pass and consecutive failures are counted. After
+    ``failure_threshold`` of them the breaker opens and rejects requests for
+    ``recovery_timeout`` seconds. Then it lets a single probe through
+    (half-open); the probe's outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """Admit a request, raising CircuitOpenError while the endpoint is considered down"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.time() - self._opened_at >= self.recovery_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self._opened_at + self.recovery_timeout - time.time())
+        raise CircuitOpenError(f"{self.name} is unavailable, retrying in {retry_in:.0f}s")
+
+    def release(self) -> None:
+        """End an admitted request without judging the endpoint"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.time()
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        log = logger.warning if state == self.OPEN else logger.info
+        log(f"[Image2Video] Circuit for {self.name} is now {state}")
+        self.state = state
+        metrics.inc("circuit_breaker_transitions_total", endpoint=self.name, state=state)
+
+class BreakerAdapter(HTTPAdapter):
+    """HTTP adapter guarding every endpoint (scheme, host and port) with a circuit breaker
+
+    Connection errors, timeouts and 5xx responses count as failures, after
+    the adapter's own retries have been used up. Requests to an open circuit fail at once with
+    CircuitOpenError. Requests sent without a timeout get ``default_timeout``,
+    so an endpoint that stops answering times out and counts as failing
+    instead of holding the caller forever.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0,
+                 default_timeout: Union[float, Tuple[float, float], None] = (10, 60),
+                 **kwargs):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.default_timeout = default_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """Get the breaker of the endpoint a URL belongs to"""
+        parsed = urlparse(url)
+        endpoint = f"{parsed.scheme}://{parsed.netloc}"
+        with self._breakers_lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(
+                    endpoint, self.failure_threshold, self.recovery_timeout)
+            return breaker
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        if not args and kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        breaker = self.breaker_for(request.url)
+        breaker.allow()
+        try:
+            response = super().send(request, *args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.RetryError):
+            breaker.record_failure()
+            raise
+        except Exception:
+            # Not the endpoint's fault, e.g. an invalid request
+            breaker.release()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
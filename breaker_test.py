@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+import requests
+from .breaker import BreakerAdapter, CircuitBreaker, CircuitOpenError
+
+@pytest.fixture
+def flaky_server(stub_server):
+    """Local endpoint whose status code the test controls"""
+    state = {'status': 503, 'requests': 0}
+    
+    def respond(method, path, body):
+        state['requests'] += 1
+        return state['status'], b''
+    
+    return stub_server(respond).url, state
+
+@pytest.fixture
+def stalled_server(stub_server):
+    """Local endpoint that accepts requests and never answers in time"""
+    release = threading.Event()
+    
+    def respond(method, path, body):
+        release.wait(5)
+        return 200, b''
+    
+    yield stub_server(respond).url
+    release.set()
+
+def test_breaker_opens_and_probes_for_recovery():
+    breaker = CircuitBreaker("api", failure_threshold=2, recovery_timeout=0.05)
+    breaker.allow()
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+        
+    time.sleep(0.06)
+    breaker.allow()
+    # Only one probe at a time while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_adapter_fails_fast_while_endpoint_is_down(flaky_server):
+    base_url, state = flaky_server
+    session = requests.Session()
+    session.mount('http://', BreakerAdapter(failure_threshold=2, recovery_timeout=0.1))
+    
+    for _ in range(2):
+        assert session.get(base_url).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        session.get(base_url)
+    assert state['requests'] == 2
+    
+    state['status'] = 200
+    time.sleep(0.15)
+    assert session.get(base_url).status_code == 200
+    assert session.get(base_url).status_code == 200
+
+def test_stalled_endpoint_times_out_and_opens_the_circuit(stalled_server):
+    session = requests.Session()
+    session.mount('http://', BreakerAdapter(failure_threshold=2, recovery_timeout=30,
+                                            default_timeout=(1, 0.1)))
+    
+    started = time.monotonic()
+    for _ in range(2):
+        # No per-call timeout: the adapter's default applies
+        with pytest.raises(requests.exceptions.Timeout):
+            session.get(stalled_server)
+    with pytest.raises(CircuitOpenError):
+        session.get(stalled_server)
+    assert time.monotonic() - started < 2
@@ -0,0 +1,138 @@
+from typing import Callable, Dict, Any, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse, parse_qs
+import hashlib
+import hmac
+import json
+import threading
+import time
+from common.log import logger
+from .metrics import metrics
+
+# Handler of a verified-signature callback: (task data) -> HTTP status
+CallbackHandler = Callable[[Dict[str, Any]], int]
+
+class CallbackReceiver:
+    """Embedded HTTP endpoint for the provider's task callbacks
+
+    Each submission gets its own callback URL carrying an HMAC of its
+    external task ID, so the endpoint can check that a callback is about
+    a task this plugin submitted without storing per-task tokens. Requests
+    with a bad signature are rejected before ``handler`` sees them. After
+    a secret rotation the previous secret stays valid for a grace period,
+    so URLs handed out for tasks still running keep working.
+    """
+
+    def __init__(self,
+                 public_url: str,
+                 secret: str,
+                 handler: CallbackHandler,
+                 max_body: int = 1024 * 1024):
+        """Initialize receiver
+
+        Args:
+            public_url: URL under which the provider reaches this endpoint
+            secret: Key of the callback URL signatures
+            handler: Called with the task data of every authentic callback
+            max_body: Largest accepted request body in bytes
+        """
+        self.public_url = public_url
+        self.secret = secret
+        self.handler = handler
+        self.max_body = max_body
+        # Retired secret -> time until which its signatures are accepted
+        self._previous: Dict[str, float] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def path(self) -> str:
+        return urlparse(self.public_url).path or '/'
+
+    def sign(self, external_task_id: str, secret: Optional[str] = None) -> str:
+        return hmac.new((secret or self.secret).encode('utf-8'), external_task_id.encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+
+    def rotate(self, secret: str, grace: float) -> None:
+        """Sign new URLs with ``secret``, accepting the old one for ``grace`` seconds"""
+        if secret == self.secret:
+            return
+        now = time.time()
+        self._previous = {old: until for old, until in self._previous.items()
+                          if until > now and old != secret}
+        self._previous[self.secret] = now + grace
+        self.secret = secret
+
+    def verify(self, external_task_id: str, signature: str) -> bool:
+        """Whether ``signature`` signs the task ID with the current or a retired secret"""
+        now = time.time()
+        secrets = [self.secret] + [old for old, until in list(self._previous.items()) if until > now]
+        return any(hmac.compare_digest(signature, self.sign(external_task_id, secret))
+                   for secret in secrets)
+
+    def url_for(self, external_task_id: str) -> str:
+        """Callback URL to submit along with a task"""
+        separator = '&' if urlparse(self.public_url).query else '?'
+        return self.public_url + separator + urlencode({'sig': self.sign(external_task_id)})
+
+    def receive(self, query: str, body: bytes) -> int:
+        """Verify and handle one callback, returning the HTTP status to answer with"""
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(data, dict):
+            return 400
+        external_task_id = (data.get('task_info') or {}).get('external_task_id') or ''
+        signature = (parse_qs(query).get('sig') or [''])[0]
+        if not external_task_id or not self.verify(external_task_id, signature):
+            logger.warning(f"[Image2Video] Rejected callback with invalid signature for task {data.get('task_id')}")
+            metrics.inc("task_callbacks_total", result="rejected")
+            return 403
+        status = self.handler(data)
+        metrics.inc("task_callbacks_total", result="accepted" if status < 400 else "ignored")
+        return status
+
+    def start(self, host: str = "0.0.0.0", port: int = 9465) -> int:
+        """Listen on host:port at the path of ``public_url``, returning the bound port"""
+        if self._server:
+            return self._server.server_address[1]
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                if parsed.path != receiver.path:
+                    status = 404
+                elif length > receiver.max_body:
+                    status = 413
+                else:
+                    try:
+                        status = receiver.receive(parsed.query, self.rfile.read(length))
+                    except Exception as e:
+                        logger.error(f"[Image2Video] Failed to handle callback: {e}")
+                        status = 500
+                body = json.dumps({'code': 0 if status < 400 else status}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever,
+                         name="image2video-callbacks",
+                         daemon=True).start()
+        logger.info(f"[Image2Video] Receiving task callbacks on {host}:{self._server.server_address[1]}{self.path}")
+        return self._server.server_address[1]
+
+    def stop(self) -> None:
+        """Stop the endpoint"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,66 @@
+import threading
+import requests
+from .callbacks import CallbackReceiver
+from .loadtest import StubKling
+
+def start_receiver(handler, secret="secret"):
+    receiver = CallbackReceiver("http://127.0.0.1/image2video/callback", secret, handler)
+    port = receiver.start("127.0.0.1", 0)
+    receiver.public_url = f"http://127.0.0.1:{port}/image2video/callback"
+    return receiver
+
+def test_rejects_callbacks_without_valid_signature():
+    received = []
+    receiver = start_receiver(lambda data: received.append(data) or 200)
+    try:
+        body = {'task_id': 't1', 'task_status': 'succeed', 'task_info': {'external_task_id': 'ext-1'}}
+        assert requests.post(receiver.url_for('ext-1'), json=body).status_code == 200
+        assert requests.post(receiver.url_for('ext-2'), json=body).status_code == 403
+        assert requests.post(receiver.public_url, json=body).status_code == 403
+        assert requests.post(receiver.public_url + "?sig=x", data=b"not json").status_code == 400
+        other_path = receiver.url_for('ext-1').replace('/callback', '/other')
+        assert requests.post(other_path, json=body).status_code == 404
+    finally:
+        receiver.stop()
+    assert [data['task_id'] for data in received] == ['t1']
+
+def test_rotated_secret_stays_valid_for_grace_period():
+    receiver = CallbackReceiver("http://127.0.0.1/cb", "old", lambda data: 200)
+    issued = receiver.sign('ext-1')
+    receiver.rotate("new", grace=60)
+    assert receiver.verify('ext-1', issued)
+    assert receiver.verify('ext-1', receiver.sign('ext-1'))
+    
+    receiver.rotate("newer", grace=0)
+    # A secret retired without grace is rejected at once
+    assert not receiver.verify('ext-1', CallbackReceiver("", "new", None).sign('ext-1'))
+    assert receiver.verify('ext-1', issued)
+    assert not receiver.verify('ext-1', 'forged')
+
+def test_url_keeps_existing_query():
+    receiver = CallbackReceiver("https://bot.example.com/cb?env=prod", "secret", lambda data: 200)
+    assert receiver.url_for('ext-1') == f"https://bot.example.com/cb?env=prod&sig={receiver.sign('ext-1')}"
+
+def test_fake_provider_reports_completion():
+    done = threading.Event()
+    received = []
+
+    def handler(data):
+        received.append(data)
+        done.set()
+        return 200
+
+    receiver = start_receiver(handler)
+    kling = StubKling(latency=0, task_seconds=0.1).start()
+    try:
+        response = requests.post(kling.api_url, json={'image': 'http://x/a.jpg', 'prompt': 'p',
+                                                      'external_task_id': 'ext-1',
+                                                      'callback_url': receiver.url_for('ext-1')})
+        task_id = response.json()['data']['task_id']
+        assert done.wait(2)
+    finally:
+        kling.stop()
+        receiver.stop()
+    assert received[0]['task_id'] == task_id
+    assert received[0]['task_status'] == 'succeed'
+    assert kling.stats['callbacks'] == 1
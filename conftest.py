@@ -0,0 +1,101 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import pytest
+
+# (method, path, body) -> (status, payload[, headers])
+Respond = Callable[[str, str, Optional[bytes]], Tuple[Any, ...]]
+
+class StubEndpoint:
+    """Local HTTP endpoint answering every request with a test's function
+
+    ``respond`` returns a status and a JSON payload or raw bytes, plus
+    optional response headers; a ``Content-Length`` above the payload size
+    sends a truncated response and drops the connection. While it runs,
+    ``request`` is the handler of the request being served, for headers
+    and the client address. Every request first waits ``latency`` seconds.
+    """
+
+    def __init__(self, respond: Respond, latency: float = 0.0):
+        self.respond = respond
+        self.latency = latency
+        self._local = threading.local()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def request(self) -> BaseHTTPRequestHandler:
+        return self._local.request
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubEndpoint':
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self) -> None:
+                endpoint._serve(self, None)
+
+            do_GET = do_HEAD
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                endpoint._serve(self, self.rfile.read(length))
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _serve(self, request: BaseHTTPRequestHandler, body: Optional[bytes]) -> None:
+        time.sleep(self.latency)
+        self._local.request = request
+        status, payload, *extra = self.respond(request.command, request.path, body)
+        headers: Dict[str, str] = dict(*extra)
+        if isinstance(payload, bytes):
+            data, content_type = payload, 'application/octet-stream'
+        else:
+            data, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        headers.setdefault('Content-Type', content_type)
+        headers.setdefault('Content-Length', str(len(data)))
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        if request.command == 'HEAD':
+            return
+        if len(data) < int(headers['Content-Length']):
+            request.close_connection = True
+        try:
+            request.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+@pytest.fixture
+def stub_server():
+    """Start local HTTP endpoints for a test: ``stub_server(respond, latency=0)``"""
+    endpoints = []
+
+    def start(respond: Respond, latency: float = 0.0) -> StubEndpoint:
+        endpoint = StubEndpoint(respond, latency).start()
+        endpoints.append(endpoint)
+        return endpoint
+
+    yield start
+    for endpoint in endpoints:
+        endpoint.stop()
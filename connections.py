@@ -0,0 +1,105 @@
+from typing import List, Optional, Tuple
+import socket
+import threading
+import requests
+from urllib3.connection import HTTPConnection
+from common.log import logger
+from .breaker import BreakerAdapter
+
+def keepalive_socket_options(idle: int = 60, interval: int = 15, count: int = 4) -> List[Tuple[int, int, int]]:
+    """Default urllib3 socket options plus TCP keep-alive probing where supported"""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    # macOS names the idle option differently
+    if not hasattr(socket, 'TCP_KEEPIDLE') and hasattr(socket, 'TCP_KEEPALIVE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle))
+    return options
+
+class KeepAliveAdapter(BreakerAdapter):
+    """Circuit-breaking adapter whose pooled sockets use TCP keep-alive
+
+    Keep-alive probes stop idle pooled connections from being silently
+    dropped by NAT gateways and load balancers, so reused connections are
+    still alive when the next request comes.
+    """
+
+    def __init__(self, socket_options: Optional[List[Tuple[int, int, int]]] = None, **kwargs):
+        self.socket_options = socket_options if socket_options is not None else keepalive_socket_options()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        kwargs.setdefault('socket_options', self.socket_options)
+        super().init_poolmanager(*args, **kwargs)
+
+class ConnectionWarmer:
+    """Opens and keeps warm pooled connections to the endpoints the plugin calls
+
+    ``warm`` sends HEAD requests to every endpoint so DNS, TCP and TLS setup
+    happen before the first user arrives; a background thread repeats them
+    every ``interval`` seconds so the connections outlive server idle
+    timeouts. Responses of any status are fine, only reaching the server
+    matters.
+    """
+
+    def __init__(self,
+                 session: requests.Session,
+                 urls: List[str],
+                 interval: float = 60.0,
+                 connections: int = 1,
+                 timeout: float = 10.0):
+        """Initialize warmer
+
+        Args:
+            session: Session whose pools are warmed
+            urls: Endpoints to warm, one request target per host is enough
+            interval: Seconds between pings, 0 to only warm at start
+            connections: Concurrent requests, and so connections, per endpoint
+            timeout: Seconds to wait for each ping
+        """
+        self.session = session
+        self.urls = list(dict.fromkeys(urls))
+        self.interval = interval
+        self.connections = connections
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def warm(self) -> None:
+        """Ping every endpoint over ``connections`` concurrent connections"""
+        threads = [threading.Thread(target=self._ping, args=(url,), daemon=True)
+                   for url in self.urls for _ in range(self.connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(self.timeout + 1)
+
+    def start(self) -> None:
+        """Warm connections in the background and keep pinging"""
+        if self._thread or not self.urls:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop,
+                                        name="image2video-warmer",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop pinging"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        self.warm()
+        while self.interval > 0 and not self._stop.wait(self.interval):
+            self.warm()
+
+    def _ping(self, url: str) -> None:
+        try:
+            self.session.head(url, timeout=self.timeout, allow_redirects=False)
+        except Exception as e:
+            logger.debug(f"[Image2Video] Failed to warm connection to {url}: {e}")
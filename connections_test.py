@@ -0,0 +1,48 @@
+import socket
+import time
+import pytest
+import requests
+from .connections import ConnectionWarmer, KeepAliveAdapter
+
+@pytest.fixture
+def server(stub_server):
+    """Local endpoint recording the client ports of HEAD requests"""
+    seen = []
+    
+    def respond(method, path, body):
+        seen.append(endpoint.request.client_address[1])
+        return 401, b''
+    
+    endpoint = stub_server(respond, latency=0.05)
+    return endpoint.url + "/v1/videos", seen
+
+def test_warm_connections_are_reused(server):
+    url, seen = server
+    session = requests.Session()
+    session.mount('http://', KeepAliveAdapter(pool_maxsize=4))
+    warmer = ConnectionWarmer(session, [url, url], connections=2)
+    
+    warmer.warm()
+    assert len(seen) == 2
+    session.get(url)
+    
+    # The request after warm-up reuses one of the warmed connections
+    assert seen[2] in seen[:2]
+
+def test_warmer_pings_periodically(server):
+    url, seen = server
+    warmer = ConnectionWarmer(requests.Session(), [url], interval=0.1)
+    warmer.start()
+    time.sleep(0.35)
+    warmer.stop()
+    
+    assert len(seen) >= 3
+
+def test_keepalive_is_enabled_on_pooled_sockets(server):
+    url, _ = server
+    session = requests.Session()
+    session.mount('http://', KeepAliveAdapter())
+    
+    with session.get(url, stream=True) as response:
+        sock = response.raw.connection.sock
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
@@ -0,0 +1,119 @@
+from typing import Callable, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import json
+import threading
+import time
+from common.log import logger
+
+class TaskDeduplicator:
+    """Single-flight and short-term reuse of video task submissions
+
+    Requests are keyed by image, prompt and model parameters. A request whose
+    key is already being submitted waits for that submission instead of
+    paying for a second task, and a request whose key was submitted within
+    ``window`` seconds reuses the earlier task. Tasks that end in failure are
+    forgotten so retries submit afresh.
+    """
+
+    def __init__(self, window: float = 1800.0, max_entries: int = 1024):
+        """Initialize deduplicator
+
+        Args:
+            window: Seconds a submitted task stays reusable, 0 disables reuse
+            max_entries: Maximum number of remembered submissions
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        # key -> (task_data, submitted_at)
+        self._recent: "OrderedDict[str, tuple]" = OrderedDict()
+        # task_id -> (key, final task data or None)
+        self._tasks: Dict[str, list] = {}
+
+    @staticmethod
+    def key_for(image_url: str, prompt: str, params: Dict[str, Any]) -> str:
+        """Compute the identity of a generation request"""
+        payload = json.dumps([image_url, prompt.strip(), params],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def submit(self,
+               key: str,
+               submit: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Submit a task unless an identical one is in flight or recent
+
+        Args:
+            key: Request identity from key_for
+            submit: Callable performing the actual submission
+
+        Returns:
+            Tuple of (task data, whether an existing task was reused)
+        """
+        with self._lock:
+            self._expire()
+            recent = self._recent.get(key)
+            if recent:
+                return recent[0], True
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._inflight[key] = flight
+
+        if not leader:
+            logger.info(f"[Image2Video] Attaching to in-flight submission {key[:12]}")
+            return flight.result(), True
+
+        try:
+            task_data = submit()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            if self.window > 0:
+                self._recent[key] = (task_data, time.time())
+                self._tasks[task_data['task_id']] = [key, None]
+                while len(self._recent) > self.max_entries:
+                    self._forget(next(iter(self._recent)))
+        flight.set_result(task_data)
+        return task_data, False
+
+    def complete(self, task_id: str, task_data: Dict[str, Any]) -> None:
+        """Record the final result of a task; failed tasks are forgotten"""
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if not entry:
+                return
+            if task_data.get('task_status') == 'succeed':
+                entry[1] = task_data
+                return
+            del self._tasks[task_id]
+            recent = self._recent.get(entry[0])
+            if recent and recent[0]['task_id'] == task_id:
+                del self._recent[entry[0]]
+
+    def result_for(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get the recorded final result of a task, if it finished"""
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            return entry[1] if entry else None
+
+    def _forget(self, key: str) -> None:
+        recent = self._recent.pop(key, None)
+        if recent:
+            self._tasks.pop(recent[0]['task_id'], None)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.window
+        while self._recent:
+            key, (_, submitted_at) = next(iter(self._recent.items()))
+            if submitted_at > cutoff:
+                break
+            self._forget(key)
@@ -0,0 +1,56 @@
+import threading
+import pytest
+from .dedup import TaskDeduplicator
+
+def test_concurrent_identical_requests_share_one_submission():
+    dedup = TaskDeduplicator()
+    key = dedup.key_for('url', 'prompt', {'mode': 'pro'})
+    release = threading.Event()
+    calls = []
+    results = []
+    
+    def submit():
+        calls.append(1)
+        release.wait(2)
+        return {'task_id': 'task-1'}
+    
+    threads = [threading.Thread(target=lambda: results.append(dedup.submit(key, submit)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert [data['task_id'] for data, _ in results] == ['task-1'] * 5
+    assert sorted(reused for _, reused in results) == [False] + [True] * 4
+
+def test_recent_results_are_reused_until_failure():
+    dedup = TaskDeduplicator(window=60)
+    key = dedup.key_for('url', 'prompt', {})
+    assert dedup.submit(key, lambda: {'task_id': 'a'}) == ({'task_id': 'a'}, False)
+    assert dedup.submit(key, lambda: {'task_id': 'b'}) == ({'task_id': 'a'}, True)
+    
+    dedup.complete('a', {'task_id': 'a', 'task_status': 'succeed'})
+    assert dedup.result_for('a')['task_status'] == 'succeed'
+    
+    dedup = TaskDeduplicator(window=60)
+    dedup.submit(key, lambda: {'task_id': 'a'})
+    dedup.complete('a', {'task_id': 'a', 'task_status': 'failed'})
+    assert dedup.submit(key, lambda: {'task_id': 'b'}) == ({'task_id': 'b'}, False)
+
+def test_failed_submission_propagates_to_waiters():
+    dedup = TaskDeduplicator()
+    key = dedup.key_for('url', 'prompt', {})
+    
+    def submit():
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        dedup.submit(key, submit)
+    assert dedup.submit(key, lambda: {'task_id': 'a'}) == ({'task_id': 'a'}, False)
+
+def test_key_depends_on_model_parameters():
+    assert (TaskDeduplicator.key_for('url', 'prompt', {'mode': 'pro'}) !=
+            TaskDeduplicator.key_for('url', 'prompt', {'mode': 'std'}))
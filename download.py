@@ -0,0 +1,146 @@
+from typing import Optional, Tuple
+import os
+import re
+import time
+import requests
+from common.log import logger
+from .breaker import CircuitOpenError
+from .metrics import metrics
+
+class DownloadError(Exception):
+    """Raised when a file cannot be downloaded completely"""
+    pass
+
+class _Interrupted(Exception):
+    """Transfer stopped early; the partial file can be resumed"""
+    pass
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+def _parse_content_range(value: Optional[str]) -> Tuple[int, Optional[int]]:
+    """Get (first byte, total size) from a Content-Range header"""
+    match = _CONTENT_RANGE.match(value or "")
+    if not match:
+        raise DownloadError(f"Invalid Content-Range: {value}")
+    total = match.group(3)
+    return int(match.group(1)), None if total == "*" else int(total)
+
+class VideoDownloader:
+    """Streams files to disk in fixed-size chunks, resuming interrupted transfers
+
+    Data goes to ``<name>.part`` and is renamed into place once its size
+    matches what the server announced, so memory use does not depend on
+    the file size and a complete-looking file is never a truncated one.
+    After a dropped connection the transfer continues with an HTTP Range
+    request from the bytes already on disk; servers that ignore Range
+    simply send the whole file again.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 chunk_size: int = 256 * 1024,
+                 max_attempts: int = 5,
+                 retry_delay: float = 1.0,
+                 timeout: Tuple[float, float] = (10, 60),
+                 max_size: int = 0):
+        """Initialize downloader
+
+        Args:
+            directory: Directory the files are written to
+            chunk_size: Bytes read from the network and written per step
+            max_attempts: Connections tried per download before giving up
+            retry_delay: Seconds before the first resume, doubled for each further one
+            timeout: (connect, read) timeout of each request
+            max_size: Largest accepted file in bytes, 0 for no limit
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.max_size = max_size
+
+    def download(self, session: requests.Session, url: str, name: str) -> str:
+        """Download a URL to ``directory/name`` and return the file path"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, os.path.basename(name))
+        part = path + ".part"
+        expected: Optional[int] = None
+        attempt = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                attempt += 1
+                offset = os.path.getsize(part) if os.path.exists(part) else 0
+                try:
+                    expected = self._fetch(session, url, part, offset, expected)
+                    break
+                except CircuitOpenError:
+                    raise
+                except (_Interrupted, requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    if attempt >= self.max_attempts:
+                        raise DownloadError(f"Download of {url} failed after {attempt} attempts: {e}") from e
+                    delay = self.retry_delay * 2 ** (attempt - 1)
+                    logger.warning(f"[Image2Video] Download of {url} interrupted, resuming in {delay:.0f}s: {e}")
+                    metrics.inc("video_download_resumes_total")
+                    time.sleep(delay)
+
+            size = os.path.getsize(part)
+            if expected is not None and size != expected:
+                raise DownloadError(f"Downloaded {size} bytes of {url}, expected {expected}")
+            os.replace(part, path)
+        except Exception:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            raise
+        metrics.observe("video_download_duration_seconds", time.perf_counter() - started)
+        logger.debug(f"[Image2Video] Downloaded {url} to {path} ({size} bytes)")
+        return path
+
+    def _fetch(self, session: requests.Session, url: str, part: str,
+               offset: int, expected: Optional[int]) -> Optional[int]:
+        """Append the rest of the file to ``part`` and return the total size if known"""
+        # Sizes and ranges refer to the encoded body, so ask for it unencoded
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+        with session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset and offset == expected:
+                return expected
+            if response.status_code == 206:
+                start, total = _parse_content_range(response.headers.get('Content-Range'))
+                if start != offset:
+                    raise DownloadError(f"Server resumed {url} at byte {start} instead of {offset}")
+            elif response.status_code == 200:
+                # Range not supported, start over
+                offset = 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length and length.isdigit() else None
+            elif response.status_code >= 500:
+                raise _Interrupted(f"HTTP {response.status_code}")
+            else:
+                raise DownloadError(f"Failed to download {url}: HTTP {response.status_code}")
+
+            if expected is not None and total is not None and total != expected:
+                raise DownloadError(f"{url} changed size during download")
+            if self.max_size and total is not None and total > self.max_size:
+                raise DownloadError(f"{url} is {total} bytes, more than the {self.max_size} allowed")
+
+            # urllib3 discards a partly read chunk when it raises on a short
+            # body; keep it and detect the short body below instead
+            response.raw.enforce_content_length = False
+            written = offset
+            with open(part, 'ab' if offset else 'wb') as file:
+                for chunk in response.iter_content(self.chunk_size):
+                    file.write(chunk)
+                    written += len(chunk)
+                    if self.max_size and written > self.max_size:
+                        raise DownloadError(f"{url} exceeds the {self.max_size} bytes allowed")
+            metrics.inc("video_download_bytes_total", written - offset)
+
+        if total is not None and written < total:
+            raise _Interrupted(f"connection closed after {written} of {total} bytes")
+        return total
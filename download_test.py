@@ -0,0 +1,83 @@
+import os
+import pytest
+import requests
+from .download import DownloadError, VideoDownloader
+
+VIDEO = os.urandom(300_000)
+
+@pytest.fixture
+def video_host(stub_server):
+    """Serves VIDEO at /video, honouring Range unless at /norange
+
+    ``drops`` makes that many responses stop after ``drop_after`` bytes.
+    """
+    state = {'drops': 0, 'drop_after': 100_000, 'ranges': []}
+
+    def respond(method, path, body):
+        start, status, headers = 0, 200, {}
+        header = host.request.headers.get('Range')
+        state['ranges'].append(header)
+        if header and path != '/norange':
+            start = int(header.split('=')[1].rstrip('-'))
+            if start >= len(VIDEO):
+                return 416, b'', {'Content-Range': f'bytes */{len(VIDEO)}'}
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{len(VIDEO) - 1}/{len(VIDEO)}'
+        body = VIDEO[start:]
+        if state['drops']:
+            state['drops'] -= 1
+            headers['Content-Length'] = str(len(body))
+            body = body[:state['drop_after']]
+        return status, body, headers
+
+    host = stub_server(respond)
+    return host.url, state
+
+def test_download_streams_to_disk(video_host, tmp_path):
+    base_url, state = video_host
+    downloader = VideoDownloader(str(tmp_path), chunk_size=16 * 1024)
+    with requests.Session() as session:
+        path = downloader.download(session, f"{base_url}/video", "task-1.mp4")
+
+    assert path == str(tmp_path / "task-1.mp4")
+    with open(path, 'rb') as file:
+        assert file.read() == VIDEO
+    assert state['ranges'] == [None]
+    assert os.listdir(tmp_path) == ["task-1.mp4"]
+
+def test_download_resumes_with_range(video_host, tmp_path):
+    base_url, state = video_host
+    state['drops'] = 2
+    downloader = VideoDownloader(str(tmp_path), retry_delay=0)
+    with requests.Session() as session:
+        path = downloader.download(session, f"{base_url}/video", "task-2.mp4")
+
+    with open(path, 'rb') as file:
+        assert file.read() == VIDEO
+    assert state['ranges'] == [None, 'bytes=100000-', 'bytes=200000-']
+
+def test_download_restarts_when_range_is_ignored(video_host, tmp_path):
+    base_url, state = video_host
+    state['drops'] = 1
+    downloader = VideoDownloader(str(tmp_path), retry_delay=0)
+    with requests.Session() as session:
+        path = downloader.download(session, f"{base_url}/norange", "task-3.mp4")
+
+    with open(path, 'rb') as file:
+        assert file.read() == VIDEO
+
+def test_download_gives_up_and_cleans_up(video_host, tmp_path):
+    base_url, state = video_host
+    state['drops'] = 5
+    state['drop_after'] = 10
+    downloader = VideoDownloader(str(tmp_path), max_attempts=2, retry_delay=0)
+    with requests.Session() as session, pytest.raises(DownloadError):
+        downloader.download(session, f"{base_url}/video", "task-4.mp4")
+    assert os.listdir(tmp_path) == []
+
+def test_download_enforces_size_limit(video_host, tmp_path):
+    base_url, _ = video_host
+    downloader = VideoDownloader(str(tmp_path), max_size=1000)
+    with requests.Session() as session, pytest.raises(DownloadError):
+        downloader.download(session, f"{base_url}/video", "task-5.mp4")
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,93 @@
+from typing import Callable, Any, Iterable, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+from common.log import logger
+from .metrics import metrics
+
+class QueueFullError(Exception):
+    """Raised when the executor already holds its maximum amount of work"""
+    pass
+
+class BoundedExecutor:
+    """Thread pool with a hard limit on queued work
+
+    Wraps a ThreadPoolExecutor so that at most ``max_workers`` jobs run and at
+    most ``max_queue_depth`` more wait for a worker. Further submissions are
+    rejected immediately with QueueFullError instead of piling up.
+    """
+
+    def __init__(self,
+                 max_workers: int = 8,
+                 max_queue_depth: int = 32,
+                 name: str = "image2video-worker"):
+        """Initialize executor
+
+        Args:
+            max_workers: Number of worker threads
+            max_queue_depth: Number of jobs allowed to wait for a free worker
+            name: Thread name prefix
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs running or waiting"""
+        return self._pending
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """Submit a job, raising QueueFullError if the queue is at capacity"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(
+                f"Work queue is full ({self.max_workers + self.max_queue_depth} jobs)")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._run, time.perf_counter(), fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def map(self, fn: Callable, items: Iterable[Any]) -> List[Any]:
+        """Run fn over items on the pool and return the results in order
+
+        Items that do not fit into the queue run in the calling thread, so
+        a busy pool slows the caller down instead of adding threads or
+        failing the work. Exceptions raised by fn are re-raised.
+        """
+        items = list(items)
+        futures: List[Optional[Future]] = []
+        for item in items:
+            try:
+                futures.append(self.submit(fn, item))
+            except (QueueFullError, RuntimeError):
+                futures.append(None)
+        return [future.result() if future else fn(item)
+                for item, future in zip(items, futures)]
+
+    def _run(self, queued_at: float, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        metrics.observe("executor_queue_wait_seconds", time.perf_counter() - queued_at,
+                        executor=self.name)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"[Image2Video] Background job {getattr(fn, '__name__', fn)} failed: {e}")
+            raise
+
+    def _release(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop accepting work and release worker threads"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,86 @@
+import threading
+import time
+import pytest
+from .executor import BoundedExecutor, QueueFullError
+
+def wait_idle(executor, timeout=2.0):
+    # Slots are released by a done callback that runs just after the result is set
+    deadline = time.monotonic() + timeout
+    while executor.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return executor.pending == 0
+
+def test_rejects_work_beyond_workers_and_queue():
+    executor = BoundedExecutor(max_workers=2, max_queue_depth=1)
+    release = threading.Event()
+    try:
+        futures = [executor.submit(release.wait, 5) for _ in range(3)]
+        assert executor.pending == 3
+        with pytest.raises(QueueFullError):
+            executor.submit(release.wait, 5)
+        release.set()
+        for future in futures:
+            future.result(timeout=2)
+        # Finished jobs free their slots
+        assert wait_idle(executor)
+        assert executor.submit(lambda: 42).result(timeout=2) == 42
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+
+def test_runs_at_most_max_workers_at_once():
+    executor = BoundedExecutor(max_workers=2, max_queue_depth=10)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def job():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        threading.Event().wait(0.05)
+        with lock:
+            running.pop()
+
+    futures = [executor.submit(job) for _ in range(8)]
+    for future in futures:
+        future.result(timeout=5)
+    executor.shutdown(wait=True)
+    assert max(peak) == 2
+
+def test_failed_jobs_release_their_slot():
+    executor = BoundedExecutor(max_workers=1, max_queue_depth=0)
+    with pytest.raises(ValueError):
+        executor.submit(int, "not a number").result(timeout=2)
+    assert wait_idle(executor)
+    executor.submit(lambda: None).result(timeout=2)
+    executor.shutdown(wait=True)
+
+def test_shutdown_stops_accepting_work():
+    executor = BoundedExecutor(max_workers=1, max_queue_depth=1)
+    executor.submit(lambda: None).result(timeout=2)
+    executor.shutdown(wait=True)
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
+    # The rejected submission does not leak a slot
+    assert executor.pending == 0
+
+def test_map_runs_overflow_in_the_calling_thread():
+    executor = BoundedExecutor(max_workers=2, max_queue_depth=0, name="test-pool")
+    release = threading.Event()
+
+    def job(item):
+        if item < 2:
+            release.wait(2)
+        return item * 10, threading.current_thread().name
+
+    try:
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        results = executor.map(job, range(4))
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+    assert [value for value, _ in results] == [0, 10, 20, 30]
+    assert all(name.startswith("test-pool") for _, name in results[:2])
+    assert all(name == threading.current_thread().name for _, name in results[2:])
@@ -1,6 +1,10 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union, Callable
+import base64
 from common.log import logger
+from .executor import BoundedExecutor
+from .hooks import ImageView
 from .pipeline import PipelineContext
+from .upload_cache import UploadCache
 
 class AppException(Exception):
     pass
@@ -13,8 +17,29 @@ def validate_image_data(context: PipelineContext) -> PipelineContext:
         raise ValueError("Empty image data")
     return context
 
+def preprocess_image(context: PipelineContext) -> PipelineContext:
+    """Downscale and recompress image before upload"""
+    plugin = context.data.get('plugin')
+    if not plugin:
+        raise RuntimeError("Plugin instance not available in context")
+        
+    image_data = context.data['image_data']
+    if plugin.image_preprocessor and not isinstance(image_data, str):
+        context.data['image_data'] = plugin.image_preprocessor.process(image_data)
+    return context
+
+def preprocess_images(contexts: List[PipelineContext]) -> List[Union[PipelineContext, Exception]]:
+    """Batched preprocess_image: recompresses the images concurrently on the batch pool"""
+    def preprocess(context: PipelineContext) -> Union[PipelineContext, Exception]:
+        try:
+            return preprocess_image(context)
+        except Exception as e:
+            return e
+            
+    return fan_out(contexts[0].data.get('plugin') if contexts else None, preprocess, contexts)
+
 def upload_image(context: PipelineContext) -> PipelineContext:
-    """Upload image to ImgBB"""
+    """Upload image to the configured storage backend"""
     plugin = context.data.get('plugin')
     if not plugin:
         raise RuntimeError("Plugin instance not available in context")
@@ -22,11 +47,16 @@ def upload_image(context: PipelineContext) -> PipelineContext:
     image_data = context.data['image_data']
     
     # Run pre-upload hooks
-    plugin.hook_manager.run_hooks("before_image_upload", 
-                                base64_image=image_data)
+    hook_args = {'image_data': ImageView(image_data)}
+    # Deprecated: hooks written for the base64 payload still get it, encoded
+    # only when one of them asks for it
+    if plugin.hook_manager.accepts("before_image_upload", "base64_image"):
+        hook_args['base64_image'] = (image_data if isinstance(image_data, str)
+                                     else base64.b64encode(image_data).decode('ascii'))
+    plugin.hook_manager.run_hooks("before_image_upload", **hook_args)
     
     try:
-        image_url = plugin.upload_to_imgbb(image_data)
+        image_url = plugin.upload_image_data(image_data)
         if not image_url:
             raise AppException("Failed to upload image")
             
@@ -42,6 +72,36 @@ def upload_image(context: PipelineContext) -> PipelineContext:
         
     return context
 
+def fan_out(plugin: Any, fn: Callable, items: List[Any]) -> List[Any]:
+    """Run fn over items on the plugin's batch pool, or inline without one"""
+    executor = getattr(plugin, 'batch_executor', None)
+    if len(items) < 2 or not isinstance(executor, BoundedExecutor):
+        return [fn(item) for item in items]
+    return executor.map(fn, items)
+
+def upload_images(contexts: List[PipelineContext]) -> List[Union[PipelineContext, Exception]]:
+    """Batched upload_image: uploads each distinct image once, concurrently on the batch pool"""
+    groups: Dict[str, List[int]] = {}
+    for index, context in enumerate(contexts):
+        image_data = context.data.get('image_data')
+        key = UploadCache.key_for(image_data) if image_data else f"missing-{index}"
+        groups.setdefault(key, []).append(index)
+        
+    results: List[Union[PipelineContext, Exception]] = list(contexts)
+    
+    def upload_group(indexes: List[int]) -> None:
+        try:
+            image_url = upload_image(contexts[indexes[0]]).data['image_url']
+            for index in indexes[1:]:
+                contexts[index].data['image_url'] = image_url
+        except Exception as e:
+            for index in indexes:
+                results[index] = e
+                
+    fan_out(contexts[0].data.get('plugin') if contexts else None,
+            upload_group, list(groups.values()))
+    return results
+
 def validate_prompt(context: PipelineContext) -> PipelineContext:
     """Validate prompt data before video generation"""
     if 'prompt' not in context.data:
@@ -70,6 +130,7 @@ def generate_video(context: PipelineContext) -> PipelineContext:
     try:
         task_result = plugin.submit_video_task(image_url, prompt)
         context.data['task_id'] = task_result['task_id']
+        context.data['task_reused'] = task_result.get('reused', False)
         
         # Run post-generation hooks
         plugin.hook_manager.run_hooks("after_video_generation",
@@ -1,9 +1,16 @@
+import base64
+import threading
+import time
 import pytest
 from unittest.mock import MagicMock, patch
+from .executor import BoundedExecutor
+from .hooks import HookManager
 from .pipeline import PipelineContext
 from .handlers import (
     validate_image_data,
+    preprocess_images,
     upload_image,
+    upload_images,
     validate_prompt,
     generate_video,
     handle_validation_error
@@ -27,7 +34,7 @@ def test_validate_image_data():
 
 def test_upload_image():
     mock_plugin = MagicMock()
-    mock_plugin.upload_to_imgbb.return_value = 'test_url'
+    mock_plugin.upload_image_data.return_value = 'test_url'
     
     context = PipelineContext(data={
         'plugin': mock_plugin,
@@ -39,10 +46,97 @@ def test_upload_image():
     mock_plugin.hook_manager.run_hooks.assert_called()
     
     # Test upload failure
-    mock_plugin.upload_to_imgbb.return_value = None
+    mock_plugin.upload_image_data.return_value = None
     with pytest.raises(Exception):
         upload_image(context)
 
+def test_upload_hooks_get_legacy_base64_argument():
+    received = {}
+    
+    def legacy_hook(base64_image):
+        received['legacy'] = base64_image
+        
+    def new_hook(image_data):
+        received['new'] = image_data.size
+        
+    mock_plugin = MagicMock()
+    mock_plugin.hook_manager = HookManager()
+    mock_plugin.hook_manager.register_hook("before_image_upload", legacy_hook)
+    mock_plugin.hook_manager.register_hook("before_image_upload", new_hook)
+    mock_plugin.upload_image_data.return_value = 'test_url'
+    
+    upload_image(PipelineContext(data={'plugin': mock_plugin, 'image_data': b'png'}))
+    assert received == {'legacy': base64.b64encode(b'png').decode(), 'new': 3}
+
+def test_upload_images_uploads_each_distinct_image_once():
+    mock_plugin = MagicMock()
+    mock_plugin.upload_image_data.side_effect = lambda data: f'url-{data.decode()}'
+    contexts = [PipelineContext(data={'plugin': mock_plugin, 'image_data': data})
+                for data in (b'a', b'b', b'a')]
+    
+    results = upload_images(contexts)
+    
+    assert [result.data['image_url'] for result in results] == ['url-a', 'url-b', 'url-a']
+    assert mock_plugin.upload_image_data.call_count == 2
+    
+    # A failed upload fails every item with that image
+    mock_plugin.upload_image_data.side_effect = lambda data: None if data == b'b' else 'url'
+    results = upload_images([PipelineContext(data={'plugin': mock_plugin, 'image_data': data})
+                             for data in (b'a', b'b', b'b')])
+    assert isinstance(results[0], PipelineContext)
+    assert all(isinstance(result, Exception) for result in results[1:])
+
+def test_upload_images_stay_within_the_batch_pool():
+    lock = threading.Lock()
+    running = []
+    peak = []
+    threads = set()
+    
+    def upload(data):
+        with lock:
+            running.append(data)
+            peak.append(len(running))
+            threads.add(threading.current_thread().name)
+        time.sleep(0.05)
+        with lock:
+            running.remove(data)
+        return f'url-{data.decode()}'
+    
+    mock_plugin = MagicMock()
+    mock_plugin.upload_image_data.side_effect = upload
+    mock_plugin.batch_executor = BoundedExecutor(max_workers=2, max_queue_depth=0, name="batch")
+    try:
+        results = upload_images([PipelineContext(data={'plugin': mock_plugin, 'image_data': data})
+                                 for data in (b'a', b'b', b'c', b'd', b'e')])
+    finally:
+        mock_plugin.batch_executor.shutdown(wait=True)
+    assert [result.data['image_url'] for result in results] == ['url-a', 'url-b', 'url-c', 'url-d', 'url-e']
+    # Two pool workers plus the caller for uploads that did not fit
+    assert max(peak) <= 3
+    assert {name for name in threads if not name.startswith("batch")} == {threading.current_thread().name}
+
+def test_preprocess_images_run_concurrently_and_report_failures():
+    started = threading.Barrier(2, timeout=2)
+    
+    def process(data):
+        if data == b'bad':
+            raise ValueError("not an image")
+        # Both images are recompressed at the same time or this times out
+        started.wait()
+        return data.upper()
+    
+    mock_plugin = MagicMock()
+    mock_plugin.image_preprocessor.process.side_effect = process
+    mock_plugin.batch_executor = BoundedExecutor(max_workers=2, max_queue_depth=4, name="batch")
+    try:
+        results = preprocess_images([PipelineContext(data={'plugin': mock_plugin, 'image_data': data})
+                                     for data in (b'a', b'bad', b'b')])
+    finally:
+        mock_plugin.batch_executor.shutdown(wait=True)
+    assert results[0].data['image_data'] == b'A'
+    assert isinstance(results[1], ValueError)
+    assert results[2].data['image_data'] == b'B'
+
 def test_validate_prompt():
     # Test valid case
     context = PipelineContext(data={'prompt': 'test prompt'})
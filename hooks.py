@@ -1,34 +1,217 @@
-from typing import Callable, Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Union
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from functools import wraps
+import base64
+import inspect
+import queue
+import threading
 from common.log import logger
 
+class ImageView:
+    """Read-only view of an image payload handed to hooks
+
+    Exposes the decoded size without copying or decoding the image; the
+    bytes are only produced if a hook asks for them.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: Union[bytes, memoryview, str]):
+        self._data = data
+
+    @property
+    def is_base64(self) -> bool:
+        """Whether the underlying payload is a base64 string"""
+        return isinstance(self._data, str)
+
+    @property
+    def size(self) -> int:
+        """Size of the image in bytes"""
+        if isinstance(self._data, str):
+            return len(self._data) * 3 // 4 - self._data[-2:].count('=')
+        return len(self._data)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def tobytes(self) -> bytes:
+        """Decode or copy the image bytes"""
+        if isinstance(self._data, str):
+            return base64.b64decode(self._data)
+        return bytes(self._data)
+
+    def __repr__(self) -> str:
+        return f"<ImageView {self.size} bytes>"
+
+def _parameters(func: Callable) -> Dict[str, inspect.Parameter]:
+    try:
+        return dict(inspect.signature(func).parameters)
+    except (TypeError, ValueError):
+        return {'kwargs': inspect.Parameter('kwargs', inspect.Parameter.VAR_KEYWORD)}
+
 class HookManager:
-    """Hook management system for Image2Video plugin"""
-    
-    def __init__(self):
+    """Hook management system for Image2Video plugin
+
+    Hooks run inline by default. With ``async_dispatch`` enabled, events are
+    put on a bounded queue and a dispatcher thread runs the hooks on a small
+    worker pool, giving up on any hook that exceeds ``timeout`` seconds;
+    events are dropped with a warning when the queue is full, so hooks never
+    hold up message handling. A worker stuck in a timed-out hook is left
+    to finish on its own and replaced; while ``workers`` hooks are stuck,
+    further hooks are skipped.
+    """
+
+    def __init__(self,
+                 async_dispatch: bool = False,
+                 max_queue: int = 256,
+                 timeout: float = 5.0,
+                 workers: int = 2):
         self._hooks: Dict[str, List[Callable]] = {
             "before_image_upload": [],
             "after_image_upload": [],
             "before_video_generation": [],
             "after_video_generation": [],
         }
-    
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._stuck = 0
+        self.async_dispatch = async_dispatch
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.workers = workers
+
+    def configure(self,
+                  async_dispatch: bool = False,
+                  max_queue: int = 256,
+                  timeout: float = 5.0,
+                  workers: int = 2) -> None:
+        """Set dispatch options; takes effect for events fired afterwards
+        
+        The dispatcher is only restarted when an option it was built with
+        changes, so reloading an unchanged config leaves it running.
+        """
+        if (async_dispatch, max_queue, workers) != (self.async_dispatch, self.max_queue, self.workers):
+            self.stop()
+        self.async_dispatch = async_dispatch
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.workers = workers
+
     def register_hook(self, hook_name: str, func: Callable) -> Callable:
         """Register a hook function for a specific event"""
         if hook_name in self._hooks:
             logger.info(f"Registering hook {func.__name__} for event {hook_name}")
             self._hooks[hook_name].append(func)
         return func
-    
+
+    def has_hooks(self, hook_name: str) -> bool:
+        """Whether any hook is registered for an event"""
+        return bool(self._hooks.get(hook_name))
+
+    def accepts(self, hook_name: str, argument: str) -> bool:
+        """Whether a hook of an event declares ``argument`` by name"""
+        return any(argument in _parameters(func) for func in self._hooks.get(hook_name, []))
+
     def run_hooks(self, hook_name: str, **kwargs) -> None:
         """Execute all registered hooks for a specific event"""
-        if hook_name in self._hooks:
-            logger.info(f"Running hooks for event {hook_name}")
-            for func in self._hooks[hook_name]:
+        funcs = self._hooks.get(hook_name)
+        if not funcs:
+            return
+        if not self.async_dispatch:
+            logger.debug(f"Running hooks for event {hook_name}")
+            for func in funcs:
+                self._call(func, kwargs)
+            return
+        try:
+            self._get_queue().put_nowait((hook_name, list(funcs), kwargs))
+        except queue.Full:
+            logger.warning(f"Hook queue full, dropping event {hook_name}")
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the dispatcher thread after it has handled queued events"""
+        with self._lock:
+            dispatcher, events = self._dispatcher, self._queue
+            self._dispatcher = self._queue = None
+        if dispatcher:
+            events.put(None)
+            dispatcher.join(timeout)
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False)
+
+    def _get_queue(self) -> queue.Queue:
+        with self._lock:
+            if self._dispatcher is None:
+                self._queue = queue.Queue(self.max_queue)
+                self._pool = self._new_pool()
+                self._dispatcher = threading.Thread(target=self._dispatch,
+                                                    args=(self._queue,),
+                                                    name="image2video-hooks",
+                                                    daemon=True)
+                self._dispatcher.start()
+            return self._queue
+
+    def _new_pool(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image2video-hook")
+
+    def _dispatch(self, events: queue.Queue) -> None:
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            hook_name, funcs, kwargs = event
+            logger.debug(f"Running hooks for event {hook_name}")
+            for func in funcs:
+                with self._lock:
+                    pool, stuck = self._pool, self._stuck
+                if pool is None:
+                    return
+                if stuck >= self.workers:
+                    logger.warning(f"{stuck} hooks still running after timing out, "
+                                   f"skipping {func.__name__} for event {hook_name}")
+                    continue
+                try:
+                    future = pool.submit(self._call, func, kwargs)
+                except RuntimeError:
+                    # Pool shut down while stopping
+                    return
                 try:
-                    func(**kwargs)
-                except Exception as e:
-                    logger.error(f"Error running hook {func.__name__}: {str(e)}")
+                    future.result(timeout=self.timeout)
+                except FutureTimeoutError:
+                    logger.warning(
+                        f"Hook {func.__name__} for event {hook_name} timed out after {self.timeout}s")
+                    if not future.cancel():
+                        self._abandon(pool, future)
+
+    def _abandon(self, pool: ThreadPoolExecutor, future: Future) -> None:
+        """Replace a pool whose worker is stuck in a hook
+
+        The stuck thread exits once its hook returns, since the old pool is
+        shut down; until then it counts against ``workers``.
+        """
+        with self._lock:
+            self._stuck += 1
+            if self._pool is pool:
+                self._pool = self._new_pool()
+        future.add_done_callback(self._unstick)
+        pool.shutdown(wait=False)
+
+    def _unstick(self, future: Future) -> None:
+        with self._lock:
+            self._stuck -= 1
+
+    @staticmethod
+    def _call(func: Callable, kwargs: Dict[str, Any]) -> None:
+        # Hooks get only the arguments they declare, unless they take **kwargs
+        parameters = _parameters(func)
+        if not any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+            kwargs = {name: value for name, value in kwargs.items() if name in parameters}
+        try:
+            func(**kwargs)
+        except Exception as e:
+            logger.error(f"Error running hook {func.__name__}: {str(e)}")
 
 # Global hook manager instance
 hook_manager = HookManager()
@@ -45,9 +228,9 @@ def register_hook(hook_name: str):
 # Example usage:
 """
 @register_hook("before_image_upload")
-def log_image_upload(image_data: bytes, **kwargs):
-    logger.info(f"About to upload image of size {len(image_data)} bytes")
+def log_image_upload(image_data: ImageView, **kwargs):
+    logger.info(f"About to upload image of size {image_data.size} bytes")
 
 # Later in the code:
-hook_manager.run_hooks("before_image_upload", image_data=image_bytes)
+hook_manager.run_hooks("before_image_upload", image_data=ImageView(image_bytes))
 """
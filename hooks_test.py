@@ -0,0 +1,113 @@
+import base64
+import threading
+import time
+from .hooks import HookManager, ImageView
+
+def test_image_view_reports_size_without_copying():
+    data = b'x' * 1000
+    
+    assert ImageView(data).size == 1000
+    assert ImageView(base64.b64encode(data).decode()).size == 1000
+    assert ImageView(base64.b64encode(b'xy').decode()).tobytes() == b'xy'
+
+def test_sync_hooks_run_inline():
+    manager = HookManager()
+    calls = []
+    manager.register_hook("after_image_upload", lambda image_url: calls.append(image_url))
+    
+    manager.run_hooks("after_image_upload", image_url='url')
+    manager.run_hooks("before_image_upload", image_data=b'unused')
+    
+    assert calls == ['url']
+    assert not manager.has_hooks("before_image_upload")
+
+def test_hooks_get_only_declared_arguments():
+    manager = HookManager()
+    calls = []
+    manager.register_hook("before_video_generation", lambda prompt: calls.append(prompt))
+    manager.register_hook("before_video_generation", lambda **kwargs: calls.append(sorted(kwargs)))
+    
+    manager.run_hooks("before_video_generation", image_url='url', prompt='p')
+    
+    assert calls == ['p', ['image_url', 'prompt']]
+    assert manager.accepts("before_video_generation", "prompt")
+    assert not manager.accepts("before_video_generation", "image_url")
+
+def test_async_hooks_do_not_block_and_time_out():
+    manager = HookManager(async_dispatch=True, timeout=0.05)
+    release = threading.Event()
+    done = threading.Event()
+    
+    def slow(task_id):
+        release.wait(2)
+    
+    manager.register_hook("after_video_generation", slow)
+    manager.register_hook("after_video_generation", lambda task_id: done.set())
+    
+    started = time.monotonic()
+    manager.run_hooks("after_video_generation", task_id='t1')
+    
+    assert time.monotonic() - started < 0.05
+    # The second hook still runs once the first one times out
+    assert done.wait(1)
+    release.set()
+    manager.stop()
+
+def test_async_queue_drops_events_when_full():
+    manager = HookManager(async_dispatch=True, max_queue=1, timeout=1)
+    release = threading.Event()
+    calls = []
+    
+    def hook(task_id):
+        release.wait(2)
+        calls.append(task_id)
+    
+    manager.register_hook("after_video_generation", hook)
+    for task_id in ('t1', 't2', 't3', 't4'):
+        manager.run_hooks("after_video_generation", task_id=task_id)
+        time.sleep(0.05)
+    release.set()
+    manager.stop()
+    
+    assert calls == ['t1', 't2']
+
+def test_configure_keeps_dispatcher_when_unchanged():
+    manager = HookManager(async_dispatch=True, timeout=1)
+    done = threading.Event()
+    manager.register_hook("after_image_upload", lambda image_url: done.set())
+    manager.run_hooks("after_image_upload", image_url='url')
+    assert done.wait(1)
+    dispatcher = manager._dispatcher
+    
+    manager.configure(async_dispatch=True, timeout=2)
+    assert manager._dispatcher is dispatcher
+    assert manager.timeout == 2
+    
+    manager.configure(async_dispatch=True, timeout=2, max_queue=10)
+    assert manager._dispatcher is None
+    manager.stop()
+
+def test_timed_out_hooks_do_not_hold_workers():
+    manager = HookManager(async_dispatch=True, timeout=0.05, workers=1)
+    release = threading.Event()
+    calls = []
+    
+    def hook(task_id):
+        if task_id == 'stuck':
+            release.wait(2)
+        calls.append(task_id)
+    
+    manager.register_hook("after_video_generation", hook)
+    manager.run_hooks("after_video_generation", task_id='stuck')
+    time.sleep(0.15)
+    # The only worker is stuck: it is replaced, and the limit of one
+    # stuck hook means the next hook is skipped rather than piling up
+    manager.run_hooks("after_video_generation", task_id='skipped')
+    time.sleep(0.1)
+    release.set()
+    time.sleep(0.1)
+    manager.run_hooks("after_video_generation", task_id='after')
+    time.sleep(0.1)
+    manager.stop()
+    
+    assert calls == ['stuck', 'after']
@@ -0,0 +1,107 @@
+from typing import Optional, Union
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import io
+import multiprocessing
+import threading
+from common.log import logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images are then uploaded as-is
+    Image = None
+    ImageOps = None
+
+def shrink_image(data: bytes, max_edge: int, quality: int, image_format: str) -> bytes:
+    """Downscale an image to max_edge and re-encode it
+
+    Runs inside worker processes. Returns the original bytes when the image
+    is already small enough and re-encoding would not make it smaller.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        original_size = image.size
+        # Let the JPEG decoder skip detail we are about to throw away
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        resized = max(original_size) > max_edge
+        if resized:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, image_format, quality=quality, optimize=True)
+    result = output.getvalue()
+    if not resized and len(result) >= len(data):
+        return data
+    return result
+
+class ImagePreprocessor:
+    """Downscales and recompresses images in a process pool
+
+    Decoding and resizing multi-megabyte photos is CPU bound, so the work is
+    done in separate processes to keep the GIL free for message handling.
+    Workers are not forked from the plugin process, whose background threads
+    may hold locks at fork time. Any failure falls back to the original image.
+    """
+
+    def __init__(self,
+                 max_edge: int = 1280,
+                 quality: int = 85,
+                 image_format: str = "JPEG",
+                 max_workers: int = 2,
+                 timeout: float = 30.0):
+        """Initialize preprocessor
+
+        Args:
+            max_edge: Maximum width/height in pixels after resizing
+            quality: Encoder quality for lossy formats
+            image_format: Pillow format name used for re-encoding
+            max_workers: Number of worker processes
+            timeout: Seconds to wait for one image before giving up
+        """
+        self.max_edge = max_edge
+        self.quality = quality
+        self.image_format = image_format.upper()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether Pillow is installed"""
+        return Image is not None
+
+    def process(self, data: Union[bytes, memoryview]) -> bytes:
+        """Shrink an image, returning the original bytes on any failure"""
+        if not self.available:
+            return data
+        try:
+            future = self._get_pool().submit(shrink_image, bytes(data), self.max_edge,
+                                             self.quality, self.image_format)
+            result = future.result(timeout=self.timeout)
+            logger.debug(f"[Image2Video] Preprocessed image: {len(data)} -> {len(result)} bytes")
+            return result
+        except BrokenProcessPool as e:
+            # Start a fresh pool for the next image
+            self.shutdown()
+            logger.warning(f"[Image2Video] Image worker pool broke, using original: {e}")
+            return data
+        except Exception as e:
+            logger.warning(f"[Image2Video] Image preprocessing failed, using original: {e}")
+            return data
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            if self._pool:
+                self._pool.shutdown(wait=False)
+                self._pool = None
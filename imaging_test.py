@@ -0,0 +1,51 @@
+import io
+import os
+import pytest
+from . import imaging
+from .imaging import ImagePreprocessor, shrink_image
+
+Image = pytest.importorskip("PIL.Image")
+
+def encode(image, image_format="JPEG", **kwargs):
+    output = io.BytesIO()
+    image.save(output, image_format, **kwargs)
+    return output.getvalue()
+
+def decode(data):
+    return Image.open(io.BytesIO(data))
+
+def test_shrinks_long_edge_keeping_aspect_ratio():
+    data = encode(Image.new("RGB", (4000, 2000), (200, 30, 30)), quality=95)
+    with decode(shrink_image(data, 1280, 85, "JPEG")) as result:
+        assert result.size == (1280, 640)
+        assert result.format == "JPEG"
+
+def test_small_image_is_kept_when_recompressing_does_not_help():
+    data = encode(Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)), quality=10)
+    assert shrink_image(data, 1280, 95, "JPEG") is data
+
+def test_transparent_image_is_converted_for_jpeg():
+    data = encode(Image.new("RGBA", (2000, 1000), (0, 0, 255, 128)), "PNG")
+    with decode(shrink_image(data, 500, 85, "JPEG")) as result:
+        assert result.mode == "RGB"
+        assert result.size == (500, 250)
+    with decode(shrink_image(data, 500, 85, "PNG")) as result:
+        assert result.mode == "RGBA"
+
+def test_preprocessor_resizes_in_worker_processes():
+    preprocessor = ImagePreprocessor(max_edge=100, max_workers=1)
+    try:
+        data = encode(Image.new("RGB", (1000, 800)))
+        with decode(preprocessor.process(memoryview(data))) as result:
+            assert result.size == (100, 80)
+        # Undecodable data falls back to the original bytes
+        assert preprocessor.process(b"not an image") == b"not an image"
+    finally:
+        preprocessor.shutdown()
+
+def test_without_pillow_images_pass_through(monkeypatch):
+    monkeypatch.setattr(imaging, "Image", None)
+    preprocessor = ImagePreprocessor()
+    assert not preprocessor.available
+    assert preprocessor.process(b"raw") == b"raw"
+    assert preprocessor._pool is None
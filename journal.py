@@ -0,0 +1,217 @@
+from typing import Dict, Any, List, Optional, Tuple
+import json
+import queue
+import sqlite3
+import threading
+import time
+from common.log import logger
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        user_id TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        data TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS tasks (
+        task_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        target TEXT NOT NULL,
+        submitted_at REAL NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        finished_at REAL,
+        PRIMARY KEY (task_id, user_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status)",
+    """CREATE TABLE IF NOT EXISTS submissions (
+        external_task_id TEXT PRIMARY KEY,
+        task_id TEXT NOT NULL,
+        submitted_at REAL NOT NULL
+    )""",
+)
+
+class TaskJournal:
+    """Durable SQLite journal of dialogue sessions and submitted tasks
+
+    Writes are queued and applied by a single writer thread that commits
+    everything queued within ``flush_interval`` seconds (up to
+    ``batch_size`` statements) in one transaction, so recording state costs
+    the message path only a queue put. The database runs in WAL mode so
+    reads at startup do not block the writer.
+    """
+
+    def __init__(self,
+                 path: str,
+                 flush_interval: float = 0.05,
+                 batch_size: int = 500):
+        """Open journal and start the writer thread
+
+        Args:
+            path: SQLite database file
+            flush_interval: Seconds to gather writes before committing
+            batch_size: Maximum statements per transaction
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+
+        conn = self._connect()
+        try:
+            with conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+        finally:
+            conn.close()
+
+        self._thread = threading.Thread(target=self._write_loop,
+                                        name="image2video-journal",
+                                        daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def save_session(self, user_id: str, state: str,
+                     data: Dict[str, Any], expires_at: float) -> None:
+        """Queue an insert or update of a user's session"""
+        self._queue.put((
+            "INSERT OR REPLACE INTO sessions (user_id, state, data, expires_at) VALUES (?, ?, ?, ?)",
+            (user_id, state, json.dumps(data, ensure_ascii=False), expires_at)
+        ))
+
+    def remove_session(self, user_id: str) -> None:
+        """Queue removal of a user's session"""
+        self._queue.put(("DELETE FROM sessions WHERE user_id = ?", (user_id,)))
+
+    def record_task(self, task_id: str, user_id: str,
+                    target: Dict[str, Any], submitted_at: float) -> None:
+        """Queue a submitted task and where to deliver its result"""
+        self._queue.put((
+            "INSERT OR REPLACE INTO tasks (task_id, user_id, target, submitted_at) VALUES (?, ?, ?, ?)",
+            (task_id, user_id, json.dumps(target, ensure_ascii=False), submitted_at)
+        ))
+
+    def record_submission(self, external_task_id: str, task_id: str) -> None:
+        """Queue the provider task ID assigned to a client-side external_task_id"""
+        self._queue.put((
+            "INSERT OR REPLACE INTO submissions (external_task_id, task_id, submitted_at) VALUES (?, ?, ?)",
+            (external_task_id, task_id, time.time())
+        ))
+
+    def finish_task(self, task_id: str, user_id: str, status: str) -> None:
+        """Queue marking a task as delivered to a user"""
+        self._queue.put((
+            "UPDATE tasks SET status = ?, finished_at = ? WHERE task_id = ? AND user_id = ?",
+            (status, time.time(), task_id, user_id)
+        ))
+
+    def prune(self, max_age: float) -> None:
+        """Queue removal of finished tasks and expired sessions older than max_age seconds"""
+        cutoff = time.time() - max_age
+        self._queue.put(("DELETE FROM tasks WHERE status != 'pending' AND finished_at < ?", (cutoff,)))
+        self._queue.put(("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)))
+        self._queue.put(("DELETE FROM submissions WHERE submitted_at < ?", (cutoff,)))
+
+    def load_sessions(self) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """Read unexpired sessions as (user_id, state, data, expires_at)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT user_id, state, data, expires_at FROM sessions WHERE expires_at > ?",
+                (time.time(),)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(user_id, state, json.loads(data), expires_at)
+                for user_id, state, data, expires_at in rows]
+
+    def load_pending_tasks(self) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """Read undelivered tasks as (task_id, user_id, target, submitted_at)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT task_id, user_id, target, submitted_at FROM tasks WHERE status = 'pending'"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(task_id, user_id, json.loads(target), submitted_at)
+                for task_id, user_id, target, submitted_at in rows]
+
+    def find_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a task by ID, returning its status and submission time"""
+        self.flush()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT status, submitted_at FROM tasks WHERE task_id = ? "
+                "ORDER BY status = 'pending' DESC LIMIT 1",
+                (task_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return {'status': row[0], 'submitted_at': row[1]} if row else None
+
+    def find_submission(self, external_task_id: str) -> Optional[str]:
+        """Look up the provider task ID of an external_task_id"""
+        self.flush()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT task_id FROM submissions WHERE external_task_id = ?",
+                (external_task_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until everything queued so far is committed"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """Commit pending writes and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(10)
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch, waiters, stopping = [], [], False
+                deadline = time.time() + self.flush_interval
+                while True:
+                    if item is None:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        # Someone is waiting on a flush, commit right away
+                        waiters.append(item)
+                        break
+                    else:
+                        batch.append(item)
+                    if stopping or len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.time()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    try:
+                        with conn:
+                            for statement, params in batch:
+                                conn.execute(statement, params)
+                    except sqlite3.Error as e:
+                        logger.error(f"[Image2Video] Failed to write journal batch of {len(batch)}: {e}")
+                for waiter in waiters:
+                    waiter.set()
+                if stopping:
+                    return
+        finally:
+            conn.close()
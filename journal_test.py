@@ -0,0 +1,44 @@
+import time
+from .journal import TaskJournal
+
+def test_sessions_and_tasks_survive_reopen(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    journal = TaskJournal(path)
+    journal.save_session('user', 'WAITING_FOR_PROMPT', {'image_url': 'url'}, time.time() + 60)
+    journal.save_session('gone', 'WAITING_FOR_IMAGE', {}, time.time() + 60)
+    journal.remove_session('gone')
+    journal.record_task('task-1', 'user', {'receiver': 'user'}, 100.0)
+    journal.record_task('task-2', 'user', {'receiver': 'user'}, 200.0)
+    journal.finish_task('task-2', 'user', 'succeed')
+    journal.close()
+    
+    journal = TaskJournal(path)
+    try:
+        assert journal.load_sessions() == [
+            ('user', 'WAITING_FOR_PROMPT', {'image_url': 'url'}, journal.load_sessions()[0][3])]
+        assert journal.load_pending_tasks() == [('task-1', 'user', {'receiver': 'user'}, 100.0)]
+        assert journal.find_task('task-2')['status'] == 'succeed'
+        assert journal.find_task('missing') is None
+    finally:
+        journal.close()
+
+def test_flush_commits_queued_writes(tmp_path):
+    journal = TaskJournal(str(tmp_path / 'journal.db'), flush_interval=10)
+    try:
+        for i in range(100):
+            journal.record_task(f'task-{i}', 'user', {}, float(i))
+        assert journal.flush()
+        assert len(journal.load_pending_tasks()) == 100
+    finally:
+        journal.close()
+
+def test_submissions_map_external_ids_to_tasks(tmp_path):
+    journal = TaskJournal(str(tmp_path / 'journal.db'))
+    try:
+        journal.record_submission('ext-1', 'task-1')
+        assert journal.find_submission('ext-1') == 'task-1'
+        assert journal.find_submission('ext-2') is None
+        journal.prune(max_age=-1)
+        assert journal.find_submission('ext-1') is None
+    finally:
+        journal.close()
@@ -1,5 +1,6 @@
 from typing import Optional, Dict, Any
 from enum import Enum, auto
+import threading
 from common.log import logger
 
 class LifecycleState(Enum):
@@ -19,11 +20,15 @@ class Lifecycle:
     - STARTED: Active and processing
     - PAUSED: Temporarily suspended
     - STOPPED: Resources released
+    
+    While STARTED or PAUSED, ``reload`` applies new configuration in place
+    without changing state.
     """
     
     def __init__(self):
         self._state = LifecycleState.UNINITIALIZED
         self._metadata: Dict[str, Any] = {}
+        self._reload_lock = threading.Lock()
     
     @property
     def state(self) -> LifecycleState:
@@ -87,6 +92,23 @@ class Lifecycle:
             logger.error(f"Resume failed: {e}")
             raise
     
+    def reload(self, **kwargs) -> None:
+        """Apply new configuration while running
+        
+        Reloads are serialized; a failed reload leaves the previous
+        configuration in effect.
+        """
+        if not self.is_active:
+            raise RuntimeError("Can only reload when started or paused")
+            
+        with self._reload_lock:
+            try:
+                self._do_reload(**kwargs)
+                logger.info("Lifecycle reloaded")
+            except Exception as e:
+                logger.error(f"Reload failed: {e}")
+                raise
+    
     def stop(self) -> None:
         """Stop processing and release resources"""
         if not self.is_active and self._state != LifecycleState.INITIALIZED:
@@ -116,6 +138,10 @@ class Lifecycle:
         """Override to implement resume logic"""
         pass
     
+    def _do_reload(self, **kwargs) -> None:
+        """Override to implement reload logic"""
+        pass
+    
     def _do_stop(self) -> None:
         """Override to implement stop logic"""
         pass
@@ -0,0 +1,484 @@
+"""End-to-end load test of the plugin against local ImgBB and Kling stand-ins
+
+Run from the chatgpt-on-wechat root so the framework modules import:
+
+    python -m plugins.image2video.loadtest --users 50 --flows 2 --latency 0.2
+
+Every simulated user goes through the full "动起来" -> image -> prompt
+dialogue and waits for the video reply. The report covers throughput,
+latency percentiles of each stage and memory use.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import abc
+import argparse
+import gc
+import itertools
+import json
+import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from .scheduler import TokenBucket
+
+class StubServer(abc.ABC):
+    """Local HTTP server with configurable latency, error rate and rate limit
+
+    Each request waits ``latency`` seconds (plus up to ``jitter``), is
+    rejected with 429 beyond ``rate_limit`` requests per second, and fails
+    with 500 at ``error_rate``. HEAD requests, used for connection warm-up,
+    are answered at once.
+    """
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 rate_limit: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._bucket = TokenBucket(rate_limit, max(1.0, rate_limit)) if rate_limit > 0 else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'requests': 0, 'errors': 0, 'rate_limited': 0}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubServer':
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self) -> None:
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self) -> None:
+                stub._serve(self, None)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                stub._serve(self, self.rfile.read(length))
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _serve(self, request: BaseHTTPRequestHandler, body: Optional[bytes]) -> None:
+        with self._lock:
+            self.stats['requests'] += 1
+            limited = self._bucket is not None and self._bucket.wait_time(time.time()) > 0
+            if self._bucket is not None and not limited:
+                self._bucket.take(time.time())
+            failed = not limited and self._random.random() < self.error_rate
+            delay = self.latency + self._random.random() * self.jitter
+            if limited:
+                self.stats['rate_limited'] += 1
+            elif failed:
+                self.stats['errors'] += 1
+        time.sleep(delay)
+        if limited:
+            status, payload = 429, {'code': 1302, 'message': 'Rate limit exceeded'}
+        elif failed:
+            status, payload = 500, {'code': 5000, 'message': 'Injected server error'}
+        else:
+            status, payload = self.handle(request.command, request.path, body)
+        if isinstance(payload, bytes):
+            data, content_type = payload, 'application/octet-stream'
+        else:
+            data, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    @abc.abstractmethod
+    def handle(self, method: str, path: str, body: Optional[bytes]) -> Tuple[int, Any]:
+        """Build the status and JSON payload, or raw bytes, of a request that was not rejected"""
+
+class StubImgBB(StubServer):
+    """Stand-in for the ImgBB upload API"""
+
+    upload_path = "/1/upload"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._ids = itertools.count(1)
+
+    def handle(self, method: str, path: str, body: Optional[bytes]) -> Tuple[int, Dict[str, Any]]:
+        if method != 'POST' or urlparse(path).path != self.upload_path or not body:
+            return 400, {'success': False, 'error': {'message': 'Bad request'}}
+        return 200, {'success': True, 'data': {'url': f"{self.url}/i/{next(self._ids)}.jpg"}}
+
+class StubKling(StubServer):
+    """Stand-in for the Kling image-to-video submit, query and list APIs
+
+    Tasks report ``processing`` until ``task_seconds`` after submission and
+    then ``succeed``; ``external_task_id`` is kept unique as the real API does.
+    Result videos of ``video_size`` random bytes are served from ``/v/``.
+    Submissions with a ``callback_url`` get the finished task data POSTed
+    to it once they succeed.
+    """
+
+    api_path = "/v1/videos/image2video"
+
+    def __init__(self, task_seconds: float = 2.0, video_size: int = 1_000_000, **kwargs):
+        super().__init__(**kwargs)
+        self.task_seconds = task_seconds
+        self.video = os.urandom(video_size)
+        self._ids = itertools.count(1)
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._external: Dict[str, str] = {}
+        self.stats['callbacks'] = 0
+
+    @property
+    def api_url(self) -> str:
+        return self.url + self.api_path
+
+    def _task_data(self, task_id: str) -> Dict[str, Any]:
+        task = self._tasks[task_id]
+        done = time.time() - task['created_at'] >= self.task_seconds
+        data = {'task_id': task_id, 'external_task_id': task['external_task_id'],
+                'task_info': {'external_task_id': task['external_task_id']},
+                'task_status': 'succeed' if done else 'processing',
+                'created_at': int(task['created_at'] * 1000)}
+        if done:
+            data['task_result'] = {'videos': [{'id': task_id, 'url': f"{self.url}/v/{task_id}.mp4"}]}
+        return data
+
+    def handle(self, method: str, path: str, body: Optional[bytes]) -> Tuple[int, Any]:
+        parsed = urlparse(path)
+        if method == 'GET' and parsed.path.startswith('/v/'):
+            return 200, self.video
+        if not parsed.path.startswith(self.api_path):
+            return 404, {'code': 1203, 'message': 'Not found'}
+        with self._lock:
+            if method == 'POST':
+                request = json.loads(body or b'{}')
+                if not request.get('image') or not request.get('prompt'):
+                    return 400, {'code': 1201, 'message': 'Invalid request'}
+                external_task_id = request.get('external_task_id')
+                if external_task_id and external_task_id in self._external:
+                    return 400, {'code': 1201, 'message': 'Duplicate external_task_id'}
+                task_id = f"task-{next(self._ids)}"
+                self._tasks[task_id] = {'created_at': time.time(), 'external_task_id': external_task_id}
+                if external_task_id:
+                    self._external[external_task_id] = task_id
+                if request.get('callback_url'):
+                    timer = threading.Timer(self.task_seconds, self._send_callback,
+                                            (task_id, request['callback_url']))
+                    timer.daemon = True
+                    timer.start()
+                return 200, {'code': 0, 'data': {'task_id': task_id, 'task_status': 'submitted'}}
+
+            task_id = parsed.path[len(self.api_path):].strip('/')
+            if task_id:
+                task_id = self._external.get(task_id, task_id)
+                if task_id not in self._tasks:
+                    return 404, {'code': 1203, 'message': 'Task not found'}
+                return 200, {'code': 0, 'data': self._task_data(task_id)}
+
+            query = parse_qs(parsed.query)
+            page = int(query.get('pageNum', ['1'])[0])
+            size = int(query.get('pageSize', ['30'])[0])
+            newest = list(self._tasks)[::-1][(page - 1) * size:page * size]
+            return 200, {'code': 0, 'data': [self._task_data(task_id) for task_id in newest]}
+
+    def _send_callback(self, task_id: str, url: str) -> None:
+        with self._lock:
+            data = json.dumps(self._task_data(task_id)).encode('utf-8')
+            self.stats['callbacks'] += 1
+        request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except OSError:
+            # Like the real API the stub does not retry; the plugin falls back to polling
+            pass
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Summary statistics of a list of durations in seconds"""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {'count': len(ordered), 'mean': sum(ordered) / len(ordered),
+            'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99), 'max': ordered[-1]}
+
+class _Channel:
+    """Collects asynchronous replies per receiver"""
+
+    def __init__(self):
+        self.inboxes: Dict[str, queue.Queue] = {}
+
+    def inbox(self, user_id: str) -> queue.Queue:
+        return self.inboxes.setdefault(user_id, queue.Queue())
+
+    def send(self, reply: Any, context: Any) -> None:
+        self.inbox(context.get('receiver')).put((time.perf_counter(), reply))
+
+class FakeImage(dict):
+    """itchat-style raw message whose download returns the image bytes"""
+
+    def __init__(self, data: bytes):
+        super().__init__(FileName='loadtest.jpg')
+        self.data = data
+
+    def download(self, path: Optional[str]) -> Optional[bytes]:
+        if path is None:
+            return self.data
+        with open(path, 'wb') as file:
+            file.write(self.data)
+        return None
+
+class FakeMessage:
+    def __init__(self, user_id: str, raw: Any = None):
+        self.from_user_id = user_id
+        self._rawmsg = raw if raw is not None else {}
+
+def run_load(users: int = 20,
+             flows: int = 1,
+             image_size: int = 200_000,
+             timeout: float = 120.0,
+             ramp_up: float = 1.0,
+             config: Optional[Dict[str, Any]] = None,
+             imgbb: Optional[Dict[str, Any]] = None,
+             kling: Optional[Dict[str, Any]] = None,
+             trace_memory: bool = False) -> Dict[str, Any]:
+    """Drive concurrent users through the plugin and collect measurements
+
+    Args:
+        users: Number of simulated chat users
+        flows: Dialogues each user runs one after another
+        image_size: Bytes of the random image each user sends
+        timeout: Seconds to wait for each asynchronous reply
+        ramp_up: Seconds over which users start
+        config: Plugin config overrides
+        imgbb: StubImgBB options
+        kling: StubKling options
+        trace_memory: Track Python allocations with tracemalloc (slower)
+
+    Returns:
+        Report dict with throughput, stage latency percentiles, reply
+        counts, stub server stats and memory use
+    """
+    from bridge.context import Context, ContextType
+    from bridge.reply import ReplyType
+    from .plugin import Image2Video
+
+    imgbb_server = StubImgBB(**(imgbb or {})).start()
+    kling_server = StubKling(**(kling or {})).start()
+    video_dir = tempfile.mkdtemp(prefix='image2video-loadtest-')
+    plugin_config = {
+        'api_url': kling_server.api_url,
+        'ak': 'loadtest-access-key', 'sk': 'loadtest-secret-key-0123456789abcdef',
+        'imgbb_api_key': 'loadtest',
+        'image_storage': {'backend': 'imgbb', 'upload_url': imgbb_server.url + StubImgBB.upload_path},
+        'user_tasks_per_minute': 600, 'user_task_burst': 100,
+        'max_concurrent_tasks': max(10, users), 'max_queued_tasks': 10 * users * flows,
+        'max_queue_depth': 4 * users,
+        'poll_expected_seconds': kling_server.task_seconds,
+        'poll_min_interval': 0.2, 'poll_max_interval': 1,
+        'dedup_window': 0, 'upload_cache_size': 0, 'image_max_edge': 0,
+        'journal_file': '', 'config_watch': False, 'warmup_interval': 0,
+        'video_download_dir': video_dir, 'video_cache_dir': video_dir,
+    }
+    plugin_config.update(config or {})
+
+    class LoadTestPlugin(Image2Video):
+        def _load_config(self) -> Dict[str, Any]:
+            return dict(plugin_config)
+
+    if trace_memory:
+        tracemalloc.start()
+    gc.collect()
+    plugin = LoadTestPlugin()
+    plugin.start()
+    channel = _Channel()
+    stages: Dict[str, List[float]] = {'handle_context': [], 'image_to_prompt_request': [],
+                                      'prompt_to_started': [], 'prompt_to_video': [], 'flow': []}
+    outcomes: Dict[str, int] = {'completed': 0, 'failed': 0, 'timed_out': 0, 'rejected': 0}
+    lock = threading.Lock()
+
+    def handle(user_id: str, context_type: Any, content: str, raw: Any = None) -> Any:
+        context = Context(context_type, content, {'msg': FakeMessage(user_id, raw),
+                                                  'receiver': user_id, 'isgroup': False,
+                                                  'session_id': user_id})
+        e_context = {'context': context, 'channel': channel}
+        started = time.perf_counter()
+        plugin.on_handle_context(e_context)
+        elapsed = time.perf_counter() - started
+        with lock:
+            stages['handle_context'].append(elapsed)
+        return e_context.get('reply')
+
+    def wait_reply(user_id: str) -> Tuple[float, Any]:
+        return channel.inbox(user_id).get(timeout=timeout)
+
+    def run_user(index: int) -> None:
+        user_id = f"loadtest-user-{index}"
+        image = FakeImage(os.urandom(image_size))
+        time.sleep(ramp_up * index / max(1, users))
+        for _ in range(flows):
+            outcome = 'failed'
+            try:
+                flow_started = time.perf_counter()
+                handle(user_id, ContextType.TEXT, plugin.command_prefix)
+                reply = handle(user_id, ContextType.IMAGE, 'loadtest.jpg', image)
+                if reply is None or reply.type != ReplyType.TEXT:
+                    outcome = 'rejected'
+                    continue
+                image_sent = time.perf_counter()
+                at, reply = wait_reply(user_id)
+                if reply.type != ReplyType.TEXT:
+                    continue
+                prompt_sent = time.perf_counter()
+                reply = handle(user_id, ContextType.TEXT, 'a cat turning its head')
+                if reply is None or reply.type != ReplyType.TEXT:
+                    outcome = 'rejected'
+                    continue
+                started_at, started = wait_reply(user_id)
+                if started.type != ReplyType.TEXT:
+                    continue
+                done_at, video = wait_reply(user_id)
+                if video.type not in (ReplyType.VIDEO, ReplyType.VIDEO_URL):
+                    continue
+                outcome = 'completed'
+                with lock:
+                    stages['image_to_prompt_request'].append(at - image_sent)
+                    stages['prompt_to_started'].append(started_at - prompt_sent)
+                    stages['prompt_to_video'].append(done_at - prompt_sent)
+                    stages['flow'].append(done_at - flow_started)
+            except queue.Empty:
+                outcome = 'timed_out'
+            finally:
+                with lock:
+                    outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=run_user, args=(index,), daemon=True) for index in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    report: Dict[str, Any] = {
+        'users': users,
+        'flows': users * flows,
+        'duration_seconds': duration,
+        'throughput_per_second': outcomes['completed'] / duration if duration else 0.0,
+        'outcomes': outcomes,
+        'latency': {name: percentiles(values) for name, values in stages.items()},
+        'servers': {'imgbb': imgbb_server.stats, 'kling': kling_server.stats},
+        'memory': _memory_usage(trace_memory),
+    }
+    plugin.stop()
+    imgbb_server.stop()
+    kling_server.stop()
+    shutil.rmtree(video_dir, ignore_errors=True)
+    if trace_memory:
+        tracemalloc.stop()
+    return report
+
+def _memory_usage(traced: bool) -> Dict[str, float]:
+    usage: Dict[str, float] = {}
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if os.uname().sysname == 'Darwin' else 1024
+        usage['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    except (ImportError, AttributeError):
+        pass
+    if traced:
+        current, peak = tracemalloc.get_traced_memory()
+        usage['traced_current_mb'] = current / 2 ** 20
+        usage['traced_peak_mb'] = peak / 2 ** 20
+    return usage
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a run_load report as a text table"""
+    lines = [
+        f"users={report['users']} flows={report['flows']} "
+        f"duration={report['duration_seconds']:.1f}s "
+        f"throughput={report['throughput_per_second']:.2f} flows/s",
+        "outcomes: " + ", ".join(f"{name}={count}" for name, count in report['outcomes'].items()),
+        f"{'stage':<26}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    for name, stats in report['latency'].items():
+        if not stats['count']:
+            lines.append(f"{name:<26}{0:>7}")
+            continue
+        lines.append(f"{name:<26}{stats['count']:>7}" + "".join(
+            f"{stats[key] * 1000:>7.0f}ms" for key in ('mean', 'p50', 'p95', 'p99', 'max')))
+    for name, stats in report['servers'].items():
+        lines.append(f"{name}: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+    lines.append("memory: " + ", ".join(f"{key}={value:.1f}" for key, value in report['memory'].items()))
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the Image2Video plugin against local API stand-ins")
+    parser.add_argument('--users', type=int, default=20, help="concurrent chat users")
+    parser.add_argument('--flows', type=int, default=1, help="dialogues per user")
+    parser.add_argument('--image-size', type=int, default=200_000, help="image bytes per upload")
+    parser.add_argument('--ramp-up', type=float, default=1.0, help="seconds over which users start")
+    parser.add_argument('--timeout', type=float, default=120.0, help="seconds to wait for each reply")
+    parser.add_argument('--latency', type=float, default=0.05, help="stub response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.05, help="extra random latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of stub requests failing with 500")
+    parser.add_argument('--imgbb-rate-limit', type=float, default=0.0, help="ImgBB requests per second, 0 for none")
+    parser.add_argument('--kling-rate-limit', type=float, default=0.0, help="Kling requests per second, 0 for none")
+    parser.add_argument('--task-seconds', type=float, default=2.0, help="seconds until a stub video task succeeds")
+    parser.add_argument('--video-size', type=int, default=1_000_000, help="bytes of each result video")
+    parser.add_argument('--callback-port', type=int, default=0,
+                        help="local port for task completion callbacks, 0 to poll only")
+    parser.add_argument('--config', help="JSON file with plugin config overrides")
+    parser.add_argument('--trace-memory', action='store_true', help="track allocations with tracemalloc")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.callback_port:
+        config.update(callback_url=f"http://127.0.0.1:{args.callback_port}/image2video/callback",
+                      callback_host='127.0.0.1', callback_port=args.callback_port)
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as file:
+            config.update(json.load(file))
+    stub = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    report = run_load(users=args.users, flows=args.flows, image_size=args.image_size,
+                      timeout=args.timeout, ramp_up=args.ramp_up, config=config,
+                      imgbb=dict(stub, rate_limit=args.imgbb_rate_limit),
+                      kling=dict(stub, rate_limit=args.kling_rate_limit, task_seconds=args.task_seconds,
+                                 video_size=args.video_size),
+                      trace_memory=args.trace_memory)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import time
+import pytest
+import requests
+from .loadtest import StubImgBB, StubKling, StubServer, percentiles
+
+def test_kling_stub_runs_tasks_to_completion():
+    kling = StubKling(latency=0, task_seconds=0.2).start()
+    try:
+        response = requests.post(kling.api_url, json={'image': 'http://x/a.jpg', 'prompt': 'p',
+                                                      'external_task_id': 'ext-1'})
+        task_id = response.json()['data']['task_id']
+        duplicate = requests.post(kling.api_url, json={'image': 'http://x/a.jpg', 'prompt': 'p',
+                                                       'external_task_id': 'ext-1'})
+        assert duplicate.status_code == 400
+
+        assert requests.get(f"{kling.api_url}/ext-1").json()['data']['task_status'] == 'processing'
+        time.sleep(0.25)
+        task = requests.get(f"{kling.api_url}/{task_id}").json()['data']
+        assert task['task_status'] == 'succeed'
+        assert task['task_result']['videos'][0]['url'].endswith(f"{task_id}.mp4")
+
+        listed = requests.get(kling.api_url, params={'pageNum': 1, 'pageSize': 10}).json()['data']
+        assert [item['task_id'] for item in listed] == [task_id]
+    finally:
+        kling.stop()
+
+def test_imgbb_stub_rate_limits_and_injects_errors():
+    imgbb = StubImgBB(latency=0, rate_limit=2).start()
+    try:
+        url = imgbb.url + StubImgBB.upload_path
+        statuses = [requests.post(url, data={'image': 'aGVsbG8='}).status_code for _ in range(5)]
+        assert statuses[:2] == [200, 200]
+        assert 429 in statuses
+        assert imgbb.stats['rate_limited'] == statuses.count(429)
+    finally:
+        imgbb.stop()
+
+    failing = StubImgBB(latency=0, error_rate=1).start()
+    try:
+        assert requests.post(failing.url + StubImgBB.upload_path, data={'image': 'x'}).status_code == 500
+        assert failing.stats == {'requests': 1, 'errors': 1, 'rate_limited': 0}
+    finally:
+        failing.stop()
+
+def test_percentiles():
+    stats = percentiles([float(value) for value in range(1, 101)])
+    assert stats['count'] == 100
+    assert stats['p50'] == 51
+    assert stats['p99'] == 100
+    assert percentiles([]) == {'count': 0}
+
+def test_stub_servers_must_implement_handle():
+    with pytest.raises(TypeError):
+        StubServer()
@@ -0,0 +1,45 @@
+import urllib.request
+from .metrics import MetricsRegistry
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.inc("calls_total")
+    with registry.timer("call_seconds"):
+        pass
+    
+    assert registry.snapshot() == {'counters': {}, 'histograms': {}}
+
+def test_histogram_quantiles_and_counters():
+    registry = MetricsRegistry(enabled=True, buckets=(0.1, 0.2, 0.5, 1.0))
+    for _ in range(90):
+        registry.observe("call_seconds", 0.05, step="upload")
+    for _ in range(10):
+        registry.observe("call_seconds", 0.8, step="upload")
+    registry.inc("calls_total", step="upload")
+    registry.inc("calls_total", 2, step="upload")
+    
+    snapshot = registry.snapshot()
+    histogram = snapshot['histograms']['call_seconds'][0]
+    
+    assert histogram['labels'] == {'step': 'upload'}
+    assert histogram['count'] == 100
+    assert histogram['p50'] <= 0.1
+    assert 0.5 < histogram['p99'] <= 0.8
+    assert snapshot['counters']['calls_total'] == [{'labels': {'step': 'upload'}, 'value': 3.0}]
+
+def test_prometheus_endpoint():
+    registry = MetricsRegistry(enabled=True, buckets=(0.1, 1.0))
+    registry.observe("call_seconds", 0.5, host='api.example.com')
+    registry.inc("calls_total", step='say "hi"')
+    port = registry.start_server(port=0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            text = response.read().decode('utf-8')
+    finally:
+        registry.stop_server()
+    
+    assert '# TYPE call_seconds histogram' in text
+    assert 'call_seconds_bucket{host="api.example.com",le="0.1"} 0' in text
+    assert 'call_seconds_bucket{host="api.example.com",le="1"} 1' in text
+    assert 'call_seconds_count{host="api.example.com"} 1' in text
+    assert 'calls_total{step="say \\"hi\\""} 1.0' in text
@@ -0,0 +1,52 @@
+import os
+from email.parser import BytesParser
+from email.policy import HTTP
+from .multipart import MultipartBody
+
+def read_all(body, size=7):
+    chunks = []
+    while True:
+        chunk = body.read(size)
+        if not chunk:
+            return b''.join(bytes(part) for part in chunks)
+        chunks.append(chunk)
+
+def test_layout_and_boundary():
+    body = MultipartBody(fields={'key': 'abc'},
+                         files={'image': ('a.jpg', b'\x00\xffdata', 'image/jpeg')},
+                         boundary='XYZ')
+    assert body.content_type == 'multipart/form-data; boundary=XYZ'
+    assert read_all(body) == (
+        b'--XYZ\r\n'
+        b'Content-Disposition: form-data; name="key"\r\n\r\n'
+        b'abc\r\n'
+        b'--XYZ\r\n'
+        b'Content-Disposition: form-data; name="image"; filename="a.jpg"\r\n'
+        b'Content-Type: image/jpeg\r\n\r\n'
+        b'\x00\xffdata\r\n'
+        b'--XYZ--\r\n'
+    )
+
+def test_length_matches_streamed_bytes():
+    data = os.urandom(100_003)
+    body = MultipartBody(fields={'a': 'b'}, files={'image': ('image', memoryview(data))})
+    streamed = read_all(body, size=4096)
+    assert len(body) == len(streamed) == body.tell()
+    assert body.read(10) == b''
+
+def test_parses_as_multipart_form():
+    data = os.urandom(5000)
+    body = MultipartBody(fields={'key': 'value'}, files={'image': ('image', data)})
+    message = BytesParser(policy=HTTP).parsebytes(
+        f'Content-Type: {body.content_type}\r\n\r\n'.encode() + read_all(body, size=1000))
+    parts = {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+             for part in message.iter_parts()}
+    assert parts == {'key': b'value', 'image': data}
+
+def test_seek_rewinds_for_retries():
+    body = MultipartBody(files={'image': ('image', b'x' * 50)}, boundary='b')
+    first = read_all(body)
+    assert body.seek(0) == 0
+    assert read_all(body, size=3) == first
+    body.seek(-8, os.SEEK_END)
+    assert read_all(body) == first[-8:]
@@ -1,6 +1,10 @@
-from typing import List, Callable, Dict, Any, Optional
+from typing import List, Callable, Dict, Any, Optional, Sequence, Union
 from dataclasses import dataclass, field
+import asyncio
+import inspect
+import time
 from common.log import logger
+from .metrics import metrics
 
 @dataclass
 class PipelineContext:
@@ -9,11 +13,23 @@ class PipelineContext:
     metadata: Dict[str, Any] = field(default_factory=dict)
     errors: List[Exception] = field(default_factory=list)
 
+@dataclass
+class StepOptions:
+    """Scheduling options of a pipeline step used by run_async and run_batch"""
+    name: str
+    depends_on: Optional[Sequence[str]] = None
+    timeout: Optional[float] = None
+    batch: Optional[Callable] = None
+
 class Pipeline:
     """Pipeline for processing steps in sequence
     
     Provides a flexible way to chain processing steps together while
     maintaining context and error handling between steps.
+    
+    Steps may also declare dependencies and timeouts; ``run_async`` uses
+    them to run independent steps concurrently, while ``run`` keeps
+    executing all steps in the order they were added.
     """
     
     def __init__(self, name: str, steps: Optional[List[Callable]] = None):
@@ -26,17 +42,34 @@ class Pipeline:
         self.name = name
         self.steps: List[Callable] = steps if steps else []
         self._error_handlers: Dict[type, Callable] = {}
+        self._step_options: Dict[int, StepOptions] = {}
         
-    def add_step(self, step: Callable) -> 'Pipeline':
+    def add_step(self,
+                 step: Callable,
+                 name: Optional[str] = None,
+                 depends_on: Optional[Sequence[str]] = None,
+                 timeout: Optional[float] = None,
+                 batch: Optional[Callable] = None) -> 'Pipeline':
         """Add a processing step to the pipeline
         
         Args:
-            step: Callable that takes a PipelineContext and returns modified PipelineContext
+            step: Callable (or coroutine function) that takes a PipelineContext
+                and returns modified PipelineContext
+            name: Step name used in dependencies, defaults to the function name
+            depends_on: Names of steps that must finish first in run_async;
+                None means the previously added step, an empty list means none
+            timeout: Seconds the step may take in run_async
+            batch: Optional batched implementation used by run_batch; takes a
+                list of contexts and returns a list of the same length holding
+                each item's resulting context or the exception it raised
             
         Returns:
             Self for method chaining
         """
         self.steps.append(step)
+        self._step_options[len(self.steps) - 1] = StepOptions(
+            name=name or step.__name__, depends_on=depends_on,
+            timeout=timeout, batch=batch)
         return self
         
     def add_error_handler(self, 
@@ -96,17 +129,217 @@ class Pipeline:
         )
         
         logger.info(f"Starting pipeline: {self.name}")
+        started = time.perf_counter()
         
         for step in self.steps:
             try:
                 logger.debug(
                     f"Running step {step.__name__} in pipeline {self.name}")
-                context = step(context)
+                with metrics.timer("pipeline_step_duration_seconds",
+                                   pipeline=self.name, step=step.__name__):
+                    context = step(context)
             except Exception as e:
+                self._count_step_error(step.__name__, e)
                 context = self.handle_error(e, context)
                 if context.errors:
                     break
                     
+        self._count_run(context, started)
+        logger.info(
+            f"Completed pipeline: {self.name} with {len(context.errors)} errors")
+        return context
+        
+    def _count_step_error(self, step_name: str, error: Exception) -> None:
+        metrics.inc("pipeline_step_errors_total",
+                    pipeline=self.name, step=step_name, error=type(error).__name__)
+        
+    def _count_run(self, context: PipelineContext, started: float) -> None:
+        if not metrics.enabled:
+            return
+        metrics.observe("pipeline_duration_seconds", time.perf_counter() - started,
+                        pipeline=self.name)
+        metrics.inc("pipeline_runs_total", pipeline=self.name,
+                    status="error" if context.errors else "ok")
+
+    def run_batch(self, items: List[Optional[Dict[str, Any]]]) -> List[PipelineContext]:
+        """Run all pipeline steps over several items together
+        
+        Each step sees every item that has no errors yet. Steps with a batched
+        implementation get all of those items in one call; the others are
+        called once per item. An error only affects the item that raised it
+        and goes through the registered error handlers as in run.
+        
+        Args:
+            items: Initial data of each item
+            
+        Returns:
+            Final context of each item, in the order of items
+        """
+        contexts = [
+            PipelineContext(
+                data=data if data is not None else {},
+                metadata={"pipeline_name": self.name}
+            )
+            for data in items
+        ]
+        if not contexts:
+            return contexts
+        
+        logger.info(f"Starting pipeline: {self.name} for {len(contexts)} items")
+        started = time.perf_counter()
+        
+        for index, step in enumerate(self.steps):
+            active = [i for i, context in enumerate(contexts) if not context.errors]
+            if not active:
+                break
+            options = self._step_options.get(index)
+            logger.debug(
+                f"Running step {step.__name__} in pipeline {self.name} for {len(active)} items")
+            
+            results: List[Union[PipelineContext, Exception]]
+            if options and options.batch:
+                try:
+                    with metrics.timer("pipeline_batch_step_duration_seconds",
+                                       pipeline=self.name, step=step.__name__):
+                        results = options.batch([contexts[i] for i in active])
+                    if len(results) != len(active):
+                        raise RuntimeError(
+                            f"Batched step {options.name} returned {len(results)} "
+                            f"results for {len(active)} items")
+                except Exception as e:
+                    results = [e] * len(active)
+            else:
+                results = []
+                for i in active:
+                    try:
+                        with metrics.timer("pipeline_step_duration_seconds",
+                                           pipeline=self.name, step=step.__name__):
+                            results.append(step(contexts[i]))
+                    except Exception as e:
+                        results.append(e)
+                        
+            for i, result in zip(active, results):
+                if isinstance(result, Exception):
+                    self._count_step_error(step.__name__, result)
+                    contexts[i] = self.handle_error(result, contexts[i])
+                else:
+                    contexts[i] = result
+                    
+        for context in contexts:
+            self._count_run(context, started)
+        failed = sum(1 for context in contexts if context.errors)
+        logger.info(
+            f"Completed pipeline: {self.name} for {len(contexts)} items with {failed} failed")
+        return contexts
+        
+    def _step_graph(self) -> List[tuple]:
+        """Resolve steps into (step, options, dependency names) in insertion order"""
+        graph = []
+        names = set()
+        previous = None
+        for index, step in enumerate(self.steps):
+            options = self._step_options.get(index) or StepOptions(name=step.__name__)
+            if options.name in names:
+                raise ValueError(f"Duplicate step name {options.name} in pipeline {self.name}")
+            if options.depends_on is None:
+                depends_on = [previous] if previous else []
+            else:
+                depends_on = list(options.depends_on)
+            # Dependencies must be added earlier, which also rules out cycles
+            unknown = [dep for dep in depends_on if dep not in names]
+            if unknown:
+                raise ValueError(
+                    f"Step {options.name} in pipeline {self.name} depends on unknown "
+                    f"or later steps: {', '.join(unknown)}")
+            names.add(options.name)
+            graph.append((step, options, depends_on))
+            previous = options.name
+        return graph
+        
+    async def _run_step(self,
+                        step: Callable,
+                        options: StepOptions,
+                        context: PipelineContext) -> PipelineContext:
+        """Run one step, in a worker thread if it is synchronous"""
+        logger.debug(
+            f"Running step {options.name} in pipeline {self.name}")
+        if inspect.iscoroutinefunction(step):
+            call = step(context)
+        else:
+            # Timeouts cannot interrupt the worker thread, only stop waiting for it
+            call = asyncio.get_running_loop().run_in_executor(None, step, context)
+        
+        async def complete() -> PipelineContext:
+            result = await call
+            # A sync step may hand back an awaitable; it shares the step's timeout
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+            
+        with metrics.timer("pipeline_step_duration_seconds",
+                           pipeline=self.name, step=options.name):
+            return await asyncio.wait_for(complete(), options.timeout)
+        
+    async def run_async(self, initial_data: Optional[Dict[str, Any]] = None) -> PipelineContext:
+        """Run pipeline steps concurrently as their dependencies complete
+        
+        Steps whose dependencies have finished run at the same time and share
+        one context. Errors go through the registered error handlers exactly
+        as in run; once the context holds errors, running steps are cancelled
+        and no further steps start. Cancelling the awaiting task cancels all
+        running steps.
+        
+        Args:
+            initial_data: Optional initial data for the pipeline context
+            
+        Returns:
+            Final pipeline context after all steps
+        """
+        graph = self._step_graph()
+        context = PipelineContext(
+            data=initial_data if initial_data is not None else {},
+            metadata={"pipeline_name": self.name}
+        )
+        
+        logger.info(f"Starting pipeline: {self.name}")
+        started = time.perf_counter()
+        
+        waiting = list(graph)
+        finished = set()
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while waiting or running:
+                for entry in list(waiting):
+                    step, options, depends_on = entry
+                    if all(dep in finished for dep in depends_on):
+                        waiting.remove(entry)
+                        task = asyncio.ensure_future(self._run_step(step, options, context))
+                        running[task] = options.name
+                if not running:
+                    break
+                        
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        result = task.result()
+                        if isinstance(result, PipelineContext):
+                            context = result
+                        finished.add(name)
+                    except Exception as e:
+                        self._count_step_error(name, e)
+                        context = self.handle_error(e, context)
+                        if not context.errors:
+                            finished.add(name)
+                if context.errors:
+                    break
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+                    
+        self._count_run(context, started)
         logger.info(
             f"Completed pipeline: {self.name} with {len(context.errors)} errors")
         return context
@@ -136,4 +369,12 @@ def handle_validation_error(error: ValueError, context: PipelineContext):
 pipeline.add_error_handler(ValueError, handle_validation_error)
 
 result = pipeline.run({'image': image_data})
+
+# Independent steps can run concurrently with run_async:
+async def mint_token(context: PipelineContext) -> PipelineContext:
+    context.data['token'] = await fetch_token()
+    return context
+
+pipeline.add_step(mint_token, depends_on=[], timeout=5)
+result = asyncio.run(pipeline.run_async({'image': image_data}))
 """
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import pytest
+from .pipeline import Pipeline, PipelineContext
+
+def _sleeper(key, delay):
+    async def step(context: PipelineContext) -> PipelineContext:
+        await asyncio.sleep(delay)
+        context.data[key] = time.monotonic()
+        return context
+    step.__name__ = key
+    return step
+
+def test_independent_steps_run_concurrently():
+    pipeline = Pipeline("test")
+    pipeline.add_step(_sleeper('a', 0.2), depends_on=[])
+    pipeline.add_step(_sleeper('b', 0.2), depends_on=[])
+    pipeline.add_step(_sleeper('c', 0.01), depends_on=['a', 'b'])
+    
+    started = time.monotonic()
+    context = asyncio.run(pipeline.run_async())
+    
+    assert time.monotonic() - started < 0.35
+    assert not context.errors
+    assert context.data['c'] >= max(context.data['a'], context.data['b'])
+
+def test_sync_steps_default_to_sequential_order():
+    order = []
+    
+    def first(context):
+        order.append('first')
+        return context
+    
+    async def second(context):
+        order.append('second')
+        return context
+    
+    pipeline = Pipeline("test").add_step(first).add_step(second)
+    
+    assert not asyncio.run(pipeline.run_async()).errors
+    assert order == ['first', 'second']
+
+def test_timeout_cancels_running_steps():
+    cancelled = []
+    
+    async def slow(context):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return context
+    
+    pipeline = Pipeline("test")
+    pipeline.add_step(slow, depends_on=[])
+    pipeline.add_step(_sleeper('stuck', 5), timeout=0.05, depends_on=[])
+    pipeline.add_step(_sleeper('after', 0), depends_on=['stuck'])
+    
+    started = time.monotonic()
+    context = asyncio.run(pipeline.run_async())
+    
+    assert time.monotonic() - started < 1
+    assert len(context.errors) == 1
+    assert cancelled == [True]
+    assert 'after' not in context.data
+
+def test_timeout_covers_awaitable_returned_by_sync_step():
+    def slow_then_async(context):
+        time.sleep(0.15)
+        return _sleeper('late', 0.15)(context)
+    
+    pipeline = Pipeline("test").add_step(slow_then_async, timeout=0.2)
+    
+    started = time.monotonic()
+    context = asyncio.run(pipeline.run_async())
+    
+    assert len(context.errors) == 1
+    assert 'late' not in context.data
+    assert time.monotonic() - started < 0.3
+
+def test_error_handlers_match_exact_type():
+    handled = []
+    
+    def failing(context):
+        raise KeyError('image')
+    
+    def on_key_error(error, context):
+        handled.append(error)
+        return context
+    
+    pipeline = Pipeline("test").add_step(failing).add_step(_sleeper('next', 0))
+    pipeline.add_error_handler(KeyError, on_key_error)
+    
+    context = asyncio.run(pipeline.run_async())
+    
+    assert len(handled) == 1
+    assert not context.errors
+    assert 'next' in context.data
+
+def test_unknown_dependency_is_rejected():
+    pipeline = Pipeline("test").add_step(_sleeper('a', 0), depends_on=['missing'])
+    
+    with pytest.raises(ValueError):
+        asyncio.run(pipeline.run_async())
+
+def test_run_batch_uses_batched_steps_and_isolates_errors():
+    batches = []
+    
+    def check(context):
+        if context.data['value'] < 0:
+            raise ValueError("negative")
+        return context
+    
+    def double(context):
+        context.data['value'] *= 2
+        return context
+    
+    def double_batch(contexts):
+        batches.append(len(contexts))
+        return [double(context) for context in contexts]
+    
+    def on_value_error(error, context):
+        context.errors.append(error)
+        return context
+    
+    pipeline = Pipeline("test").add_step(check).add_step(double, batch=double_batch)
+    pipeline.add_error_handler(ValueError, on_value_error)
+    
+    contexts = pipeline.run_batch([{'value': 1}, {'value': -1}, {'value': 3}])
+    
+    assert batches == [2]
+    assert [context.data['value'] for context in contexts] == [2, -1, 6]
+    assert [len(context.errors) for context in contexts] == [0, 1, 0]
@@ -1,12 +1,15 @@
-from typing import Optional, Dict, Any, Union, List, Callable
+from typing import Optional, Dict, Any, Union, List, Callable, Tuple
+from collections import OrderedDict
 import requests
 import json
 import os
 import time
 import base64
-import jwt
+import functools
+import threading
+import uuid
 from datetime import datetime
-from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
 from requests.packages.urllib3.util.retry import Retry
 from bridge.context import ContextType, Context
 from bridge.reply import Reply, ReplyType
@@ -15,10 +18,32 @@ import plugins
 from .hooks import HookManager, register_hook
 from .lifecycle import Lifecycle, LifecycleState
 from .pipeline import Pipeline, PipelineContext
+from .poller import TaskPoller, TERMINAL_STATUSES
+from .executor import BoundedExecutor, QueueFullError
+from .upload_cache import UploadCache
+from .dedup import TaskDeduplicator
+from .tokens import TokenProvider
+from .storage import ImageStorage, create_storage
+from .sessions import Session, SessionState, SessionStore
+from .journal import TaskJournal
+from .scheduler import AdmissionScheduler, Ticket
+from .imaging import ImagePreprocessor
+from .metrics import metrics
+from .breaker import CircuitOpenError
+from .connections import ConnectionWarmer, KeepAliveAdapter, keepalive_socket_options
+from .watcher import ConfigWatcher
+from .download import VideoDownloader
+from .video_cache import VideoCache
+from .batch import BatchProgress, split_prompts
+from .callbacks import CallbackReceiver
 
 class AppException(Exception):
     pass
 
+class UncertainSubmitError(Exception):
+    """Raised when a submission may or may not have reached the provider"""
+    pass
+
 @plugins.register(
     name="Image2Video",
     desc="图片生成视频插件",
@@ -29,6 +54,16 @@ class AppException(Exception):
     enabled=True
 )
 class Image2Video(Lifecycle):
+    # Settings used only when building long-lived components
+    RESTART_KEYS = ('max_workers', 'max_queue_depth', 'image_workers', 'upload_cache_file',
+                    'journal_file', 'metrics_host', 'metrics_port', 'video_download',
+                    'video_download_dir', 'download_workers', 'video_cache_dir',
+                    'callback_host', 'callback_port', 'batch_workers', 'batch_queue_depth')
+    # Words after the command that start a multi-image batch
+    BATCH_KEYWORDS = ('批量', 'batch')
+    # Submissions remembered for callback checks when there is no journal
+    MAX_SUBMISSIONS = 10000
+    
     def __init__(self):
         """Initialize the Image2Video plugin with lifecycle management"""
         super().__init__()
@@ -37,15 +72,36 @@ class Image2Video(Lifecycle):
         self.config_data: Optional[Dict[str, Any]] = None
         self.command_prefix: str = "动起来"
         self.session: Optional[requests.Session] = None
+        self.task_poller: Optional[TaskPoller] = None
+        self.executor: Optional[BoundedExecutor] = None
+        self.upload_cache: Optional[UploadCache] = None
+        self.task_deduper: Optional[TaskDeduplicator] = None
+        self.token_provider: Optional[TokenProvider] = None
+        self.image_preprocessor: Optional[ImagePreprocessor] = None
+        self.storage: Optional[ImageStorage] = None
+        self.journal: Optional[TaskJournal] = None
+        self.scheduler: Optional[AdmissionScheduler] = None
+        self.connection_warmer: Optional[ConnectionWarmer] = None
+        self.config_watcher: Optional[ConfigWatcher] = None
+        self.video_downloader: Optional[VideoDownloader] = None
+        self.video_cache: Optional[VideoCache] = None
+        self.download_executor: Optional[BoundedExecutor] = None
+        self.batch_executor: Optional[BoundedExecutor] = None
+        self.callback_receiver: Optional[CallbackReceiver] = None
+        self._restored_channel: Any = None
+        # external_task_id -> provider task ID, used without a journal
+        self._submissions: "OrderedDict[str, str]" = OrderedDict()
+        self._submissions_lock = threading.Lock()
         
         # User state management
-        self.waiting_for_image: Dict[str, float] = {}   # user_id -> timestamp
-        self.waiting_for_prompt: Dict[str, float] = {}  # user_id -> timestamp
-        self.user_data: Dict[str, Dict[str, Any]] = {}  # user_id -> session data
+        self.sessions = SessionStore(on_expire=self._on_session_expired,
+                                     on_change=self._journal_session)
+        self.processing_timeout: float = 600
         
         # Initialize pipelines
         from .handlers import (
-            validate_image_data, upload_image, validate_prompt, 
+            validate_image_data, preprocess_image, preprocess_images, upload_image, upload_images,
+            validate_prompt, 
             generate_video, handle_validation_error, 
             handle_upload_error, handle_generation_error
         )
@@ -53,7 +109,8 @@ class Image2Video(Lifecycle):
         # Image upload pipeline
         self.upload_pipeline = Pipeline("image_upload")
         self.upload_pipeline.add_step(validate_image_data)
-        self.upload_pipeline.add_step(upload_image)
+        self.upload_pipeline.add_step(preprocess_image, batch=preprocess_images)
+        self.upload_pipeline.add_step(upload_image, batch=upload_images)
         self.upload_pipeline.add_error_handler(ValueError, handle_validation_error)
         self.upload_pipeline.add_error_handler(Exception, handle_upload_error)
         
@@ -70,29 +127,99 @@ class Image2Video(Lifecycle):
     def _do_initialize(self, **kwargs) -> None:
         """Initialize plugin resources and configuration"""
         try:
-            # Load configuration
-            config_path = os.path.join(os.path.dirname(__file__), "config.json")
-            if not os.path.exists(config_path):
-                raise FileNotFoundError("Configuration file not found")
-                
-            with open(config_path, 'r', encoding='utf-8') as file:
-                self.config_data = json.load(file)
-                
-            required_keys = ['api_url', 'imgbb_api_key', 'ak', 'sk']
-            missing_keys = [key for key in required_keys if not self.config_data or key not in self.config_data]
-            if missing_keys:
-                raise ValueError(f"Configuration missing required keys: {', '.join(missing_keys)}")
+            self.config_data = self._load_config()
+            
+            # Image hosting backend
+            self.storage = create_storage(self.config_data)
+            
+            # API tokens, one cached token per credential set
+            self.token_provider = self._create_token_provider(self.config_data)
             
             # Initialize session
-            self.session = requests.Session()
-            retries = Retry(
-                total=3,
-                backoff_factor=0.5,
-                status_forcelist=[500, 502, 503, 504],
-                allowed_methods=["GET", "POST"]
+            self.session = self._create_session(self.config_data)
+            
+            # Bounded worker pool for uploads and task submission
+            self.executor = BoundedExecutor(
+                max_workers=self.config_data.get('max_workers', 8),
+                max_queue_depth=self.config_data.get('max_queue_depth', 32)
+            )
+            
+            # Per-image work of batch requests; shared by all batches so
+            # concurrent batches cannot add threads beyond this pool
+            self.batch_executor = BoundedExecutor(
+                max_workers=self.config_data.get('batch_workers', 4),
+                max_queue_depth=self.config_data.get('batch_queue_depth', 32),
+                name="image2video-batch"
+            )
+            
+            # Finished videos are streamed to disk and sent as files, on
+            # their own workers so downloads never hold up polling
+            if self.config_data.get('video_download', True):
+                download_dir = os.path.join(os.getcwd(), self.config_data.get('video_download_dir', 'tmp'))
+                # Videos already sent once are kept for repeated deliveries;
+                # downloading into the cache directory keeps adding them a rename
+                if self.config_data.get('video_cache_size_mb', 1024) > 0:
+                    # Sized before load(), which evicts down to the configured cap
+                    self.video_cache = VideoCache(
+                        os.path.join(os.getcwd(), self.config_data.get('video_cache_dir', 'tmp/video_cache')),
+                        max_bytes=self.config_data.get('video_cache_size_mb', 1024) * 1024 * 1024
+                    )
+                    self.video_cache.load()
+                    download_dir = self.video_cache.directory
+                self.video_downloader = VideoDownloader(download_dir)
+                self.download_executor = BoundedExecutor(
+                    max_workers=self.config_data.get('download_workers', 2),
+                    max_queue_depth=self.config_data.get('download_queue_depth', 64),
+                    name="image2video-download"
+                )
+            
+            # Shrink large photos before upload
+            if self.config_data.get('image_max_edge', 1280) > 0:
+                self.image_preprocessor = ImagePreprocessor(
+                    max_edge=self.config_data.get('image_max_edge', 1280),
+                    quality=self.config_data.get('image_quality', 85),
+                    image_format=self.config_data.get('image_format', 'JPEG'),
+                    max_workers=self.config_data.get('image_workers', 2)
+                )
+                if not self.image_preprocessor.available:
+                    logger.warning("[Image2Video] Pillow not installed, images are uploaded without resizing")
+            
+            # Admission control in front of task submission
+            self.scheduler = AdmissionScheduler(
+                dispatch=lambda job, ticket: self.executor.submit(job, ticket),
+                expected_duration=self.config_data.get('poll_expected_seconds', 600)
             )
-            self.session.mount('http://', HTTPAdapter(max_retries=retries))
-            self.session.mount('https://', HTTPAdapter(max_retries=retries))
+            
+            # Cache of hosted image URLs keyed by image content
+            if self.config_data.get('upload_cache_size', 1024) > 0:
+                cache_file = self.config_data.get('upload_cache_file', 'upload_cache.json')
+                self.upload_cache = UploadCache(
+                    path=os.path.join(os.path.dirname(__file__), cache_file) if cache_file else None
+                )
+                self.upload_cache.load()
+            
+            # Coalesce identical generation requests
+            self.task_deduper = TaskDeduplicator()
+            
+            # Durable record of sessions and submitted tasks
+            journal_file = self.config_data.get('journal_file', 'image2video.db')
+            if journal_file:
+                self.journal = TaskJournal(os.path.join(os.path.dirname(__file__), journal_file))
+            
+            # Keeps connections to the API and image hosts open between requests
+            self.connection_warmer = self._create_warmer(self.config_data, self.session, self.storage)
+            
+            # Shared poller for all outstanding video tasks
+            self.task_poller = TaskPoller(self.query_video_tasks)
+            
+            # Picks up edits to config.json while running
+            self.config_watcher = ConfigWatcher(
+                self._config_path(),
+                self._on_config_changed,
+                interval=self.config_data.get('config_watch_interval', 2)
+            )
+            
+            self._apply_settings(self.config_data)
             
             logger.info("[Image2Video] Configuration loaded successfully")
             
@@ -100,144 +227,769 @@ class Image2Video(Lifecycle):
             logger.error(f"[Image2Video] Failed to initialize: {e}")
             raise
             
+    @staticmethod
+    def _config_path() -> str:
+        return os.path.join(os.path.dirname(__file__), "config.json")
+        
+    def _load_config(self) -> Dict[str, Any]:
+        """Read and validate config.json"""
+        config_path = self._config_path()
+        if not os.path.exists(config_path):
+            raise FileNotFoundError("Configuration file not found")
+            
+        with open(config_path, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+            
+        required_keys = ['api_url', 'ak', 'sk']
+        missing_keys = [key for key in required_keys if not config or key not in config]
+        if missing_keys:
+            raise ValueError(f"Configuration missing required keys: {', '.join(missing_keys)}")
+        return config
+        
+    def _create_session(self, config: Dict[str, Any]) -> requests.Session:
+        """Build the HTTP session shared by API and upload calls"""
+        session = requests.Session()
+        # Only idempotent requests are retried by the transport; task
+        # submission retries itself safely in _submit_video_task
+        retries = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+        # One circuit breaker per endpoint fails requests fast during outages;
+        # pooled connections use TCP keep-alive, with pool sizes per host
+        socket_options = keepalive_socket_options(
+            idle=config.get('http_keepalive_idle', 60))
+        pool_size = config.get(
+            'http_pool_size', max(10, config.get('max_workers', 8)))
+        pools = dict(config.get('http_pools') or {})
+        for prefix in ['http://', 'https://'] + list(pools):
+            session.mount(prefix, KeepAliveAdapter(
+                socket_options=socket_options,
+                failure_threshold=config.get('breaker_failure_threshold', 5),
+                recovery_timeout=config.get('breaker_recovery_timeout', 30),
+                default_timeout=tuple(config.get('api_timeout', (10, 30))),
+                pool_maxsize=pools.get(prefix, pool_size),
+                max_retries=retries
+            ))
+        # Recorded only while metrics are enabled
+        session.hooks['response'].append(self._record_http_timing)
+        return session
+        
+    @staticmethod
+    def _create_warmer(config: Dict[str, Any], session: requests.Session,
+                       storage: ImageStorage) -> ConnectionWarmer:
+        return ConnectionWarmer(
+            session,
+            [config['api_url']] + storage.endpoints(),
+            interval=config.get('warmup_interval', 60),
+            connections=config.get('warmup_connections', 2)
+        )
+        
+    def _apply_settings(self, config: Dict[str, Any]) -> None:
+        """Apply the limits and tunables that can change while running"""
+        self.sessions.ttl = config.get('session_timeout', 180)
+        self.sessions.max_entries = config.get('max_sessions', 10000)
+        self.processing_timeout = config.get('processing_timeout', 600)
+        
+        # Hooks run inline unless configured to run off the request path
+        self.hook_manager.configure(
+            async_dispatch=config.get('hooks_async', False),
+            max_queue=config.get('hook_queue_size', 256),
+            timeout=config.get('hook_timeout', 5)
+        )
+        
+        # Counters and latency histograms, off unless configured
+        metrics.enabled = bool(config.get('metrics_enabled', False))
+        
+        if self.image_preprocessor:
+            self.image_preprocessor.max_edge = config.get('image_max_edge', 1280) or self.image_preprocessor.max_edge
+            self.image_preprocessor.quality = config.get('image_quality', 85)
+            self.image_preprocessor.image_format = config.get('image_format', 'JPEG').upper()
+        if self.scheduler:
+            self.scheduler.configure(
+                max_concurrent=config.get('max_concurrent_tasks', 10),
+                user_rate=config.get('user_tasks_per_minute', 1) / 60,
+                user_burst=config.get('user_task_burst', 3),
+                max_queued=config.get('max_queued_tasks', 200)
+            )
+        if self.upload_cache:
+            self.upload_cache.max_entries = config.get('upload_cache_size', 1024) or self.upload_cache.max_entries
+            self.upload_cache.ttl = config.get('upload_cache_ttl', 7 * 24 * 3600)
+        if self.task_deduper:
+            self.task_deduper.window = config.get('dedup_window', 1800)
+        if self.task_poller:
+            self.task_poller.expected_duration = config.get('poll_expected_seconds', 600)
+            self.task_poller.min_interval = config.get('poll_min_interval', 15)
+            self.task_poller.max_interval = config.get('poll_max_interval', 120)
+            self.task_poller.batch_size = config.get('poll_batch_size', 50)
+            self.task_poller.max_age = config.get('poll_max_age', 3600)
+            self.task_poller.relaxed_interval = config.get('callback_poll_interval', 300)
+        if self.config_watcher:
+            self.config_watcher.interval = config.get('config_watch_interval', 2)
+        if self.video_downloader:
+            self.video_downloader.chunk_size = config.get('video_chunk_size', 256 * 1024)
+            self.video_downloader.max_attempts = config.get('video_download_attempts', 5)
+            self.video_downloader.max_size = config.get('video_max_size_mb', 0) * 1024 * 1024
+        if self.video_cache:
+            self.video_cache.max_bytes = (config.get('video_cache_size_mb', 1024) * 1024 * 1024
+                                          or self.video_cache.max_bytes)
+            
+    def _do_reload(self, **kwargs) -> None:
+        """Swap in a new config, HTTP session and credential set
+        
+        Everything new is built and validated before anything is replaced,
+        so an invalid config.json leaves the running setup untouched. The
+        swap is a handful of reference assignments; requests already using
+        the old session finish on it, and it is closed in the background
+        after ``reload_drain_seconds``. Settings in RESTART_KEYS keep their
+        running values in ``config_data`` until the plugin is restarted.
+        """
+        config = self._load_config()
+        needs_restart = [key for key in self.RESTART_KEYS
+                         if config.get(key) != self.config_data.get(key)]
+        for key in self.RESTART_KEYS:
+            if key in self.config_data:
+                config[key] = self.config_data[key]
+            else:
+                config.pop(key, None)
+        if needs_restart:
+            logger.warning(f"[Image2Video] Restart required to apply: {', '.join(needs_restart)}")
+        if config == self.config_data:
+            logger.debug("[Image2Video] Configuration unchanged, nothing to reload")
+            return
+            
+        storage = create_storage(config)
+        token_provider = self._create_token_provider(config)
+        for name in token_provider.names:
+            token_provider.get_token(name)
+        session = self._create_session(config)
+        warmer = self._create_warmer(config, session, storage)
+        
+        old = (self.session, self.storage, self.connection_warmer)
+        
+        self.session, self.storage, self.token_provider, self.connection_warmer = (
+            session, storage, token_provider, warmer)
+        self.config_data = config
+        self._apply_settings(config)
+        
+        if metrics.enabled and config.get('metrics_port', 9464):
+            metrics.start_server(config.get('metrics_host', '127.0.0.1'),
+                                 config.get('metrics_port', 9464))
+        else:
+            metrics.stop_server()
+        self._update_callbacks(config)
+        if config.get('warmup_enabled', True):
+            warmer.start()
+            
+        threading.Thread(target=self._drain, args=old + (config.get('reload_drain_seconds', 30),),
+                         name="image2video-drain", daemon=True).start()
+        logger.info("[Image2Video] Configuration reloaded")
+        
+    @staticmethod
+    def _drain(session: Optional[requests.Session], storage: Optional[ImageStorage],
+               warmer: Optional[ConnectionWarmer], delay: float) -> None:
+        """Release a replaced session once requests in flight on it had time to finish"""
+        if warmer:
+            warmer.stop()
+        time.sleep(delay)
+        if storage:
+            storage.close()
+        if session:
+            session.close()
+            
+    def _on_config_changed(self) -> None:
+        if self.state not in (LifecycleState.STARTED, LifecycleState.PAUSED):
+            return
+        try:
+            self.reload()
+        except Exception as e:
+            logger.warning(f"[Image2Video] Keeping previous configuration: {e}")
+            
+    def _update_callbacks(self, config: Dict[str, Any]) -> None:
+        """Start, reconfigure or stop the task callback endpoint to match the config"""
+        public_url = config.get('callback_url', '')
+        if not public_url:
+            if self.callback_receiver:
+                self.callback_receiver.stop()
+                self.callback_receiver = None
+            return
+        secret = config.get('callback_secret') or config.get('sk', '')
+        if self.callback_receiver:
+            self.callback_receiver.public_url = public_url
+            # Tasks submitted before the change still carry URLs signed with the old secret
+            self.callback_receiver.rotate(secret, config.get('poll_max_age', 3600))
+            return
+        receiver = CallbackReceiver(public_url, secret, self._on_callback)
+        try:
+            receiver.start(config.get('callback_host', '0.0.0.0'), config.get('callback_port', 9465))
+        except OSError as e:
+            # Tasks are submitted without a callback and polled as usual
+            logger.error(f"[Image2Video] Failed to start callback endpoint: {e}")
+            return
+        self.callback_receiver = receiver
+
+    def _on_callback(self, task_data: Dict[str, Any]) -> int:
+        """Deliver the result of a task whose completion the provider reported
+        
+        The signature only covers the external_task_id, so the reported
+        task_id must be the one recorded for it at submission; callbacks of
+        unknown tasks are dropped and left to polling. Only terminal states
+        of tasks still pending in the journal are delivered; the provider
+        may report a task more than once, and a poll may have delivered it
+        first.
+        """
+        task_id = task_data.get('task_id')
+        if not task_id:
+            return 400
+        external_task_id = (task_data.get('task_info') or {}).get('external_task_id') or ''
+        if self._submitted_task_id(external_task_id) != task_id:
+            logger.warning(f"[Image2Video] Dropping callback for unknown task {task_id}")
+            return 404
+        if task_data.get('task_status') not in TERMINAL_STATUSES:
+            return 200
+        if self.journal:
+            record = self.journal.find_task(task_id)
+            if record and record['status'] != 'pending':
+                logger.debug(f"[Image2Video] Ignoring callback for delivered task {task_id}")
+                return 200
+        if not self.task_poller:
+            return 503
+        if not self.task_poller.complete(task_id, task_data):
+            logger.debug(f"[Image2Video] Callback for task {task_id} arrived before tracking started")
+        return 200
+
+    @staticmethod
+    def _create_token_provider(config: Dict[str, Any]) -> TokenProvider:
+        """Build the token provider from the ak/sk pair and extra credential sets"""
+        credentials = {'default': (config.get('ak', ''), config.get('sk', ''))}
+        for item in config.get('credentials', []):
+            credentials[item['name']] = (item['ak'], item['sk'])
+        return TokenProvider(
+            credentials,
+            default=config.get('credential', 'default'),
+            refresh_margin=config.get('token_refresh_margin', 300)
+        )
+
     def _do_start(self) -> None:
         """Start the plugin processing"""
         if not self.config_data or not self.session:
             raise RuntimeError("Plugin not properly initialized")
+        if self.journal:
+            self._recover()
+        self.sessions.start()
+        if metrics.enabled and self.config_data.get('metrics_port', 9464):
+            metrics.start_server(self.config_data.get('metrics_host', '127.0.0.1'),
+                                 self.config_data.get('metrics_port', 9464))
+        self._update_callbacks(self.config_data)
+        if self.connection_warmer and self.config_data.get('warmup_enabled', True):
+            self.connection_warmer.start()
+        if self.config_watcher and self.config_data.get('config_watch', True):
+            self.config_watcher.start()
+        if self.scheduler:
+            self.scheduler.start()
+        if self.task_poller:
+            self.task_poller.start()
             
     def _do_stop(self) -> None:
         """Stop the plugin and cleanup resources"""
+        if self.config_watcher:
+            self.config_watcher.stop()
+        if self.callback_receiver:
+            self.callback_receiver.stop()
+            self.callback_receiver = None
+        if self.task_poller:
+            self.task_poller.stop()
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+        if self.download_executor:
+            self.download_executor.shutdown()
+            self.download_executor = None
+        if self.batch_executor:
+            self.batch_executor.shutdown()
+            self.batch_executor = None
+        if self.image_preprocessor:
+            self.image_preprocessor.shutdown()
+        if self.upload_cache:
+            logger.info(f"[Image2Video] Upload cache stats: {self.upload_cache.stats()}")
+            self.upload_cache.save()
+        if self.video_cache:
+            logger.info(f"[Image2Video] Video cache stats: {self.video_cache.stats()}")
+        if self.connection_warmer:
+            self.connection_warmer.stop()
+        if self.storage:
+            self.storage.close()
         if self.session:
             self.session.close()
             self.session = None
-        self.waiting_for_image.clear()
-        self.waiting_for_prompt.clear()
-        self.user_data.clear()
+        self.sessions.stop()
+        self.sessions.clear()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        self.hook_manager.stop()
+        metrics.stop_server()
+
+    @staticmethod
+    def _record_http_timing(response: requests.Response, *args, **kwargs) -> requests.Response:
+        """Session response hook recording the duration of every API and upload call"""
+        if not metrics.enabled:
+            return response
+        request = response.request
+        metrics.observe("http_request_duration_seconds", response.elapsed.total_seconds(),
+                        host=urlparse(request.url).hostname, method=request.method,
+                        status=response.status_code)
+        return response
 
-    def upload_to_imgbb(self, base64_image: str) -> Optional[str]:
-        """Upload image to ImgBB and get URL"""
+    def upload_image_data(self, image_data: Union[bytes, memoryview, str]) -> Optional[str]:
+        """Upload image to the configured storage backend
+        
+        Returns the value sent as the task's image: a hosted URL, or the
+        base64 image itself for the inline backend.
+        """
         try:
-            # Run pre-upload hooks
-            self.hook_manager.run_hooks("before_image_upload", 
-                                      base64_image=base64_image)
-            
-            if not self.config_data:
+            if not self.config_data or not self.storage:
                 raise AppException("Configuration not loaded")
                 
-            data = {
-                'key': self.config_data['imgbb_api_key'],
-                'image': base64_image
-            }
-            
+            # Identical images reuse the URL of an earlier upload
+            cache_key = None
+            if self.upload_cache and self.storage.cacheable:
+                cache_key = self.upload_cache.key_for(image_data, self.storage.cache_namespace)
+                cached_url = self.upload_cache.get(cache_key)
+                if cached_url:
+                    logger.debug(f"[Image2Video] Upload cache hit for {cache_key[:12]}")
+                    return cached_url
+                
             if not self.session:
                 raise RuntimeError("HTTP session not initialized")
                 
-            response = self.session.post(
-                'https://api.imgbb.com/1/upload',
-                data=data
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result['success']:
-                    # Run post-upload hooks
-                    self.hook_manager.run_hooks("after_image_upload", 
-                                              image_url=result['data']['url'])
-                    return result['data']['url']
-                    
-            logger.error(f"[Image2Video] Failed to upload to ImgBB: {response.text}")
-            return None
+            image_url = self.storage.upload(self.session, image_data)
+            if cache_key:
+                self.upload_cache.put(cache_key, image_url, len(image_data))
+            return image_url
             
         except Exception as e:
-            logger.error(f"[Image2Video] Failed to upload to ImgBB: {e}")
+            logger.error(f"[Image2Video] Failed to upload image: {e}")
             return None
 
     def submit_video_task(self, image_url: str, prompt: str) -> dict:
-        """Submit video generation task"""
+        """Submit video generation task
+        
+        Identical requests (same image, prompt and model parameters) that are
+        in flight or were submitted recently share one provider task.
+        """
         try:
-            # Run pre-generation hooks
-            self.hook_manager.run_hooks("before_video_generation",
-                                      image_url=image_url,
-                                      prompt=prompt)
+            params = self._video_task_params()
+            if self.task_deduper:
+                key = self.task_deduper.key_for(image_url, prompt, params)
+                task_data, reused = self.task_deduper.submit(
+                    key, lambda: self._submit_video_task(image_url, prompt, params))
+                if reused:
+                    logger.info(f"[Image2Video] Reusing task {task_data['task_id']}")
+                    task_data = dict(task_data, reused=True)
+            else:
+                task_data = self._submit_video_task(image_url, prompt, params)
+            return task_data
 
+        except Exception as e:
+            logger.error(f"[Image2Video] Failed to submit task: {e}")
+            raise
+
+    def _video_task_params(self) -> Dict[str, Any]:
+        """Get the model parameters sent with every video task"""
+        config = self.config_data or {}
+        return {
+            "model_name": config.get('model_name', "kling-v1-6"),
+            "mode": config.get('mode', "pro"),
+            "duration": str(config.get('duration', "10")),
+            "cfg_scale": config.get('cfg_scale', 0.8)
+        }
+
+    def _api_timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout of every provider API call"""
+        connect, read = (self.config_data or {}).get('api_timeout', (10, 30))
+        return connect, read
+
+    def _submit_video_task(self, image_url: str, prompt: str,
+                           params: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit a video task, retrying uncertain failures without duplicating it
+        
+        Every attempt carries the same external_task_id, which the provider
+        keeps unique. Before each retry the task is looked up by that ID, so
+        an attempt that was accepted despite a timeout or 5xx is picked up
+        instead of being submitted and billed again.
+        """
+        external_task_id = uuid.uuid4().hex
+        retries = (self.config_data or {}).get('submit_retries', 2)
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 5))
+                existing = self._find_video_task(external_task_id)
+                if existing:
+                    logger.info(f"[Image2Video] Submission {external_task_id} was accepted "
+                                f"as task {existing['task_id']}")
+                    self._record_submission(external_task_id, existing['task_id'])
+                    return existing
+            try:
+                task_data = self._post_video_task(image_url, prompt, params, external_task_id)
+                self._record_submission(external_task_id, task_data['task_id'])
+                return task_data
+            except UncertainSubmitError as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"[Image2Video] Submission {external_task_id} uncertain, "
+                               f"checking before retry: {e}")
+
+    def _record_submission(self, external_task_id: str, task_id: str) -> None:
+        """Remember which task an external_task_id, and so a callback URL, belongs to"""
+        if self.journal:
+            self.journal.record_submission(external_task_id, task_id)
+            return
+        with self._submissions_lock:
+            self._submissions[external_task_id] = task_id
+            while len(self._submissions) > self.MAX_SUBMISSIONS:
+                self._submissions.popitem(last=False)
+
+    def _submitted_task_id(self, external_task_id: str) -> Optional[str]:
+        """Provider task ID recorded for an external_task_id, if any"""
+        if self.journal:
+            return self.journal.find_submission(external_task_id)
+        with self._submissions_lock:
+            return self._submissions.get(external_task_id)
+
+    def _find_video_task(self, external_task_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a task by the client-side external_task_id"""
+        try:
             token = self.generate_jwt_token()
-            if not token:
-                raise Exception("Failed to generate token")
-
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-
-            data = {
-                "model_name": "kling-v1-6",
-                "mode": "pro",
-                "duration": "10",
-                "image": image_url,
-                "prompt": prompt,
-                "cfg_scale": 0.8
-            }
-
-            if not self.config_data:
-                raise AppException("Configuration not loaded")
-                
-            if not self.session:
-                raise RuntimeError("HTTP session not initialized")
-                
+            api_url = self.config_data['api_url'].rstrip('/')
+            response = self.session.get(f"{api_url}/{external_task_id}",
+                                        headers={'Authorization': f'Bearer {token}'},
+                                        timeout=self._api_timeout())
+            result = response.json() if response.status_code == 200 else {}
+            if result.get('code') == 0 and (result.get('data') or {}).get('task_id'):
+                return result['data']
+        except Exception as e:
+            logger.warning(f"[Image2Video] Failed to look up submission {external_task_id}: {e}")
+        return None
+
+    def _post_video_task(self, image_url: str, prompt: str,
+                         params: Dict[str, Any],
+                         external_task_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a video task to the provider and return its task data"""
+        token = self.generate_jwt_token()
+        if not token:
+            raise Exception("Failed to generate token")
+
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+
+        data = dict(params, image=image_url, prompt=prompt)
+        if external_task_id:
+            data['external_task_id'] = external_task_id
+            if self.callback_receiver:
+                data['callback_url'] = self.callback_receiver.url_for(external_task_id)
+
+        if not self.config_data:
+            raise AppException("Configuration not loaded")
+            
+        if not self.session:
+            raise RuntimeError("HTTP session not initialized")
+            
+        try:
             response = self.session.post(
                 self.config_data['api_url'],
                 headers=headers,
-                json=data
+                json=data,
+                timeout=self._api_timeout()
             )
+        except CircuitOpenError:
+            raise
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise UncertainSubmitError(f"Failed to submit task: {e}") from e
 
-            if response.status_code != 200:
-                raise Exception(f"Failed to submit task: {response.text}")
+        if response.status_code >= 500:
+            raise UncertainSubmitError(f"Failed to submit task: {response.text}")
+        if response.status_code != 200:
+            raise Exception(f"Failed to submit task: {response.text}")
 
-            result = response.json()
-            if result.get('code') != 0:
-                raise Exception(f"Failed to submit task: {result.get('message')}")
+        result = response.json()
+        if result.get('code') != 0:
+            raise Exception(f"Failed to submit task: {result.get('message')}")
 
-            # Run post-generation hooks
-            self.hook_manager.run_hooks("after_video_generation",
-                                      task_id=result['data']['task_id'])
+        return result['data']
 
-            return result['data']
+    def query_video_tasks(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Query the status of several video tasks
+        
+        Uses the task list endpoint when more than one task is due so a whole
+        batch costs a single request; tasks not found in the listing are
+        queried individually.
+        """
+        if not self.config_data:
+            raise AppException("Configuration not loaded")
+        if not self.session:
+            raise RuntimeError("HTTP session not initialized")
+            
+        token = self.generate_jwt_token()
+        if not token:
+            raise Exception("Failed to generate token")
+        headers = {'Authorization': f'Bearer {token}'}
+        api_url = self.config_data['api_url'].rstrip('/')
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        wanted = set(task_ids)
+        if len(task_ids) > 1:
+            try:
+                response = self.session.get(
+                    api_url,
+                    headers=headers,
+                    params={'pageNum': 1, 'pageSize': min(500, max(30, len(task_ids) * 2))},
+                    timeout=self._api_timeout()
+                )
+                result = response.json() if response.status_code == 200 else {}
+                if result.get('code') == 0:
+                    for task in result.get('data') or []:
+                        if task.get('task_id') in wanted:
+                            results[task['task_id']] = task
+                else:
+                    logger.warning(f"[Image2Video] Failed to list tasks: {response.text}")
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Image2Video] Failed to list tasks: {e}")
+                
+        for task_id in task_ids:
+            if task_id in results:
+                continue
+            try:
+                response = self.session.get(f"{api_url}/{task_id}", headers=headers,
+                                            timeout=self._api_timeout())
+                result = response.json() if response.status_code == 200 else {}
+                if result.get('code') == 0 and result.get('data'):
+                    results[task_id] = result['data']
+                else:
+                    logger.warning(
+                        f"[Image2Video] Failed to query task {task_id}: {response.text}")
+            except CircuitOpenError:
+                # The rest would fail the same way; the poller retries later
+                raise
+            except Exception as e:
+                logger.warning(f"[Image2Video] Failed to query task {task_id}: {e}")
+        return results
+
+    def track_video_task(self, task_id: str, user_id: str, channel: Any, context: Any,
+                         submitted_at: Optional[float] = None, journal: bool = True,
+                         on_finish: Optional[Callable[[], None]] = None,
+                         on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        """Track a submitted task and reply to the requesting chat once it finishes
+        
+        ``on_finish`` is called as soon as the task ends, ``on_result`` with
+        the task data once its result has been sent. With the callback
+        endpoint running, new tasks are polled only as a fallback.
+        """
+        if not self.task_poller:
+            raise RuntimeError("Task poller not initialized")
+        submitted_at = submitted_at if submitted_at is not None else time.time()
+        if journal and self.journal:
+            self.journal.record_task(task_id, user_id, self._serialize_target(context), submitted_at)
+        
+        def deliver(task_id: str, task_data: Dict[str, Any]) -> None:
+            if on_finish:
+                on_finish()
+            if self.task_deduper:
+                self.task_deduper.complete(task_id, task_data)
+            self._deliver_result(task_id, user_id, task_data, channel, context, on_result)
+            
+        # A reused task may already have finished
+        finished = self.task_deduper.result_for(task_id) if self.task_deduper else None
+        if finished:
+            deliver(task_id, finished)
+            return
+        relaxed = journal and self.callback_receiver is not None
+        self.task_poller.track(task_id, deliver, submitted_at, relaxed=relaxed)
 
+    def _deliver_result(self, task_id: str, user_id: str, task_data: Dict[str, Any],
+                        channel: Any, context: Any,
+                        on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        """Send a finished task's result, downloading the video in the background"""
+        reply = self._build_result_reply(task_data)
+        if reply.type == ReplyType.VIDEO_URL and self.video_downloader and self.download_executor:
+            try:
+                self.download_executor.submit(self._send_video, task_id, user_id, task_data,
+                                              reply, channel, context, on_result)
+                return
+            except QueueFullError:
+                logger.warning(f"[Image2Video] Download queue full, sending link for task {task_id}")
+        self._send_reply(channel, context, reply)
+        self._finish_task(task_id, user_id, task_data, on_result)
+        
+    def _send_video(self, task_id: str, user_id: str, task_data: Dict[str, Any],
+                    reply: Reply, channel: Any, context: Any,
+                    on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        """Download a finished video and send it as a file, falling back to its link
+        
+        With the video cache, a task delivered again (a reused task or a
+        repeated request) is sent from disk without downloading it twice.
+        """
+        def download(name: str) -> str:
+            return self.video_downloader.download(self.session, reply.content, name)
+            
+        try:
+            if self.video_cache:
+                with self.video_cache.use(task_id, download) as path:
+                    self._send_reply(channel, context, Reply(ReplyType.VIDEO, path))
+            else:
+                # Each delivery gets its own file: subscribers of one task must
+                # not share a .part file or remove a file another is sending
+                path = download(f"{task_id}-{uuid.uuid4().hex[:8]}.mp4")
+                try:
+                    self._send_reply(channel, context, Reply(ReplyType.VIDEO, path))
+                finally:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
         except Exception as e:
-            logger.error(f"[Image2Video] Failed to submit task: {e}")
-            raise
+            logger.warning(f"[Image2Video] Failed to download video of task {task_id}, sending link: {e}")
+            self._send_reply(channel, context, reply)
+        self._finish_task(task_id, user_id, task_data, on_result)
+        
+    def _finish_task(self, task_id: str, user_id: str, task_data: Dict[str, Any],
+                     on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        # Marked after sending: a crash in between redelivers rather than loses the video
+        if self.journal:
+            self.journal.finish_task(task_id, user_id, task_data.get('task_status', 'failed'))
+        if on_result:
+            on_result(task_data)
+
+    def _build_result_reply(self, task_data: Dict[str, Any]) -> Reply:
+        """Build the chat reply for a finished task"""
+        if task_data.get('task_status') == 'succeed':
+            videos = (task_data.get('task_result') or {}).get('videos') or []
+            if videos and videos[0].get('url'):
+                return Reply(ReplyType.VIDEO_URL, videos[0]['url'])
+        message = task_data.get('task_status_msg') or "unknown error"
+        return Reply(ReplyType.ERROR, f"Video generation failed: {message}")
 
-    def generate_jwt_token(self) -> Optional[str]:
-        """Generate JWT token"""
+    @staticmethod
+    def _reply_target(e_context: Dict[str, Any]) -> tuple:
+        """Get the (channel, context) pair used to reply outside the handler"""
         try:
-            if not self.config_data:
-                raise AppException("Configuration not loaded")
+            channel = e_context['channel']
+        except (KeyError, TypeError):
+            channel = None
+        return channel, e_context['context']
 
-            ak = self.config_data.get('ak')
-            sk = self.config_data.get('sk')
-            
-            if not ak or not sk:
-                raise AppException("Missing API credentials (ak/sk)")
-
-            headers = {
-                "alg": "HS256",
-                "typ": "JWT"
-            }
-            payload = {
-                "iss": ak,
-                "exp": int(time.time()) + 1800,  # 30 minutes validity
-                "nbf": int(time.time()) - 5
-            }
-            token = jwt.encode(payload, sk, headers=headers)
-            return token
+    def _send_reply(self, channel: Any, context: Any, reply: Reply) -> None:
+        """Send a reply to a chat outside the message handler"""
+        if not channel:
+            logger.error(f"[Image2Video] No channel available to send reply: {reply.content}")
+            return
+        try:
+            channel.send(reply, context)
+        except Exception as e:
+            logger.error(f"[Image2Video] Failed to send reply: {e}")
+
+    @staticmethod
+    def _serialize_target(context: Any) -> Dict[str, Any]:
+        """Extract what is needed to reply to a chat after a restart"""
+        if not context:
+            return {}
+        return {key: context.get(key) for key in ('receiver', 'isgroup', 'session_id')}
+
+    def _restore_target(self, target: Dict[str, Any]) -> tuple:
+        """Rebuild a (channel, context) reply target from its journaled form"""
+        if self._restored_channel is None:
+            try:
+                from channel import channel_factory
+                from config import conf
+                self._restored_channel = channel_factory.create_channel(conf().get("channel_type", "wx"))
+            except Exception as e:
+                logger.error(f"[Image2Video] Failed to get channel for restored tasks: {e}")
+        return self._restored_channel, Context(ContextType.TEXT, "", kwargs=dict(target))
+
+    def _journal_session(self, user_id: str, session: Optional[Session]) -> None:
+        """Mirror a session change into the journal"""
+        if not self.journal:
+            return
+        if session is None:
+            self.journal.remove_session(user_id)
+            return
+        data = {key: value for key, value in session.payload.items()
+                if key not in ('channel', 'context', 'images')}
+        data['target'] = self._serialize_target(session.payload.get('context'))
+        self.journal.save_session(user_id, session.state.name, data, session.expires_at)
+
+    def _recover(self) -> None:
+        """Reload journaled sessions and resume tracking of undelivered tasks"""
+        # Jobs that were running when the process stopped are lost, so their
+        # sessions go back one step
+        interrupted = {
+            SessionState.PROCESSING_IMAGE: SessionState.WAITING_FOR_IMAGE,
+            SessionState.SUBMITTING: SessionState.WAITING_FOR_PROMPT,
+            # Images collected for a batch are only held in memory
+            SessionState.COLLECTING_IMAGES: SessionState.COLLECTING_IMAGES,
+            SessionState.PROCESSING_BATCH: SessionState.COLLECTING_IMAGES
+        }
+        sessions = self.journal.load_sessions()
+        for user_id, state_name, data, expires_at in sessions:
+            state = SessionState[state_name]
+            channel, context = self._restore_target(data.pop('target', {}))
+            payload = dict(data, channel=channel, context=context)
+            if state in interrupted:
+                state = interrupted[state]
+                expires_at = time.time() + self.sessions.ttl
+                if state == SessionState.COLLECTING_IMAGES:
+                    payload['images'] = []
+                self._send_reply(channel, context, Reply(
+                    ReplyType.ERROR, "Processing was interrupted by a restart. Please send it again."))
+            self.sessions.restore(user_id, state, payload, expires_at)
+            
+        tasks = self.journal.load_pending_tasks()
+        for task_id, user_id, target, submitted_at in tasks:
+            channel, context = self._restore_target(target)
+            # Recovered tasks still count against the provider's concurrency quota
+            ticket = self.scheduler.reserve(user_id) if self.scheduler else None
+            self.track_video_task(task_id, user_id, channel, context,
+                                  submitted_at=submitted_at, journal=False,
+                                  on_finish=ticket.release if ticket else None)
+        self.journal.prune(self.config_data.get('journal_retention', 7 * 24 * 3600))
+        logger.info(f"[Image2Video] Recovered {len(sessions)} sessions and {len(tasks)} tasks from journal")
+
+    def generate_jwt_token(self, credential: Optional[str] = None) -> Optional[str]:
+        """Get a JWT token, reusing the cached one until it nears expiry"""
+        try:
+            if not self.token_provider:
+                raise AppException("Configuration not loaded")
+            return self.token_provider.get_token(credential)
         except Exception as e:
             logger.error(f"[Image2Video] Failed to generate token: {e}")
             return None
 
-    def get_image_data(self, msg: Any, content: str) -> Optional[str]:
-        """Extract base64 image data from message"""
+    def get_image_data(self, msg: Any, content: str) -> Optional[bytes]:
+        """Extract raw image bytes from message
+        
+        Downloads into memory when the message supports it and only falls
+        back to a temporary file for download functions that need a path.
+        """
         try:
             if hasattr(msg, '_rawmsg') and hasattr(msg._rawmsg, 'download'):
+                # itchat's download(fileName) returns the bytes when fileName is None
+                try:
+                    image_data = msg._rawmsg.download(None)
+                except Exception as e:
+                    logger.debug(f"[Image2Video] In-memory image download unsupported, using a file: {e}")
+                    image_data = None
+                if isinstance(image_data, (bytes, bytearray)) and image_data:
+                    return bytes(image_data)
+                    
+                # Channels that can only write to a file
                 file_name = msg._rawmsg.get('FileName', 'temp.png')
                 temp_path = os.path.join(os.getcwd(), 'tmp', file_name)
                 msg._rawmsg.download(temp_path)
@@ -249,14 +1001,13 @@ class Image2Video(Lifecycle):
                         os.remove(temp_path)
                     except:
                         pass
-                    return base64.b64encode(image_data).decode('utf-8')
+                    return image_data
             
             if hasattr(msg, '_rawmsg') and 'Content' in msg._rawmsg:
                 content_data = msg._rawmsg['Content']
                 if isinstance(content_data, str) and len(content_data) > 0:
                     try:
-                        image_data = base64.b64decode(content_data)
-                        return base64.b64encode(image_data).decode('utf-8')
+                        return base64.b64decode(content_data)
                     except:
                         pass
             
@@ -266,6 +1017,242 @@ class Image2Video(Lifecycle):
             logger.error(f"[Image2Video] Failed to get image data: {e}")
             return None
 
+    def _dispatch(self, e_context: Dict[str, Any], job: Callable, *args: Any) -> bool:
+        """Hand a job to the worker pool, replying with an error if it is full"""
+        if not self.executor:
+            raise RuntimeError("Worker pool not initialized")
+        try:
+            self.executor.submit(job, *args)
+            return True
+        except QueueFullError as e:
+            logger.warning(f"[Image2Video] Rejected job: {e}")
+            e_context['reply'] = Reply(ReplyType.ERROR, "The service is busy right now. Please try again later.")
+            return False
+
+    def _process_image(self, user_id: str, version: int, msg: Any, content: str,
+                       channel: Any, context: Any) -> None:
+        """Download and upload a user's image, then ask for the prompt"""
+        image_data = self.get_image_data(msg, content)
+        if not image_data:
+            self._retry_step(user_id, version, SessionState.PROCESSING_IMAGE,
+                             SessionState.WAITING_FOR_IMAGE, channel, context,
+                             "Failed to get image data. Please try again.")
+            return
+            
+        # Run image upload pipeline
+        result = self.upload_pipeline.run({
+            'plugin': self,
+            'image_data': image_data,
+            'user_id': user_id
+        })
+        
+        image_url = result.data.get('image_url')
+        if result.errors or not image_url:
+            self._retry_step(user_id, version, SessionState.PROCESSING_IMAGE,
+                             SessionState.WAITING_FOR_IMAGE, channel, context,
+                             result.metadata.get('error_message', "Failed to process image"))
+            return
+            
+        # Store image URL and update state
+        session = self.sessions.transition(
+            user_id, SessionState.PROCESSING_IMAGE, SessionState.WAITING_FOR_PROMPT,
+            payload={'image_url': image_url, 'channel': channel, 'context': context},
+            version=version)
+        if session:
+            self._send_reply(channel, context, Reply(
+                ReplyType.TEXT, "Please enter your desired animation effect description"))
+
+    def _process_prompt(self, ticket: Ticket, user_id: str, version: int, image_url: str,
+                        prompt: str, channel: Any, context: Any) -> None:
+        """Submit a video task for a user's image and prompt
+        
+        Runs once the admission scheduler grants a slot. The slot is held
+        until the submitted task finishes.
+        """
+        # Run video generation pipeline
+        try:
+            result = self.generation_pipeline.run({
+                'plugin': self,
+                'image_url': image_url,
+                'prompt': prompt,
+                'user_id': user_id
+            })
+        except Exception:
+            ticket.release(completed=False)
+            raise
+        
+        if result.errors:
+            ticket.release(completed=False)
+            # Let the user retry with another prompt
+            self._retry_step(user_id, version, SessionState.SUBMITTING,
+                             SessionState.WAITING_FOR_PROMPT, channel, context,
+                             result.metadata.get('error_message', "Failed to generate video"))
+            return
+            
+        # Clean up user state
+        self.sessions.end(user_id, SessionState.SUBMITTING, version)
+        task_id = result.data.get('task_id')
+        self._send_reply(channel, context, Reply(
+            ReplyType.TEXT,
+            f"Video generation started with task ID: {task_id}\n"
+            "This may take 10-18 minutes. The video will be sent here when it is ready."
+        ))
+        if result.data.get('task_reused'):
+            # An identical task already holds a slot
+            ticket.release(completed=False)
+            self.track_video_task(task_id, user_id, channel, context)
+        else:
+            self.track_video_task(task_id, user_id, channel, context, on_finish=ticket.release)
+
+    def _collect_batch(self, e_context: Dict[str, Any], user_id: str, session: Session,
+                       msg: Any, content: str, channel: Any, context: Any) -> None:
+        """Add an image to a batch, or start processing it when the description arrives"""
+        context_type = e_context['context'].type
+        if context_type == ContextType.IMAGE:
+            max_images = self.config_data.get('batch_max_images', 10)
+            added = []
+            
+            # Appended under the store lock: images of one user arrive concurrently
+            def add_image(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                images = payload.get('images', [])
+                if len(images) >= max_images:
+                    return None
+                added.append(len(images) + 1)
+                return dict(payload, images=images + [(msg, content)])
+                
+            if not self.sessions.update(user_id, SessionState.COLLECTING_IMAGES, add_image):
+                return
+            if not added:
+                e_context['reply'] = Reply(
+                    ReplyType.ERROR, f"A batch holds at most {max_images} images. Please send the description now.")
+                return
+            e_context['reply'] = Reply(ReplyType.TEXT, f"Image {added[0]} received")
+            return
+            
+        if context_type != ContextType.TEXT:
+            e_context['reply'] = Reply(ReplyType.ERROR, "Please send images or the description")
+            return
+        if not session.payload.get('images'):
+            e_context['reply'] = Reply(ReplyType.ERROR, "Please send at least one image first")
+            return
+        session = self.sessions.transition(
+            user_id, SessionState.COLLECTING_IMAGES, SessionState.PROCESSING_BATCH,
+            version=session.version, ttl=self.processing_timeout)
+        if not session:
+            return
+        # Read after the transition so an image added meanwhile is included
+        images = session.payload['images']
+        if not self._dispatch(e_context, self._process_batch, user_id, session.version,
+                              images, content, channel, context):
+            self.sessions.transition(user_id, SessionState.PROCESSING_BATCH,
+                                     SessionState.COLLECTING_IMAGES, version=session.version)
+            return
+        e_context['reply'] = Reply(ReplyType.TEXT, f"Processing {len(images)} images...")
+
+    def _process_batch(self, user_id: str, version: int, images: List[tuple], prompt: str,
+                       channel: Any, context: Any) -> None:
+        """Upload the images of a batch together and queue one video task per image
+        
+        Images are fetched, preprocessed and uploaded concurrently on the
+        batch pool; each task then goes through the admission scheduler like
+        a single request, so a batch obeys the same concurrency and per-user
+        limits. The user gets one message when the tasks are queued and one
+        summary at the end.
+        """
+        from .handlers import fan_out
+        
+        prompts = split_prompts(prompt, len(images))
+        items = []
+        for image_data in fan_out(self, lambda image: self.get_image_data(*image), images):
+            item = {'plugin': self, 'user_id': user_id}
+            if image_data:
+                item['image_data'] = image_data
+            items.append(item)
+        results = self.upload_pipeline.run_batch(items)
+        self.sessions.end(user_id, SessionState.PROCESSING_BATCH, version)
+        
+        progress = BatchProgress(len(images))
+        summary = None
+        queued, wait = 0, 0.0
+        for index, (result, image_prompt) in enumerate(zip(results, prompts)):
+            image_url = result.data.get('image_url')
+            if result.errors or not image_url:
+                error = result.metadata.get('error_message', "Failed to process image")
+                summary = progress.resolve(index, error) or summary
+                continue
+            job = functools.partial(self._process_batch_item, progress=progress, index=index,
+                                    user_id=user_id, image_url=image_url, prompt=image_prompt,
+                                    channel=channel, context=context)
+            try:
+                _, wait = self.scheduler.submit(user_id, job)
+                queued += 1
+            except QueueFullError as e:
+                logger.warning(f"[Image2Video] Rejected batch job: {e}")
+                summary = progress.resolve(index, "The service is busy right now") or summary
+                
+        if queued:
+            message = f"Batch of {len(images)} images: {queued} queued for video generation"
+            if progress.failed:
+                message += f", {progress.failed} failed"
+            if wait:
+                message += f". Estimated wait: about {max(1, round(wait / 60))} minutes"
+            self._send_reply(channel, context, Reply(
+                ReplyType.TEXT, message + ". The videos will be sent here when they are ready."))
+        if summary:
+            self._send_reply(channel, context, Reply(ReplyType.TEXT, summary))
+
+    def _process_batch_item(self, ticket: Ticket, progress: BatchProgress, index: int,
+                            user_id: str, image_url: str, prompt: str,
+                            channel: Any, context: Any) -> None:
+        """Submit the video task of one batch image once the scheduler grants a slot"""
+        def report(error: Optional[str] = None) -> None:
+            summary = progress.resolve(index, error)
+            if summary:
+                self._send_reply(channel, context, Reply(ReplyType.TEXT, summary))
+                
+        try:
+            result = self.generation_pipeline.run({
+                'plugin': self,
+                'image_url': image_url,
+                'prompt': prompt,
+                'user_id': user_id
+            })
+        except Exception as e:
+            ticket.release(completed=False)
+            report(str(e))
+            raise
+        if result.errors:
+            ticket.release(completed=False)
+            report(result.metadata.get('error_message', "Failed to generate video"))
+            return
+            
+        def on_result(task_data: Dict[str, Any]) -> None:
+            if task_data.get('task_status') == 'succeed':
+                report()
+            else:
+                report(task_data.get('task_status_msg') or "Video generation failed")
+                
+        task_id = result.data.get('task_id')
+        if result.data.get('task_reused'):
+            ticket.release(completed=False)
+            self.track_video_task(task_id, user_id, channel, context, on_result=on_result)
+        else:
+            self.track_video_task(task_id, user_id, channel, context,
+                                  on_finish=ticket.release, on_result=on_result)
+
+    def _retry_step(self, user_id: str, version: int, current: SessionState,
+                    previous: SessionState, channel: Any, context: Any, message: str) -> None:
+        """Return a session to its previous step after a failed job and report the error"""
+        self.sessions.transition(user_id, current, previous, version=version)
+        self._send_reply(channel, context, Reply(ReplyType.ERROR, message))
+
+    def _on_session_expired(self, session: Session) -> None:
+        """Tell a user that their unfinished dialogue timed out"""
+        if session.state in (SessionState.WAITING_FOR_IMAGE, SessionState.WAITING_FOR_PROMPT,
+                             SessionState.COLLECTING_IMAGES):
+            self._send_reply(session.payload.get('channel'), session.payload.get('context'),
+                             Reply(ReplyType.ERROR, "Operation timed out. Please start over with '动起来'."))
+
     def on_handle_context(self, e_context: Dict[str, Any]) -> None:
         """Handle user messages and manage the image-to-video workflow
         
@@ -284,92 +1271,88 @@ class Image2Video(Lifecycle):
             return
 
         try:
-            # Check for timeouts
-            current_time = time.time()
-            if user_id in self.waiting_for_image and (current_time - self.waiting_for_image[user_id]) > 180:
-                del self.waiting_for_image[user_id]
-                e_context['reply'] = Reply(ReplyType.ERROR, "Operation timed out. Please start over with '动起来'.")
-                return
-                
-            if user_id in self.waiting_for_prompt and (current_time - self.waiting_for_prompt[user_id]) > 180:
-                del self.waiting_for_prompt[user_id]
-                if user_id in self.user_data:
-                    del self.user_data[user_id]
-                e_context['reply'] = Reply(ReplyType.ERROR, "Operation timed out. Please start over with '动起来'.")
+            channel, context = self._reply_target(e_context)
+            
+            # Handle "动起来" command, "动起来 批量" for several images
+            if content.startswith(self.command_prefix):
+                minutes = max(1, round(self.sessions.ttl / 60))
+                if content[len(self.command_prefix):].strip().lower() in self.BATCH_KEYWORDS:
+                    self.sessions.begin(user_id, SessionState.COLLECTING_IMAGES,
+                                        {'channel': channel, 'context': context, 'images': []})
+                    e_context['reply'] = Reply(
+                        ReplyType.TEXT,
+                        f"Please send up to {self.config_data.get('batch_max_images', 10)} images "
+                        f"within {minutes} minutes, then one description for all of them "
+                        "or one description per line in the order of the images")
+                    return
+                self.sessions.begin(user_id, SessionState.WAITING_FOR_IMAGE,
+                                    {'channel': channel, 'context': context})
+                e_context['reply'] = Reply(ReplyType.TEXT, f"Please send the image you want to animate within {minutes} minutes")
                 return
 
-            # Handle "动起来" command
-            if content.startswith(self.command_prefix):
-                self.waiting_for_image[user_id] = time.time()
-                e_context['reply'] = Reply(ReplyType.TEXT, "Please send the image you want to animate within 3 minutes")
+            # Expired sessions are already gone, so a missing session means
+            # the message is not part of a dialogue
+            session = self.sessions.get(user_id)
+            if not session:
+                return
+                
+            if session.state == SessionState.COLLECTING_IMAGES:
+                self._collect_batch(e_context, user_id, session, msg, content, channel, context)
                 return
 
             # Handle image upload using pipeline
-            if user_id in self.waiting_for_image:
+            if session.state == SessionState.WAITING_FOR_IMAGE:
                 # Verify message type is image
                 if e_context['context'].type != ContextType.IMAGE:
                     e_context['reply'] = Reply(ReplyType.ERROR, "Please send an image file")
                     return
                     
-                # Get image data from message
-                image_data = self.get_image_data(msg, content)
-                if not image_data:
-                    e_context['reply'] = Reply(ReplyType.ERROR, "Failed to get image data. Please try again.")
+                # Claim the session so a second image cannot start another upload
+                session = self.sessions.transition(
+                    user_id, SessionState.WAITING_FOR_IMAGE, SessionState.PROCESSING_IMAGE,
+                    version=session.version, ttl=self.processing_timeout)
+                if not session:
                     return
-                    
-                # Run image upload pipeline
-                result = self.upload_pipeline.run({
-                    'plugin': self,
-                    'image_data': image_data,
-                    'user_id': user_id
-                })
-                
-                if result.errors:
-                    e_context['reply'] = Reply(ReplyType.ERROR, 
-                                                    result.metadata.get('error_message', "Failed to process image"))
+                if not self._dispatch(e_context, self._process_image, user_id, session.version,
+                                      msg, content, channel, context):
+                    self.sessions.transition(user_id, SessionState.PROCESSING_IMAGE,
+                                             SessionState.WAITING_FOR_IMAGE, version=session.version)
                     return
-                    
-                # Store image URL and update state
-                image_url = result.data.get('image_url')
-                if image_url:
-                    self.user_data[user_id] = {'image_url': image_url}
-                    del self.waiting_for_image[user_id]
-                    self.waiting_for_prompt[user_id] = time.time()
-                    e_context['reply'] = Reply(ReplyType.TEXT, "Please enter your desired animation effect description")
+                e_context['reply'] = Reply(ReplyType.TEXT, "Image received, processing...")
                 return
 
             # Handle prompt input using pipeline
-            if user_id in self.waiting_for_prompt:
+            if session.state == SessionState.WAITING_FOR_PROMPT:
                 # Get stored image URL
-                user_data = self.user_data.get(user_id, {})
-                image_url = user_data.get('image_url')
+                image_url = session.payload.get('image_url')
                 if not image_url:
+                    self.sessions.end(user_id, version=session.version)
                     e_context['reply'] = Reply(ReplyType.ERROR, "Image data not found. Please start over.")
                     return
                     
-                # Run video generation pipeline
-                result = self.generation_pipeline.run({
-                    'plugin': self,
-                    'image_url': image_url,
-                    'prompt': content,
-                    'user_id': user_id
-                })
-                
-                if result.errors:
-                    e_context['reply'] = Reply(ReplyType.ERROR,
-                                                    result.metadata.get('error_message', "Failed to generate video"))
+                session = self.sessions.transition(
+                    user_id, SessionState.WAITING_FOR_PROMPT, SessionState.SUBMITTING,
+                    version=session.version, ttl=self.processing_timeout)
+                if not session:
                     return
-                    
-                # Clean up user state
-                del self.waiting_for_prompt[user_id]
-                if user_id in self.user_data:
-                    del self.user_data[user_id]
-                    
-                task_id = result.data.get('task_id')
-                e_context['reply'] = (
-                    f"Video generation started with task ID: {task_id}\n"
-                    "This may take 10-18 minutes. Please wait..."
-                )
+                job = functools.partial(self._process_prompt, user_id=user_id,
+                                        version=session.version, image_url=image_url,
+                                        prompt=content, channel=channel, context=context)
+                try:
+                    position, wait = self.scheduler.submit(user_id, job)
+                except QueueFullError as e:
+                    logger.warning(f"[Image2Video] Rejected job: {e}")
+                    self.sessions.transition(user_id, SessionState.SUBMITTING,
+                                             SessionState.WAITING_FOR_PROMPT, version=session.version)
+                    e_context['reply'] = Reply(ReplyType.ERROR, "The service is busy right now. Please try again later.")
+                    return
+                if position:
+                    e_context['reply'] = Reply(
+                        ReplyType.TEXT,
+                        f"Your request is number {position} in the queue. "
+                        f"Estimated wait: about {max(1, round(wait / 60))} minutes.")
+                else:
+                    e_context['reply'] = Reply(ReplyType.TEXT, "Submitting your video task...")
 
         except Exception as e:
             logger.error(f"[Image2Video] Error handling context: {e}")
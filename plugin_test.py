@@ -0,0 +1,281 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+import pytest
+from bridge.context import Context, ContextType
+from bridge.reply import Reply, ReplyType
+from .loadtest import StubKling
+from . import plugin as plugin_module
+from .plugin import Image2Video, UncertainSubmitError
+from .sessions import SessionState
+from .video_cache import VideoCache
+
+def make_plugin(config: Dict[str, Any]) -> Image2Video:
+    """Started plugin reading ``config`` instead of config.json"""
+    settings = {
+        'api_url': 'http://127.0.0.1:9/v1/videos/image2video',
+        'ak': 'test-ak', 'sk': 'test-sk-0123456789abcdef0123456789',
+        'imgbb_api_key': 'test',
+        'upload_cache_size': 0, 'journal_file': '', 'image_max_edge': 0,
+        'config_watch': False, 'warmup_enabled': False, 'video_download': False,
+    }
+    settings.update(config)
+
+    class TestPlugin(Image2Video):
+        def _load_config(self) -> Dict[str, Any]:
+            return dict(self.settings)
+
+    # Tests edit plugin.settings and call reload() to simulate config changes
+    TestPlugin.settings = settings
+    plugin = TestPlugin()
+    plugin.start()
+    return plugin
+
+@pytest.fixture
+def stalled_kling():
+    kling = StubKling(latency=30).start()
+    yield kling
+    kling.stop()
+
+def test_stalled_status_query_times_out(stalled_kling):
+    plugin = make_plugin({'api_url': stalled_kling.api_url, 'api_timeout': [1, 0.1]})
+    try:
+        started = time.monotonic()
+        assert plugin.query_video_tasks(['task-1']) == {}
+        # Bounded by the read timeout and transport retries, not the stalled server
+        assert time.monotonic() - started < 10
+    finally:
+        plugin.stop()
+
+class ItchatImage(dict):
+    """Raw picture message with itchat's ``download(fileName)`` signature"""
+
+    def __init__(self, data: bytes, returns_bytes: bool = True):
+        super().__init__(FileName='photo.jpg')
+        self.data = data
+        self.returns_bytes = returns_bytes
+        self.calls = []
+
+    def download(self, fileName):
+        self.calls.append(fileName)
+        if fileName is None:
+            return self.data if self.returns_bytes else None
+        with open(fileName, 'wb') as file:
+            file.write(self.data)
+
+class RawMessage:
+    def __init__(self, raw):
+        self._rawmsg = raw
+
+@pytest.fixture
+def plugin():
+    plugin = make_plugin({})
+    yield plugin
+    plugin.stop()
+
+def test_image_is_downloaded_into_memory(plugin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = ItchatImage(b'jpeg bytes')
+    assert plugin.get_image_data(RawMessage(raw), "photo.jpg") == b'jpeg bytes'
+    assert raw.calls == [None]
+    assert list(tmp_path.iterdir()) == []
+
+def test_file_only_download_falls_back_to_temp_file(plugin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'tmp').mkdir()
+    raw = ItchatImage(b'jpeg bytes', returns_bytes=False)
+    assert plugin.get_image_data(RawMessage(raw), "photo.jpg") == b'jpeg bytes'
+    assert raw.calls == [None, str(tmp_path / 'tmp' / 'photo.jpg')]
+    assert list((tmp_path / 'tmp').iterdir()) == []
+
+class PathOnlyImage(ItchatImage):
+    """Raw picture message whose download fails without a file name"""
+
+    def download(self, fileName):
+        self.calls.append(fileName)
+        with open(fileName, 'wb') as file:
+            file.write(self.data)
+
+def test_download_needing_a_path_falls_back_to_temp_file(plugin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'tmp').mkdir()
+    raw = PathOnlyImage(b'jpeg bytes')
+    assert plugin.get_image_data(RawMessage(raw), "photo.jpg") == b'jpeg bytes'
+    assert raw.calls == [None, str(tmp_path / 'tmp' / 'photo.jpg')]
+    assert list((tmp_path / 'tmp').iterdir()) == []
+
+def test_stalled_submission_is_uncertain(stalled_kling):
+    plugin = make_plugin({'api_url': stalled_kling.api_url, 'api_timeout': [1, 0.1]})
+    try:
+        started = time.monotonic()
+        with pytest.raises(UncertainSubmitError):
+            plugin._post_video_task('http://img/a.jpg', 'wave', {}, 'ext-1')
+        assert time.monotonic() - started < 2
+    finally:
+        plugin.stop()
+
+def test_reload_applies_new_settings(plugin):
+    old_session = plugin.session
+    plugin.settings.update({'session_timeout': 42, 'max_concurrent_tasks': 3})
+    plugin.reload()
+    
+    assert plugin.sessions.ttl == 42
+    assert plugin.scheduler.max_concurrent == 3
+    assert plugin.session is not old_session
+    assert plugin.config_data['session_timeout'] == 42
+
+def test_restart_only_settings_keep_running_values(plugin, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(plugin_module.logger, 'warning', warnings.append)
+    running = plugin.config_data.get('max_workers')
+    plugin.settings['max_workers'] = 99
+    
+    plugin.reload()
+    plugin.settings['session_timeout'] = 42
+    plugin.reload()
+    
+    assert plugin.config_data.get('max_workers') == running
+    assert plugin.config_data['session_timeout'] == 42
+    assert warnings.count("[Image2Video] Restart required to apply: max_workers") == 2
+
+def test_reload_keeps_previous_config_when_new_one_is_invalid(plugin):
+    old_config, old_storage = plugin.config_data, plugin.storage
+    del plugin.settings['imgbb_api_key']
+    plugin.settings['session_timeout'] = 42
+    with pytest.raises(ValueError):
+        plugin.reload()
+    
+    assert plugin.config_data is old_config
+    assert plugin.storage is old_storage
+    assert plugin.sessions.ttl != 42
+
+def test_reload_swaps_credentials_and_honours_issued_callback_urls():
+    plugin = make_plugin({'callback_url': 'http://127.0.0.1/image2video/callback',
+                          'callback_host': '127.0.0.1', 'callback_port': 0})
+    try:
+        receiver = plugin.callback_receiver
+        old_token = plugin.token_provider.get_token()
+        issued = receiver.sign('ext-1')
+        
+        plugin.settings.update({'ak': 'new-ak', 'sk': 'new-sk-0123456789abcdef0123456789'})
+        plugin.reload()
+        
+        assert plugin.token_provider.get_token() != old_token
+        assert plugin.callback_receiver is receiver
+        assert receiver.sign('ext-1') != issued
+        # Tasks submitted before the rotation still get their callbacks accepted
+        assert receiver.verify('ext-1', issued)
+    finally:
+        plugin.stop()
+
+class RecordingChannel:
+    """Channel checking each sent video file while the send is in progress"""
+
+    def __init__(self):
+        self.sent = []
+        self.both_sending = threading.Barrier(2, timeout=5)
+
+    def send(self, reply, context):
+        self.both_sending.wait()
+        with open(reply.content, 'rb') as file:
+            self.sent.append((reply.type, reply.content, file.read()))
+
+def test_concurrent_deliveries_of_one_task_use_separate_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    kling = StubKling(latency=0, video_size=200_000).start()
+    plugin = make_plugin({'api_url': kling.api_url, 'video_download': True,
+                          'video_cache_size_mb': 0})
+    try:
+        channel = RecordingChannel()
+        task_data = {'task_id': 'task-1', 'task_status': 'succeed'}
+        reply = Reply(ReplyType.VIDEO_URL, f"{kling.url}/v/task-1.mp4")
+        threads = [threading.Thread(target=plugin._send_video,
+                                    args=('task-1', user, task_data, reply, channel, None))
+                   for user in ('alice', 'bob')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+    finally:
+        plugin.stop()
+        kling.stop()
+    
+    assert [data for _, _, data in channel.sent] == [kling.video, kling.video]
+    assert {kind for kind, _, _ in channel.sent} == {ReplyType.VIDEO}
+    assert len({path for _, path, _ in channel.sent}) == 2
+    assert list((tmp_path / 'tmp').iterdir()) == []
+
+def test_video_cache_is_sized_before_loading(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    directory = tmp_path / 'tmp' / 'video_cache'
+    directory.mkdir(parents=True)
+    for age, key in enumerate(("old", "new")):
+        path = directory / VideoCache.name_for(key)
+        path.write_bytes(b'v' * 600_000)
+        os.utime(path, (age + 1, age + 1))
+    
+    plugin = make_plugin({'video_download': True, 'video_cache_size_mb': 1})
+    try:
+        assert plugin.video_cache.total_bytes <= 1024 * 1024
+        assert plugin.video_cache.get("old") is None
+        assert plugin.video_cache.get("new")
+    finally:
+        plugin.stop()
+
+def test_concurrent_batch_images_are_all_collected():
+    plugin = make_plugin({'batch_max_images': 100})
+    plugin.sessions.begin('user', SessionState.COLLECTING_IMAGES, {'images': []})
+    replies = []
+    transition = plugin.sessions.transition
+    
+    def slow_transition(*args, **kwargs):
+        # Widens the window between reading a session and changing it
+        time.sleep(0.01)
+        return transition(*args, **kwargs)
+    
+    plugin.sessions.transition = slow_transition
+    
+    def send_image(start, n):
+        e_context = {'context': Context(ContextType.IMAGE, f"image-{n}")}
+        start.wait()
+        plugin._collect_batch(e_context, 'user', plugin.sessions.get('user'),
+                              None, f"image-{n}", None, None)
+        replies.append(e_context['reply'].content)
+    
+    try:
+        # Two images of one user at a time, as a chat client sends a selection
+        for round in range(20):
+            start = threading.Barrier(2)
+            threads = [threading.Thread(target=send_image, args=(start, 2 * round + n))
+                       for n in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        images = plugin.sessions.get('user').payload['images']
+    finally:
+        plugin.stop()
+    
+    assert sorted(content for _, content in images) == sorted(f"image-{n}" for n in range(40))
+    assert sorted(replies) == sorted(f"Image {n} received" for n in range(1, 41))
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_callbacks_must_match_the_submitted_task(journal, tmp_path):
+    plugin = make_plugin({'journal_file': str(tmp_path / 'journal.db') if journal else ''})
+    completed = []
+    plugin.task_poller.complete = lambda task_id, data: completed.append(task_id) or True
+    
+    def callback(task_id, external_task_id):
+        return plugin._on_callback({'task_id': task_id, 'task_status': 'succeed',
+                                    'task_info': {'external_task_id': external_task_id}})
+    
+    try:
+        plugin._record_submission('ext-1', 'task-1')
+        # A validly signed URL reused for another task, and a task never submitted
+        assert callback('task-2', 'ext-1') == 404
+        assert callback('task-9', 'ext-9') == 404
+        assert callback('task-1', 'ext-1') == 200
+    finally:
+        plugin.stop()
+    assert completed == ['task-1']
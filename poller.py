@@ -0,0 +1,262 @@
+from typing import Callable, Dict, List, Any, Optional
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import threading
+import time
+from common.log import logger
+
+# Kling task states that end tracking
+TERMINAL_STATUSES = ("succeed", "failed")
+
+# Pushed results kept for tasks that are not tracked yet
+MAX_EARLY_RESULTS = 256
+
+TaskCallback = Callable[[str, Dict[str, Any]], None]
+
+@dataclass
+class TrackedTask:
+    """A submitted video task awaiting a terminal status"""
+    task_id: str
+    submitted_at: float
+    subscribers: List[TaskCallback] = field(default_factory=list)
+    next_poll: float = 0.0
+    polls: int = 0
+    relaxed: bool = False
+
+class TaskPoller:
+    """Single scheduler loop tracking all outstanding video tasks
+
+    Tasks are kept in a heap ordered by their next poll time. One daemon
+    thread sleeps until the earliest task is due, then queries every task
+    that is due (or about to be) in a single batch, so thread count and
+    poll traffic stay flat as the backlog grows.
+
+    Poll spacing adapts to task age: the first check happens well before the
+    expected finish, the gaps halve as the expected finish approaches and
+    then stretch out again for tasks that overrun.
+
+    Results can also be pushed with ``complete``, e.g. from provider
+    callbacks. Tasks tracked as ``relaxed`` expect such a push and are only
+    polled every ``relaxed_interval`` seconds as a safety net.
+    """
+
+    def __init__(self,
+                 query: Callable[[List[str]], Dict[str, Dict[str, Any]]],
+                 expected_duration: float = 600.0,
+                 min_interval: float = 15.0,
+                 max_interval: float = 120.0,
+                 batch_size: int = 50,
+                 coalesce_window: float = 5.0,
+                 max_age: float = 3600.0,
+                 relaxed_interval: float = 300.0):
+        """Initialize poller
+
+        Args:
+            query: Callable taking a list of task IDs and returning a mapping of
+                task ID to task data (tasks missing from the result are retried)
+            expected_duration: Typical seconds from submission to completion
+            min_interval: Shortest gap between two polls of one task
+            max_interval: Longest gap between two polls of one task
+            batch_size: Maximum number of task IDs per query
+            coalesce_window: Tasks due within this many seconds join the current batch
+            max_age: Seconds after which a task is reported as failed
+            relaxed_interval: Seconds between polls of relaxed tasks
+        """
+        self._query = query
+        self.expected_duration = expected_duration
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = batch_size
+        self.coalesce_window = coalesce_window
+        self.max_age = max_age
+        self.relaxed_interval = relaxed_interval
+
+        self._tasks: Dict[str, TrackedTask] = {}
+        # Pushed results of tasks not tracked yet
+        self._early: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks being tracked"""
+        with self._cond:
+            return len(self._tasks)
+
+    def next_delay(self, elapsed: float) -> float:
+        """Compute seconds until the next poll of a task of the given age"""
+        remaining = self.expected_duration - elapsed
+        if remaining > 0:
+            delay = remaining / 2
+        else:
+            delay = self.min_interval * (1 + (-remaining) / self.expected_duration)
+        return min(max(delay, self.min_interval), self.max_interval)
+
+    def _delay(self, task: TrackedTask, elapsed: float) -> float:
+        delay = self.next_delay(elapsed)
+        return max(delay, self.relaxed_interval) if task.relaxed else delay
+
+    def track(self,
+              task_id: str,
+              callback: TaskCallback,
+              submitted_at: Optional[float] = None,
+              relaxed: bool = False) -> None:
+        """Start tracking a task, or add a subscriber to an already tracked one
+
+        Args:
+            task_id: Provider task ID
+            callback: Called with (task_id, task_data) once the task finishes
+            submitted_at: Submission timestamp, defaults to now
+            relaxed: Whether the result is expected to be pushed with ``complete``
+        """
+        now = time.time()
+        with self._cond:
+            task = self._tasks.get(task_id)
+            if task:
+                task.subscribers.append(callback)
+                return
+            early = self._early.pop(task_id, None)
+            if not early:
+                submitted_at = submitted_at if submitted_at is not None else now
+                task = TrackedTask(task_id=task_id, submitted_at=submitted_at,
+                                   subscribers=[callback], relaxed=relaxed)
+                self._tasks[task_id] = task
+                self._schedule(task, now + self._delay(task, now - submitted_at))
+                self._cond.notify()
+                return
+        self._deliver([(TrackedTask(task_id=task_id, submitted_at=now, subscribers=[callback]), early)])
+
+    def complete(self, task_id: str, data: Dict[str, Any]) -> bool:
+        """Deliver a pushed terminal result
+
+        Returns:
+            Whether the task was being tracked; results of tasks that are not
+            tracked yet are kept briefly for a ``track`` call that follows
+        """
+        with self._cond:
+            task = self._tasks.pop(task_id, None)
+            if not task:
+                self._early[task_id] = data
+                while len(self._early) > MAX_EARLY_RESULTS:
+                    self._early.popitem(last=False)
+                return False
+        self._deliver([(task, data)])
+        return True
+
+    def untrack(self, task_id: str) -> None:
+        """Stop tracking a task without notifying its subscribers"""
+        with self._cond:
+            self._tasks.pop(task_id, None)
+
+    def start(self) -> None:
+        """Start the scheduler thread"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop,
+                                        name="image2video-poller",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the scheduler thread; tracked tasks are kept"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _schedule(self, task: TrackedTask, when: float) -> None:
+        task.next_poll = when
+        heapq.heappush(self._heap, (when, next(self._counter), task.task_id))
+
+    def _take_due(self) -> Optional[List[TrackedTask]]:
+        """Wait until tasks are due and pop a batch; None means stopping"""
+        with self._cond:
+            while self._running:
+                now = time.time()
+                # Drop stale heap entries for untracked or rescheduled tasks
+                while self._heap:
+                    when, _, task_id = self._heap[0]
+                    task = self._tasks.get(task_id)
+                    if task and task.next_poll == when:
+                        break
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                if self._heap[0][0] > now:
+                    self._cond.wait(self._heap[0][0] - now)
+                    continue
+
+                batch: List[TrackedTask] = []
+                horizon = now + self.coalesce_window
+                while self._heap and len(batch) < self.batch_size:
+                    when, _, task_id = self._heap[0]
+                    if when > horizon:
+                        break
+                    heapq.heappop(self._heap)
+                    task = self._tasks.get(task_id)
+                    if task and task.next_poll == when:
+                        batch.append(task)
+                if batch:
+                    return batch
+            return None
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._take_due()
+            if batch is None:
+                return
+            task_ids = [task.task_id for task in batch]
+            try:
+                results = self._query(task_ids)
+            except Exception as e:
+                logger.error(f"[Image2Video] Task status query failed: {e}")
+                results = {}
+            self._process(batch, results)
+
+    def _process(self,
+                 batch: List[TrackedTask],
+                 results: Dict[str, Dict[str, Any]]) -> None:
+        finished = []
+        now = time.time()
+        with self._cond:
+            for task in batch:
+                if self._tasks.get(task.task_id) is not task:
+                    continue
+                task.polls += 1
+                data = results.get(task.task_id)
+                elapsed = now - task.submitted_at
+                if data and data.get('task_status') in TERMINAL_STATUSES:
+                    finished.append((task, data))
+                elif elapsed > self.max_age:
+                    finished.append((task, {
+                        'task_id': task.task_id,
+                        'task_status': 'failed',
+                        'task_status_msg': 'Timed out waiting for task result'
+                    }))
+                else:
+                    self._schedule(task, now + self._delay(task, elapsed))
+                    continue
+                del self._tasks[task.task_id]
+        self._deliver(finished)
+
+    def _deliver(self, finished: List[tuple]) -> None:
+        for task, data in finished:
+            logger.info(
+                f"[Image2Video] Task {task.task_id} finished with status "
+                f"{data.get('task_status')} after {task.polls} polls")
+            for callback in task.subscribers:
+                try:
+                    callback(task.task_id, data)
+                except Exception as e:
+                    logger.error(
+                        f"[Image2Video] Error delivering task {task.task_id}: {e}")
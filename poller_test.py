@@ -0,0 +1,96 @@
+import threading
+import time
+from .poller import TaskPoller
+
+def test_next_delay_adapts_to_task_age():
+    poller = TaskPoller(lambda ids: {}, expected_duration=600,
+                        min_interval=15, max_interval=120)
+    
+    # Sparse early on, denser near the expected finish
+    assert poller.next_delay(0) == 120
+    assert poller.next_delay(500) == 50
+    assert poller.next_delay(590) == 15
+    
+    # Overrunning tasks back off again, up to the cap
+    assert poller.next_delay(1200) == 30
+    assert poller.next_delay(100000) == 120
+
+def test_batches_due_tasks_and_notifies_all_subscribers():
+    queries = []
+    done = threading.Event()
+    delivered = []
+    
+    def query(task_ids):
+        queries.append(sorted(task_ids))
+        return {task_id: {'task_id': task_id, 'task_status': 'succeed'}
+                for task_id in task_ids}
+    
+    def callback(task_id, data):
+        delivered.append(task_id)
+        if len(delivered) == 3:
+            done.set()
+    
+    poller = TaskPoller(query, expected_duration=0.01, min_interval=0.01,
+                        max_interval=0.01, coalesce_window=1.0)
+    poller.track('a', callback, submitted_at=0)
+    poller.track('b', callback, submitted_at=0)
+    poller.track('a', callback)
+    poller.start()
+    try:
+        assert done.wait(2)
+    finally:
+        poller.stop()
+    
+    assert queries == [['a', 'b']]
+    assert sorted(delivered) == ['a', 'a', 'b']
+    assert poller.pending == 0
+
+def test_keeps_polling_unfinished_tasks():
+    statuses = iter(['processing', 'processing', 'failed'])
+    done = threading.Event()
+    results = []
+    
+    def query(task_ids):
+        return {'a': {'task_id': 'a', 'task_status': next(statuses)}}
+    
+    def callback(task_id, data):
+        results.append(data['task_status'])
+        done.set()
+    
+    poller = TaskPoller(query, expected_duration=0.01, min_interval=0.01,
+                        max_interval=0.01)
+    poller.track('a', callback)
+    poller.start()
+    try:
+        assert done.wait(2)
+    finally:
+        poller.stop()
+    assert results == ['failed']
+
+def test_pushed_results_skip_polling():
+    queries = []
+    delivered = []
+    
+    poller = TaskPoller(lambda ids: queries.append(ids) or {}, expected_duration=0.01,
+                        min_interval=0.01, max_interval=0.01, relaxed_interval=60)
+    poller.track('a', lambda task_id, data: delivered.append((task_id, data['task_status'])),
+                 relaxed=True)
+    poller.start()
+    try:
+        time.sleep(0.1)
+        # Relaxed tasks wait for the push instead of being polled
+        assert queries == []
+        assert poller.complete('a', {'task_id': 'a', 'task_status': 'succeed'})
+    finally:
+        poller.stop()
+    assert delivered == [('a', 'succeed')]
+    assert poller.pending == 0
+    assert not poller.complete('a', {'task_id': 'a', 'task_status': 'succeed'})
+
+def test_result_pushed_before_tracking_is_delivered_on_track():
+    delivered = []
+    poller = TaskPoller(lambda ids: {})
+    assert not poller.complete('a', {'task_id': 'a', 'task_status': 'failed'})
+    poller.track('a', lambda task_id, data: delivered.append(data['task_status']))
+    assert delivered == ['failed']
+    assert poller.pending == 0
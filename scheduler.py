@@ -0,0 +1,288 @@
+from typing import Callable, Dict, Any, Optional, Tuple
+from collections import OrderedDict, deque
+import math
+import threading
+import time
+from common.log import logger
+from .executor import QueueFullError
+from .metrics import metrics
+
+class TokenBucket:
+    """Token bucket limiting how often one user may start a job"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.time()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def refund(self) -> None:
+        """Return a token taken for a job that did not start"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class Ticket:
+    """An admitted job's hold on a global concurrency slot"""
+
+    def __init__(self, scheduler: 'AdmissionScheduler', user_id: str,
+                 queued_at: Optional[float] = None):
+        self.user_id = user_id
+        self.admitted_at = time.time()
+        self.queued_at = queued_at if queued_at is not None else self.admitted_at
+        self._scheduler = scheduler
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self, completed: bool = True) -> None:
+        """Give the slot back; safe to call more than once
+
+        Args:
+            completed: Whether the slot was held for a full job, which feeds
+                the wait estimate; pass False for jobs that ended early
+        """
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._scheduler._release(self, completed)
+
+class AdmissionScheduler:
+    """Admission control with a global cap, per-user rate limits and fair queuing
+
+    Jobs wait in one queue per user and are admitted round-robin across
+    users, so a user with many queued jobs cannot starve the others. A job
+    is admitted only when a global slot is free and its user's token bucket
+    has a token. The slot stays held until the job releases its Ticket,
+    which for video tasks is when the provider reports the task finished,
+    so the cap mirrors the provider's concurrency quota.
+    """
+
+    def __init__(self,
+                 dispatch: Callable[[Callable, Ticket], Any],
+                 max_concurrent: int = 10,
+                 user_rate: float = 1 / 60,
+                 user_burst: float = 3,
+                 max_queued: int = 200,
+                 expected_duration: float = 600.0):
+        """Initialize scheduler
+
+        Args:
+            dispatch: Called with (job, ticket) to start an admitted job; may raise
+                QueueFullError to have the job retried shortly
+            max_concurrent: Global number of slots
+            user_rate: Jobs per second each user may start in the long run
+            user_burst: Jobs a user may start back to back
+            max_queued: Maximum number of waiting jobs across all users
+            expected_duration: Initial estimate of how long a slot is held
+        """
+        self._dispatch = dispatch
+        self.max_concurrent = max_concurrent
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_queued = max_queued
+        self.average_duration = expected_duration
+
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._queued = 0
+        self._active = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def configure(self,
+                  max_concurrent: Optional[int] = None,
+                  user_rate: Optional[float] = None,
+                  user_burst: Optional[float] = None,
+                  max_queued: Optional[int] = None) -> None:
+        """Change limits while running; queued jobs and held slots are kept"""
+        with self._cond:
+            if max_concurrent is not None:
+                self.max_concurrent = max_concurrent
+            if max_queued is not None:
+                self.max_queued = max_queued
+            if user_rate is not None or user_burst is not None:
+                self.user_rate = user_rate if user_rate is not None else self.user_rate
+                self.user_burst = user_burst if user_burst is not None else self.user_burst
+                for bucket in self._buckets.values():
+                    bucket.rate = self.user_rate
+                    bucket.capacity = self.user_burst
+                    bucket.tokens = min(bucket.tokens, bucket.capacity)
+            self._cond.notify()
+
+    @property
+    def active(self) -> int:
+        """Number of held slots"""
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        """Number of waiting jobs"""
+        return self._queued
+
+    def submit(self, user_id: str, job: Callable[[Ticket], Any]) -> Tuple[int, float]:
+        """Queue a job for a user
+
+        Returns:
+            Tuple of (queue position, estimated wait in seconds); position 0
+            means the job can start right away
+
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        with self._cond:
+            if self._queued >= self.max_queued:
+                raise QueueFullError(f"Admission queue is full ({self.max_queued} jobs)")
+            queue = self._queues.setdefault(user_id, deque())
+            queue.append((job, time.time()))
+            self._queued += 1
+            position, wait = self._estimate(user_id, len(queue) - 1)
+            self._cond.notify()
+        return position, wait
+
+    def reserve(self, user_id: str) -> Ticket:
+        """Take a slot immediately, e.g. for tasks recovered after a restart"""
+        with self._cond:
+            self._active += 1
+        return Ticket(self, user_id)
+
+    def start(self) -> None:
+        """Start the admission thread"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop,
+                                        name="image2video-scheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop admitting jobs; queued jobs are dropped"""
+        with self._cond:
+            self._running = False
+            self._queues.clear()
+            self._queued = 0
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _estimate(self, user_id: str, index: int) -> Tuple[int, float]:
+        """Estimate queue position and wait of the index-th job of a user
+
+        The wait is the longer of waiting for a global slot and waiting for
+        the user's bucket to refill the index + 1 tokens the user's queued
+        jobs need.
+        """
+        # Round-robin serves up to index + 1 jobs of every other user first
+        ahead = index + sum(min(len(queue), index + 1)
+                            for other, queue in self._queues.items() if other != user_id)
+        free = self.max_concurrent - self._active
+        wait = 0.0
+        if ahead >= free:
+            rounds = math.ceil((ahead - free + 1) / self.max_concurrent)
+            wait = rounds * self.average_duration
+        bucket = self._buckets.get(user_id)
+        if bucket:
+            bucket._refill(time.time())
+        tokens = bucket.tokens if bucket else self.user_burst
+        if tokens < index + 1 and self.user_rate > 0:
+            wait = max(wait, (index + 1 - tokens) / self.user_rate)
+        if not wait:
+            return 0, 0.0
+        return ahead + 1, wait
+
+    def _release(self, ticket: Ticket, completed: bool) -> None:
+        held = time.time() - ticket.admitted_at
+        with self._cond:
+            self._active -= 1
+            if completed:
+                # Exponentially weighted average of slot hold times for wait estimates
+                self.average_duration = 0.9 * self.average_duration + 0.1 * held
+            self._cond.notify()
+
+    def _take_next(self) -> Tuple[Optional[Callable], Optional[Ticket], Optional[float]]:
+        """Pick the next admissible job in round-robin order
+
+        Returns:
+            (job, ticket, None) when a job is admitted, otherwise
+            (None, None, seconds to wait or None to wait for a signal)
+        """
+        if self._active >= self.max_concurrent or not self._queues:
+            return None, None, None
+        now = time.time()
+        soonest = None
+        for user_id in list(self._queues):
+            queue = self._queues[user_id]
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            wait = bucket.wait_time(now)
+            # Rotate this user to the back so others go first next time
+            self._queues.move_to_end(user_id)
+            if wait > 0:
+                soonest = wait if soonest is None else min(soonest, wait)
+                continue
+            bucket.take(now)
+            job, queued_at = queue.popleft()
+            metrics.observe("scheduler_queue_wait_seconds", now - queued_at)
+            if not queue:
+                del self._queues[user_id]
+            self._queued -= 1
+            self._active += 1
+            return job, Ticket(self, user_id, queued_at), None
+        return None, None, soonest
+
+    def _prune_buckets(self) -> None:
+        # Full buckets of idle users carry no state worth keeping
+        now = time.time()
+        for user_id in [user_id for user_id, bucket in self._buckets.items()
+                        if user_id not in self._queues and bucket.wait_time(now) == 0
+                        and bucket.tokens >= bucket.capacity]:
+            del self._buckets[user_id]
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    job, ticket, wait = self._take_next()
+                    if job:
+                        break
+                    if len(self._buckets) > 4 * max(self._queued, 256):
+                        self._prune_buckets()
+                    self._cond.wait(wait)
+            try:
+                self._dispatch(job, ticket)
+            except QueueFullError:
+                # Workers are saturated: put the job back at the head and retry
+                # shortly, without charging the user for the attempt
+                with self._cond:
+                    self._queues.setdefault(ticket.user_id, deque()).appendleft((job, ticket.queued_at))
+                    self._queues.move_to_end(ticket.user_id, last=False)
+                    self._queued += 1
+                    bucket = self._buckets.get(ticket.user_id)
+                    if bucket:
+                        bucket.refund()
+                ticket.release(completed=False)
+                time.sleep(0.5)
+            except Exception as e:
+                logger.error(f"[Image2Video] Failed to dispatch job of {ticket.user_id}: {e}")
+                ticket.release(completed=False)
@@ -0,0 +1,125 @@
+import threading
+import time
+import pytest
+from .executor import QueueFullError
+from .scheduler import AdmissionScheduler, TokenBucket
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_users_are_served_round_robin():
+    order = []
+
+    def dispatch(job, ticket):
+        order.append(job)
+        ticket.release()
+
+    scheduler = AdmissionScheduler(dispatch, max_concurrent=1, user_rate=100, user_burst=100)
+    for job in ("a1", "a2", "a3"):
+        scheduler.submit("alice", job)
+    scheduler.submit("bob", "b1")
+    scheduler.start()
+    try:
+        assert wait_for(lambda: len(order) == 4)
+    finally:
+        scheduler.stop()
+    assert order == ["a1", "b1", "a2", "a3"]
+
+def test_global_cap_holds_until_tickets_are_released():
+    tickets = []
+    scheduler = AdmissionScheduler(lambda job, ticket: tickets.append(ticket),
+                                   max_concurrent=2, user_rate=100, user_burst=100)
+    scheduler.start()
+    try:
+        for index in range(3):
+            scheduler.submit(f"user-{index}", "job")
+        assert wait_for(lambda: len(tickets) == 2)
+        time.sleep(0.05)
+        assert len(tickets) == 2 and scheduler.queued == 1
+        tickets[0].release()
+        tickets[0].release()
+        assert wait_for(lambda: len(tickets) == 3)
+        assert scheduler.active == 2
+    finally:
+        scheduler.stop()
+
+def test_user_rate_limit():
+    started = []
+    scheduler = AdmissionScheduler(lambda job, ticket: started.append(job),
+                                   max_concurrent=10, user_rate=0.001, user_burst=2)
+    scheduler.start()
+    try:
+        for job in ("a1", "a2", "a3"):
+            scheduler.submit("alice", job)
+        scheduler.submit("bob", "b1")
+        assert wait_for(lambda: len(started) == 3)
+        time.sleep(0.05)
+        # Alice's third job waits for a token while Bob is unaffected
+        assert sorted(started) == ["a1", "a2", "b1"]
+        assert scheduler.queued == 1
+    finally:
+        scheduler.stop()
+
+def test_queue_position_estimates():
+    scheduler = AdmissionScheduler(lambda job, ticket: None, max_concurrent=2, expected_duration=100)
+    assert scheduler.submit("alice", "a1") == (0, 0.0)
+    assert scheduler.submit("alice", "a2") == (0, 0.0)
+    # Two slots are spoken for, the third job waits one round
+    assert scheduler.submit("alice", "a3") == (3, 100)
+    # Round-robin puts Bob's first job ahead of Alice's second
+    assert scheduler.submit("bob", "b1") == (0, 0.0)
+
+def test_estimate_includes_waiting_for_a_token():
+    started = []
+    scheduler = AdmissionScheduler(lambda job, ticket: started.append(job), max_concurrent=5,
+                                   user_rate=1 / 60, user_burst=1)
+    scheduler.start()
+    try:
+        assert scheduler.submit("alice", "a1") == (0, 0.0)
+        deadline = time.time() + 2
+        while not started and time.time() < deadline:
+            time.sleep(0.01)
+        # Slots are free but Alice's bucket is empty for about a minute
+        position, wait = scheduler.submit("alice", "a2")
+        assert position == 1
+        assert 55 < wait <= 60
+        assert scheduler.submit("bob", "b1") == (0, 0.0)
+    finally:
+        scheduler.stop()
+
+def test_queue_limit():
+    scheduler = AdmissionScheduler(lambda job, ticket: None, max_queued=1)
+    scheduler.submit("alice", "a1")
+    with pytest.raises(QueueFullError):
+        scheduler.submit("bob", "b1")
+
+def test_saturated_dispatch_requeues_without_spending_tokens():
+    attempts = []
+    started = threading.Event()
+
+    def dispatch(job, ticket):
+        attempts.append(job)
+        if len(attempts) < 3:
+            raise QueueFullError("workers busy")
+        started.set()
+
+    # One token and no refill: a charged retry would leave the job stuck
+    scheduler = AdmissionScheduler(dispatch, max_concurrent=1, user_rate=0, user_burst=1)
+    scheduler.start()
+    try:
+        scheduler.submit("alice", "a1")
+        assert started.wait(3)
+    finally:
+        scheduler.stop()
+    assert attempts == ["a1", "a1", "a1"]
+    assert scheduler.active == 1
+
+def test_token_bucket_refund_is_capped():
+    bucket = TokenBucket(rate=0, capacity=2)
+    bucket.take(time.time())
+    bucket.refund()
+    bucket.refund()
+    assert bucket.tokens == 2
@@ -0,0 +1,270 @@
+from typing import Callable, Dict, Any, List, Optional
+from collections import OrderedDict
+from enum import Enum, auto
+import heapq
+import itertools
+import threading
+import time
+from common.log import logger
+
+class SessionState(Enum):
+    """Enum representing the steps of the image-to-video dialogue"""
+    WAITING_FOR_IMAGE = auto()
+    PROCESSING_IMAGE = auto()
+    WAITING_FOR_PROMPT = auto()
+    SUBMITTING = auto()
+    COLLECTING_IMAGES = auto()
+    PROCESSING_BATCH = auto()
+
+class Session:
+    """Dialogue state of one user"""
+    __slots__ = ('user_id', 'state', 'payload', 'expires_at', 'version')
+
+    def __init__(self, user_id: str, state: SessionState,
+                 payload: Dict[str, Any], expires_at: float, version: int):
+        self.user_id = user_id
+        self.state = state
+        self.payload = payload
+        self.expires_at = expires_at
+        self.version = version
+
+class SessionStore:
+    """Bounded store of per-user dialogue sessions with proactive expiry
+
+    Every session expires ``ttl`` seconds after its last transition. Expiry
+    times sit in a heap drained by one sweeper thread, so abandoned sessions
+    are removed even if the user never writes again; ``on_expire`` is called
+    for each of them. When ``max_entries`` is reached the least recently
+    updated session is evicted. All state changes go through compare-and-set
+    transitions under one lock, so concurrent messages of one user cannot
+    both advance the same session.
+    """
+
+    def __init__(self,
+                 ttl: float = 180.0,
+                 max_entries: int = 10000,
+                 on_expire: Optional[Callable[[Session], None]] = None,
+                 on_change: Optional[Callable[[str, Optional[Session]], None]] = None):
+        """Initialize store
+
+        Args:
+            ttl: Default seconds a session lives after its last transition
+            max_entries: Maximum number of sessions kept
+            on_expire: Called with each session removed by expiry or eviction
+            on_change: Called under the store lock with (user_id, session) after
+                every change, session being None on removal; must not block
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_expire = on_expire
+        self.on_change = on_change
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._heap: List[tuple] = []
+        self._versions = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    @property
+    def size(self) -> int:
+        """Number of live sessions"""
+        with self._cond:
+            return len(self._sessions)
+
+    def get(self, user_id: str) -> Optional[Session]:
+        """Get a user's live session"""
+        expired = None
+        with self._cond:
+            session = self._sessions.get(user_id)
+            if session and session.expires_at <= time.time():
+                expired = self._remove(user_id)
+                session = None
+        if expired:
+            self._notify_expired([expired])
+        return session
+
+    def begin(self,
+              user_id: str,
+              state: SessionState,
+              payload: Optional[Dict[str, Any]] = None,
+              ttl: Optional[float] = None) -> Session:
+        """Start a new session for a user, replacing any existing one"""
+        evicted = []
+        with self._cond:
+            session = Session(user_id, state, payload or {},
+                              time.time() + (ttl if ttl is not None else self.ttl),
+                              next(self._versions))
+            self._sessions.pop(user_id, None)
+            self._sessions[user_id] = session
+            while len(self._sessions) > self.max_entries:
+                evicted.append(self._remove(next(iter(self._sessions))))
+            self._schedule(session)
+            self._changed(user_id, session)
+        if evicted:
+            logger.warning(f"[Image2Video] Session store full, evicted {len(evicted)} sessions")
+            self._notify_expired(evicted)
+        return session
+
+    def transition(self,
+                   user_id: str,
+                   expected: SessionState,
+                   state: SessionState,
+                   payload: Optional[Dict[str, Any]] = None,
+                   version: Optional[int] = None,
+                   ttl: Optional[float] = None) -> Optional[Session]:
+        """Atomically move a session from one state to another
+
+        Args:
+            user_id: Owner of the session
+            expected: State the session must currently be in
+            state: New state
+            payload: Optional replacement payload
+            version: If given, the session must still be this exact session
+            ttl: Optional lifetime override for the new state
+
+        Returns:
+            The updated session, or None if it is gone or no longer matches
+        """
+        with self._cond:
+            session = self._sessions.get(user_id)
+            if (not session or session.state != expected
+                    or session.expires_at <= time.time()
+                    or (version is not None and session.version != version)):
+                return None
+            session.state = state
+            if payload is not None:
+                session.payload = payload
+            session.expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+            self._sessions.move_to_end(user_id)
+            self._schedule(session)
+            self._changed(user_id, session)
+            return session
+
+    def update(self,
+               user_id: str,
+               expected: SessionState,
+               fn: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+               ttl: Optional[float] = None) -> Optional[Session]:
+        """Atomically replace a session's payload with ``fn(payload)``
+
+        ``fn`` runs under the store lock, so concurrent updates of one
+        session each see the result of the previous one; it must be quick.
+        Returning None from ``fn`` leaves the session unchanged.
+
+        Returns:
+            The session, or None if it is gone or not in the expected state
+        """
+        with self._cond:
+            session = self._sessions.get(user_id)
+            if not session or session.state != expected or session.expires_at <= time.time():
+                return None
+            payload = fn(session.payload)
+            if payload is None:
+                return session
+            session.payload = payload
+            session.expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+            self._sessions.move_to_end(user_id)
+            self._schedule(session)
+            self._changed(user_id, session)
+            return session
+
+    def restore(self,
+                user_id: str,
+                state: SessionState,
+                payload: Dict[str, Any],
+                expires_at: float) -> Optional[Session]:
+        """Re-insert a persisted session with its original expiry"""
+        if expires_at <= time.time():
+            return None
+        with self._cond:
+            session = Session(user_id, state, payload, expires_at, next(self._versions))
+            self._sessions[user_id] = session
+            self._schedule(session)
+            return session
+
+    def end(self,
+            user_id: str,
+            expected: Optional[SessionState] = None,
+            version: Optional[int] = None) -> Optional[Session]:
+        """Remove a session, optionally only if it is in the expected state"""
+        with self._cond:
+            session = self._sessions.get(user_id)
+            if (not session
+                    or (expected is not None and session.state != expected)
+                    or (version is not None and session.version != version)):
+                return None
+            return self._remove(user_id)
+
+    def clear(self) -> None:
+        """Drop all sessions without notification"""
+        with self._cond:
+            self._sessions.clear()
+            self._heap.clear()
+
+    def start(self) -> None:
+        """Start the expiry sweeper thread"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._sweep,
+                                        name="image2video-sessions",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the expiry sweeper thread"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _remove(self, user_id: str) -> Session:
+        session = self._sessions.pop(user_id)
+        self._changed(user_id, None)
+        return session
+
+    def _changed(self, user_id: str, session: Optional[Session]) -> None:
+        if not self.on_change:
+            return
+        try:
+            self.on_change(user_id, session)
+        except Exception as e:
+            logger.error(f"[Image2Video] Error recording session change of {user_id}: {e}")
+
+    def _schedule(self, session: Session) -> None:
+        heapq.heappush(self._heap, (session.expires_at, session.version, session.user_id))
+        self._cond.notify()
+
+    def _sweep(self) -> None:
+        while True:
+            expired = []
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    expires_at, version, user_id = heapq.heappop(self._heap)
+                    session = self._sessions.get(user_id)
+                    # Skip entries superseded by a later transition
+                    if (session and session.version == version
+                            and session.expires_at == expires_at):
+                        expired.append(self._remove(user_id))
+                if not expired:
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            if expired:
+                self._notify_expired(expired)
+
+    def _notify_expired(self, sessions: List[Session]) -> None:
+        if not self.on_expire:
+            return
+        for session in sessions:
+            try:
+                self.on_expire(session)
+            except Exception as e:
+                logger.error(f"[Image2Video] Error handling expired session of {session.user_id}: {e}")
@@ -0,0 +1,77 @@
+import threading
+import time
+from .sessions import SessionState, SessionStore
+
+def test_transitions_are_compare_and_set():
+    store = SessionStore()
+    session = store.begin('user', SessionState.WAITING_FOR_IMAGE)
+    
+    moved = store.transition('user', SessionState.WAITING_FOR_IMAGE,
+                             SessionState.PROCESSING_IMAGE, version=session.version)
+    assert moved.state == SessionState.PROCESSING_IMAGE
+    
+    # A second message racing for the same step loses
+    assert store.transition('user', SessionState.WAITING_FOR_IMAGE,
+                            SessionState.PROCESSING_IMAGE) is None
+    
+    # A restarted dialogue is not advanced by a job of the old one
+    store.begin('user', SessionState.WAITING_FOR_IMAGE)
+    store.transition('user', SessionState.WAITING_FOR_IMAGE, SessionState.PROCESSING_IMAGE)
+    assert store.transition('user', SessionState.PROCESSING_IMAGE,
+                            SessionState.WAITING_FOR_PROMPT, version=session.version) is None
+
+def test_concurrent_updates_are_not_lost():
+    store = SessionStore()
+    store.begin('user', SessionState.COLLECTING_IMAGES, {'images': []})
+    start = threading.Barrier(8)
+    
+    def add(n):
+        start.wait()
+        store.update('user', SessionState.COLLECTING_IMAGES,
+                     lambda payload: dict(payload, images=payload['images'] + [n]))
+    
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(store.get('user').payload['images']) == list(range(8))
+    # Only sessions in the expected state are updated
+    assert store.update('user', SessionState.WAITING_FOR_IMAGE, lambda payload: {}) is None
+
+def test_sessions_expire_without_further_messages():
+    expired = []
+    done = threading.Event()
+    
+    def on_expire(session):
+        expired.append(session.user_id)
+        done.set()
+    
+    store = SessionStore(ttl=0.05, on_expire=on_expire)
+    store.start()
+    try:
+        store.begin('user', SessionState.WAITING_FOR_IMAGE)
+        assert done.wait(2)
+    finally:
+        store.stop()
+    assert expired == ['user']
+    assert store.size == 0
+
+def test_transition_extends_lifetime():
+    store = SessionStore(ttl=0.1)
+    store.begin('user', SessionState.WAITING_FOR_IMAGE)
+    store.transition('user', SessionState.WAITING_FOR_IMAGE,
+                     SessionState.PROCESSING_IMAGE, ttl=60)
+    time.sleep(0.15)
+    assert store.get('user').state == SessionState.PROCESSING_IMAGE
+
+def test_evicts_least_recently_updated_when_full():
+    evicted = []
+    store = SessionStore(max_entries=2, on_expire=lambda s: evicted.append(s.user_id))
+    store.begin('a', SessionState.WAITING_FOR_IMAGE)
+    store.begin('b', SessionState.WAITING_FOR_IMAGE)
+    store.transition('a', SessionState.WAITING_FOR_IMAGE, SessionState.PROCESSING_IMAGE)
+    store.begin('c', SessionState.WAITING_FOR_IMAGE)
+    assert evicted == ['b']
+    assert 'a' in store and 'c' in store and 'b' not in store
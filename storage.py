@@ -0,0 +1,323 @@
+from typing import Optional, Dict, Any, List, Tuple, Union
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import abc
+import base64
+import threading
+import time
+import requests
+from common.log import logger
+from .metrics import metrics
+from .multipart import MultipartBody
+
+ImagePayload = Union[bytes, memoryview, str]
+
+class StorageError(Exception):
+    """Raised when an image host rejects or fails an upload"""
+    pass
+
+class ImageStorage(abc.ABC):
+    """Base class for image hosting backends
+
+    A backend turns image bytes into the value sent as ``image`` in the
+    video task payload: normally a public URL, or the image itself for
+    backends that skip hosting.
+    """
+
+    name = "base"
+    # Whether results may be reused for identical images
+    cacheable = True
+    # (connect, read) timeout of each upload request
+    timeout: Tuple[float, float] = (10, 60)
+
+    @abc.abstractmethod
+    def upload(self, session: requests.Session, image_data: ImagePayload,
+               cancel: Optional[threading.Event] = None,
+               timeout: Optional[Tuple[float, float]] = None) -> str:
+        """Upload an image and return the reference for the video task
+
+        Setting ``cancel`` aborts an upload that is still sending its body;
+        ``timeout`` overrides the backend's (connect, read) timeout.
+        """
+
+    @property
+    def cache_namespace(self) -> str:
+        """Identifies where uploads end up, so cached URLs are never reused across hosts"""
+        return self.name
+
+    def endpoints(self) -> List[str]:
+        """URLs the backend sends requests to, for connection warm-up"""
+        return []
+
+    def close(self) -> None:
+        """Release resources held by the backend"""
+        pass
+
+class ImgBBStorage(ImageStorage):
+    """Hosts images on ImgBB"""
+
+    name = "imgbb"
+
+    def __init__(self, api_key: str, upload_url: str = "https://api.imgbb.com/1/upload",
+                 timeout: Tuple[float, float] = (10, 60)):
+        self.api_key = api_key
+        self.upload_url = upload_url
+        self.timeout = tuple(timeout)
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{self.upload_url}"
+
+    def endpoints(self) -> List[str]:
+        return [self.upload_url]
+
+    def upload(self, session: requests.Session, image_data: ImagePayload,
+               cancel: Optional[threading.Event] = None,
+               timeout: Optional[Tuple[float, float]] = None) -> str:
+        timeout = timeout or self.timeout
+        if isinstance(image_data, str):
+            response = session.post(
+                self.upload_url,
+                data={'key': self.api_key, 'image': image_data},
+                timeout=timeout
+            )
+        else:
+            body = MultipartBody(files={'image': ('image', image_data)}, cancel=cancel)
+            response = session.post(
+                self.upload_url,
+                params={'key': self.api_key},
+                headers={'Content-Type': body.content_type},
+                data=body,
+                timeout=timeout
+            )
+        if response.status_code == 200:
+            result = response.json()
+            if result.get('success'):
+                return result['data']['url']
+        raise StorageError(f"Failed to upload to ImgBB: {response.text}")
+
+class HTTPFileStorage(ImageStorage):
+    """Hosts images on a local or self-hosted HTTP file store
+
+    Posts the image as a multipart file field and reads the public URL from
+    the JSON response (``url_field`` may be a dotted path) or, when no field
+    is configured, from the plain-text response body.
+    """
+
+    name = "http"
+
+    def __init__(self,
+                 upload_url: str,
+                 field: str = "file",
+                 url_field: Optional[str] = "url",
+                 headers: Optional[Dict[str, str]] = None,
+                 timeout: Tuple[float, float] = (10, 60)):
+        self.upload_url = upload_url
+        self.field = field
+        self.url_field = url_field
+        self.headers = headers or {}
+        self.timeout = tuple(timeout)
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{self.upload_url}"
+
+    def endpoints(self) -> List[str]:
+        return [self.upload_url]
+
+    def upload(self, session: requests.Session, image_data: ImagePayload,
+               cancel: Optional[threading.Event] = None,
+               timeout: Optional[Tuple[float, float]] = None) -> str:
+        if isinstance(image_data, str):
+            image_data = base64.b64decode(image_data)
+        body = MultipartBody(files={self.field: ('image', image_data)}, cancel=cancel)
+        response = session.post(
+            self.upload_url,
+            headers=dict(self.headers, **{'Content-Type': body.content_type}),
+            data=body,
+            timeout=timeout or self.timeout
+        )
+        if response.status_code not in (200, 201):
+            raise StorageError(f"Failed to upload to {self.upload_url}: {response.text}")
+        if not self.url_field:
+            return response.text.strip()
+        value: Any = response.json()
+        for key in self.url_field.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        if not value:
+            raise StorageError(f"No '{self.url_field}' in upload response: {response.text}")
+        return value
+
+class InlineStorage(ImageStorage):
+    """Skips hosting and embeds the base64 image in the video task payload"""
+
+    name = "inline"
+    cacheable = False
+
+    def upload(self, session: requests.Session, image_data: ImagePayload,
+               cancel: Optional[threading.Event] = None,
+               timeout: Optional[Tuple[float, float]] = None) -> str:
+        if isinstance(image_data, str):
+            return image_data
+        return base64.b64encode(image_data).decode('ascii')
+
+class HedgedStorage(ImageStorage):
+    """Uploads to a primary backend and hedges slow uploads on alternates
+
+    When the primary has not answered within the ``percentile`` of recent
+    upload times (``delay`` seconds until enough uploads were seen), the
+    same image is also sent to the next backend; a failed upload hands over
+    at once. The first success wins and the other uploads are cancelled
+    while they are still sending. A losing upload that already sent its
+    body cannot be interrupted, so every upload waits at most
+    ``attempt_timeout`` seconds for its response; that bounds how long
+    a loser keeps its pool thread. Backends may be different hosts or the
+    same host with another key.
+    """
+
+    name = "hedged"
+
+    def __init__(self,
+                 backends: List[ImageStorage],
+                 percentile: float = 95.0,
+                 delay: float = 2.0,
+                 min_samples: int = 20,
+                 max_workers: int = 16,
+                 attempt_timeout: float = 15.0):
+        """Initialize hedged storage
+
+        Args:
+            backends: Primary backend followed by alternates in hedging order
+            percentile: Percentile of recent upload times after which to hedge
+            delay: Hedge delay in seconds until min_samples uploads were timed
+            min_samples: Uploads to time before using the percentile
+            max_workers: Threads available for concurrent uploads
+            attempt_timeout: Seconds each upload waits for its response
+        """
+        self.backends = backends
+        self.percentile = percentile
+        self.delay = delay
+        self.min_samples = min_samples
+        self.attempt_timeout = attempt_timeout
+        self.cacheable = all(backend.cacheable for backend in backends)
+        self._latencies: deque = deque(maxlen=200)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="image2video-upload")
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for an upload before starting the next one"""
+        latencies = sorted(self._latencies)
+        if len(latencies) < self.min_samples:
+            return self.delay
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))]
+
+    @property
+    def in_flight(self) -> int:
+        """Number of uploads still holding a pool thread, including losers"""
+        return self._in_flight
+
+    def _attempt(self, backend: ImageStorage, session: requests.Session,
+                 image_data: ImagePayload, cancel: threading.Event) -> str:
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            connect, read = backend.timeout
+            return backend.upload(session, image_data, cancel,
+                                  timeout=(connect, min(read, self.attempt_timeout)))
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def upload(self, session: requests.Session, image_data: ImagePayload,
+               cancel: Optional[threading.Event] = None,
+               timeout: Optional[Tuple[float, float]] = None) -> str:
+        started = time.perf_counter()
+        cancels = [cancel or threading.Event()]
+        pending: Dict[Future, ImageStorage] = {}
+        remaining = list(self.backends)
+        error: Optional[Exception] = None
+
+        def start() -> None:
+            backend = remaining.pop(0)
+            event = threading.Event()
+            cancels.append(event)
+            pending[self._pool.submit(self._attempt, backend, session, image_data, event)] = backend
+
+        start()
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=self.hedge_delay() if remaining else None,
+                               return_when=FIRST_COMPLETED)
+                if cancels[0].is_set():
+                    raise StorageError("Upload cancelled")
+                if not done:
+                    logger.debug(f"[Image2Video] Upload slow, hedging on {remaining[0].name}")
+                    metrics.inc("upload_hedges_total", backend=remaining[0].name)
+                    start()
+                    continue
+                for future in done:
+                    backend = pending.pop(future)
+                    try:
+                        image_url = future.result()
+                    except Exception as e:
+                        logger.warning(f"[Image2Video] Upload to {backend.name} failed: {e}")
+                        error = e
+                        continue
+                    self._latencies.append(time.perf_counter() - started)
+                    metrics.inc("upload_hedge_wins_total", backend=backend.name)
+                    return image_url
+                if not pending and remaining:
+                    start()
+            raise error or StorageError("No upload backend configured")
+        finally:
+            for event in cancels[1:]:
+                event.set()
+
+    @property
+    def cache_namespace(self) -> str:
+        return "+".join(backend.cache_namespace for backend in self.backends)
+
+    def endpoints(self) -> List[str]:
+        return [url for backend in self.backends for url in backend.endpoints()]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        for backend in self.backends:
+            backend.close()
+
+def create_storage(config: Dict[str, Any]) -> ImageStorage:
+    """Create the image storage backend selected in the plugin config
+
+    With ``image_storage_alternates`` configured, the selected backend
+    becomes the primary of a HedgedStorage.
+    """
+    primary = _create_backend(config, config.get('image_storage'))
+    alternates = config.get('image_storage_alternates') or []
+    if not alternates:
+        return primary
+    return HedgedStorage(
+        [primary] + [_create_backend(config, options) for options in alternates],
+        percentile=config.get('hedge_percentile', 95),
+        delay=config.get('hedge_delay', 2),
+        attempt_timeout=config.get('hedge_attempt_timeout', 15)
+    )
+
+def _create_backend(config: Dict[str, Any], options: Optional[Dict[str, Any]]) -> ImageStorage:
+    options = dict(options or {})
+    backend = options.pop('backend', 'imgbb')
+    if backend in ('imgbb', 'http'):
+        options.setdefault('timeout', config.get('upload_timeout', (10, 60)))
+    if backend == 'imgbb':
+        api_key = options.pop('api_key', config.get('imgbb_api_key'))
+        if api_key is None:
+            raise ValueError("Configuration missing required keys: imgbb_api_key")
+        return ImgBBStorage(api_key, **options)
+    if backend == 'http':
+        if not options.get('upload_url'):
+            raise ValueError("image_storage.upload_url is required for the http backend")
+        return HTTPFileStorage(**options)
+    if backend == 'inline':
+        return InlineStorage()
+    raise ValueError(f"Unknown image storage backend: {backend}")
@@ -0,0 +1,119 @@
+import base64
+import threading
+import time
+import pytest
+import requests
+from .multipart import MultipartBody, UploadCancelled
+from .storage import (HTTPFileStorage, HedgedStorage, ImageStorage, InlineStorage,
+                      StorageError, create_storage)
+
+@pytest.fixture
+def file_store(stub_server):
+    """Local stand-in for a self-hosted file store"""
+    received = []
+    
+    def respond(method, path, body):
+        received.append((store.request.headers['Content-Type'], body))
+        if path == '/slow':
+            time.sleep(1)
+        status = 500 if path == '/fail' else 200
+        return status, {'data': {'url': f'http://files{path}.jpg'}}
+    
+    store = stub_server(respond)
+    return store.url, received
+
+def test_http_storage_streams_multipart_upload(file_store):
+    base_url, received = file_store
+    storage = HTTPFileStorage(f"{base_url}/upload", field='image', url_field='data.url')
+    
+    with requests.Session() as session:
+        assert storage.upload(session, b'\x89PNG-bytes') == 'http://files/upload.jpg'
+    
+    content_type, body = received[0]
+    assert content_type.startswith('multipart/form-data; boundary=')
+    assert b'name="image"' in body
+    assert b'\x89PNG-bytes' in body
+
+def test_http_storage_reports_failures(file_store):
+    base_url, _ = file_store
+    storage = HTTPFileStorage(f"{base_url}/fail")
+    with requests.Session() as session, pytest.raises(StorageError):
+        storage.upload(session, b'data')
+
+def test_inline_storage_embeds_base64():
+    storage = InlineStorage()
+    assert storage.upload(None, b'data') == base64.b64encode(b'data').decode()
+    assert not storage.cacheable
+
+def test_backends_must_implement_upload():
+    class Incomplete(ImageStorage):
+        name = "incomplete"
+    
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_create_storage_from_config():
+    assert create_storage({'imgbb_api_key': 'key'}).name == 'imgbb'
+    assert create_storage({'image_storage': {'backend': 'inline'}}).name == 'inline'
+    http = create_storage({'image_storage': {'backend': 'http', 'upload_url': 'http://files/'}})
+    hedged = create_storage({'imgbb_api_key': 'key',
+                             'image_storage_alternates': [{'backend': 'imgbb', 'api_key': 'key2'}]})
+    assert [backend.api_key for backend in hedged.backends] == ['key', 'key2']
+    hedged.close()
+    assert http.upload_url == 'http://files/'
+    with pytest.raises(ValueError):
+        create_storage({})
+    with pytest.raises(ValueError):
+        create_storage({'image_storage': {'backend': 'ftp'}})
+
+def test_hedged_storage_uses_alternate_when_primary_is_slow(file_store):
+    base_url, received = file_store
+    storage = HedgedStorage([HTTPFileStorage(f"{base_url}/slow", url_field='data.url'),
+                             HTTPFileStorage(f"{base_url}/fast", url_field='data.url')],
+                            delay=0.1)
+    
+    started = time.monotonic()
+    with requests.Session() as session:
+        assert storage.upload(session, b'data') == 'http://files/fast.jpg'
+    assert time.monotonic() - started < 0.8
+    storage.close()
+
+def test_hedged_storage_frees_losing_upload(file_store):
+    base_url, _ = file_store
+    storage = HedgedStorage([HTTPFileStorage(f"{base_url}/slow", url_field='data.url'),
+                             HTTPFileStorage(f"{base_url}/fast", url_field='data.url')],
+                            delay=0.05, attempt_timeout=0.3)
+    
+    with requests.Session() as session:
+        assert storage.upload(session, b'data') == 'http://files/fast.jpg'
+        # The slow primary already sent its body and waits 1s for a response
+        deadline = time.monotonic() + 0.8
+        while storage.in_flight and time.monotonic() < deadline:
+            time.sleep(0.02)
+    assert storage.in_flight == 0
+    storage.close()
+
+def test_hedged_storage_falls_over_on_failure(file_store):
+    base_url, _ = file_store
+    storage = HedgedStorage([HTTPFileStorage(f"{base_url}/fail"), InlineStorage()], delay=5)
+    
+    with requests.Session() as session:
+        assert storage.upload(session, b'data') == base64.b64encode(b'data').decode()
+    assert not storage.cacheable
+    storage.close()
+
+def test_hedge_delay_follows_recent_upload_times():
+    storage = HedgedStorage([InlineStorage()], percentile=90, delay=3, min_samples=10)
+    assert storage.hedge_delay() == 3
+    for latency in range(1, 11):
+        storage._latencies.append(latency / 10)
+    assert storage.hedge_delay() == 1.0
+    storage.close()
+
+def test_cancelled_body_stops_reading():
+    cancel = threading.Event()
+    body = MultipartBody(files={'image': ('image', b'x' * 100)}, cancel=cancel)
+    body.read(10)
+    cancel.set()
+    with pytest.raises(UploadCancelled):
+        body.read(10)
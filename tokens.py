@@ -0,0 +1,84 @@
+from typing import Dict, Optional, Tuple
+import threading
+import time
+import jwt
+from common.log import logger
+
+class _CachedToken:
+    """Signed token of one credential set and its expiry"""
+    __slots__ = ('ak', 'sk', 'current', 'lock')
+
+    def __init__(self, ak: str, sk: str):
+        self.ak = ak
+        self.sk = sk
+        # (token, expires_at), replaced as a whole so readers need no lock
+        self.current: Tuple[Optional[str], float] = (None, 0.0)
+        self.lock = threading.Lock()
+
+class TokenProvider:
+    """Thread-safe provider of cached HS256 API tokens
+
+    Each credential set mints one token that is shared by all threads until
+    it comes within ``refresh_margin`` seconds of expiry. Refreshing happens
+    under a per-credential lock with a second check inside it, so concurrent
+    callers never mint more than one token per refresh window.
+    """
+
+    def __init__(self,
+                 credentials: Dict[str, Tuple[str, str]],
+                 default: str = "default",
+                 ttl: int = 1800,
+                 refresh_margin: int = 300):
+        """Initialize provider
+
+        Args:
+            credentials: Mapping of credential set name to (ak, sk)
+            default: Name of the credential set used when none is given
+            ttl: Validity of a minted token in seconds
+            refresh_margin: Seconds before expiry at which a token is replaced
+        """
+        if default not in credentials:
+            raise ValueError(f"Unknown default credential set: {default}")
+        self.default = default
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.mint_count = 0
+        self._tokens = {name: _CachedToken(ak, sk)
+                        for name, (ak, sk) in credentials.items()}
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """Names of the configured credential sets"""
+        return tuple(self._tokens)
+
+    def get_token(self, name: Optional[str] = None) -> str:
+        """Get a valid token for a credential set, minting one if needed"""
+        cached = self._tokens.get(name or self.default)
+        if not cached:
+            raise KeyError(f"Unknown credential set: {name}")
+        if not cached.ak or not cached.sk:
+            raise ValueError("Missing API credentials (ak/sk)")
+
+        token, expires_at = cached.current
+        if token and time.time() < expires_at - self.refresh_margin:
+            return token
+
+        with cached.lock:
+            token, expires_at = cached.current
+            if token and time.time() < expires_at - self.refresh_margin:
+                return token
+            now = int(time.time())
+            headers = {
+                "alg": "HS256",
+                "typ": "JWT"
+            }
+            payload = {
+                "iss": cached.ak,
+                "exp": now + self.ttl,
+                "nbf": now - 5
+            }
+            token = jwt.encode(payload, cached.sk, headers=headers)
+            cached.current = (token, now + self.ttl)
+            self.mint_count += 1
+            logger.debug(f"[Image2Video] Minted API token for credential set {name or self.default}")
+            return token
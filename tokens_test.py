@@ -0,0 +1,71 @@
+import threading
+import time
+import jwt
+import pytest
+from . import tokens
+from .tokens import TokenProvider
+
+SECRET = "test-sk-0123456789abcdef0123456789"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+def test_concurrent_callers_share_one_mint(monkeypatch):
+    encode = jwt.encode
+
+    def slow_encode(*args, **kwargs):
+        # Widen the window in which other threads find no valid token
+        time.sleep(0.05)
+        return encode(*args, **kwargs)
+
+    monkeypatch.setattr(tokens.jwt, "encode", slow_encode)
+    provider = TokenProvider({'default': ('ak', SECRET)})
+    barrier = threading.Barrier(16)
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(provider.get_token())
+
+    threads = [threading.Thread(target=call) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert provider.mint_count == 1
+    assert len(results) == 16 and len(set(results)) == 1
+
+def test_refreshes_within_margin_before_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tokens, "time", clock)
+    provider = TokenProvider({'default': ('ak', SECRET)}, ttl=1800, refresh_margin=300)
+    first = provider.get_token()
+    assert jwt.decode(first, SECRET, algorithms=["HS256"],
+                      options={'verify_exp': False, 'verify_nbf': False})['iss'] == 'ak'
+
+    clock.now += 1499
+    assert provider.get_token() == first
+    # Still valid for 300 more seconds, but inside the refresh margin
+    clock.now += 1
+    second = provider.get_token()
+    assert second != first
+    assert provider.mint_count == 2
+
+def test_credential_sets_are_independent():
+    provider = TokenProvider({'default': ('ak', SECRET), 'backup': ('ak2', SECRET)})
+    provider.get_token()
+    provider.get_token('backup')
+    provider.get_token()
+    assert provider.mint_count == 2
+    with pytest.raises(KeyError):
+        provider.get_token('missing')
+
+def test_missing_credentials_are_rejected():
+    with pytest.raises(ValueError):
+        TokenProvider({'default': ('', '')}).get_token()
+    with pytest.raises(ValueError):
+        TokenProvider({'default': ('ak', SECRET)}, default='other')
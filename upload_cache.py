@@ -0,0 +1,137 @@
+from typing import Optional, Dict, Any, Union
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from common.log import logger
+
+class UploadCache:
+    """Content-addressed cache of hosted image URLs
+
+    Maps a SHA-256 digest of the image payload and the image host to the URL
+    returned by that host, so resending the same picture skips the upload
+    entirely, while switching hosts never reuses URLs of the previous one.
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted once ``max_entries`` is reached. When ``path`` is set the cache is
+    loaded from and periodically written back to a local JSON file.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl: float = 7 * 24 * 3600,
+                 path: Optional[str] = None,
+                 save_interval: float = 60.0):
+        """Initialize cache
+
+        Args:
+            max_entries: Maximum number of cached URLs
+            ttl: Seconds a cached URL stays valid
+            path: Optional JSON file used to persist the cache
+            save_interval: Minimum seconds between two writes of the file
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+
+        # digest -> (url, size, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def key_for(data: Union[str, bytes, memoryview], backend: str = "") -> str:
+        """Compute the cache key of an image payload uploaded to ``backend``"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256()
+        if backend:
+            digest.update(backend.encode('utf-8') + b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a hosted URL, counting the hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[2] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.bytes_saved += entry[1]
+                return entry[0]
+            if entry:
+                del self._entries[key]
+                self._dirty = True
+            self.misses += 1
+            return None
+
+    def put(self, key: str, url: str, size: int = 0) -> None:
+        """Store the hosted URL of an uploaded payload"""
+        with self._lock:
+            self._entries[key] = (url, size, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            due = time.time() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the number of upload bytes saved"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_saved': self.bytes_saved
+            }
+
+    def load(self) -> None:
+        """Load persisted entries, dropping expired ones"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Image2Video] Failed to load upload cache: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, url, size, expires_at in stored.get('entries', []):
+                if expires_at > now:
+                    self._entries[key] = (url, size, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info(f"[Image2Video] Loaded {len(self._entries)} cached uploads")
+
+    def save(self) -> None:
+        """Write entries to the cache file if anything changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, url, size, expires_at]
+                       for key, (url, size, expires_at) in self._entries.items()]
+            self._dirty = False
+            self._last_save = time.time()
+        temp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'entries': entries}, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"[Image2Video] Failed to save upload cache: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,62 @@
+import json
+import time
+from .storage import HTTPFileStorage, ImgBBStorage, create_storage
+from .upload_cache import UploadCache
+
+def test_entries_expire_after_ttl():
+    cache = UploadCache(ttl=0.05)
+    cache.put("a", "http://img/a.jpg", 10)
+    assert cache.get("a") == "http://img/a.jpg"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats() == {'entries': 0, 'hits': 1, 'misses': 1, 'bytes_saved': 10}
+
+def test_least_recently_used_entry_is_evicted():
+    cache = UploadCache(max_entries=2)
+    cache.put("a", "url-a")
+    cache.put("b", "url-b")
+    assert cache.get("a") == "url-a"
+    cache.put("c", "url-c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "url-a"
+    assert cache.get("c") == "url-c"
+
+def test_persists_across_reloads(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = UploadCache(path=path, save_interval=0)
+    cache.put("a", "url-a", 5)
+    cache.put("old", "url-old")
+    # Expired entries are dropped on load
+    data = json.loads((tmp_path / "cache.json").read_text())
+    data['entries'] = [entry if entry[0] != "old" else [entry[0], entry[1], entry[2], time.time() - 1]
+                       for entry in data['entries']]
+    (tmp_path / "cache.json").write_text(json.dumps(data))
+
+    restored = UploadCache(path=path)
+    restored.load()
+    assert restored.get("a") == "url-a"
+    assert restored.get("old") is None
+
+def test_missing_or_corrupt_file_starts_empty(tmp_path):
+    missing = UploadCache(path=str(tmp_path / "missing.json"))
+    missing.load()
+    assert missing.stats()['entries'] == 0
+
+    corrupt_path = tmp_path / "corrupt.json"
+    corrupt_path.write_text("{not json")
+    corrupt = UploadCache(path=str(corrupt_path), save_interval=0)
+    corrupt.load()
+    assert corrupt.stats()['entries'] == 0
+    # The next save replaces the corrupt file
+    corrupt.put("a", "url-a")
+    assert json.loads(corrupt_path.read_text())['entries'][0][:2] == ["a", "url-a"]
+
+def test_keys_differ_per_backend():
+    data = b"same image"
+    imgbb = ImgBBStorage("key")
+    other_imgbb = ImgBBStorage("key", upload_url="https://imgbb.example.com/1/upload")
+    http = HTTPFileStorage("http://files.local/upload")
+    keys = {UploadCache.key_for(data, storage.cache_namespace)
+            for storage in (imgbb, other_imgbb, http, create_storage({'image_storage': {'backend': 'inline'}}))}
+    assert len(keys) == 4
+    assert UploadCache.key_for(data, "imgbb") == UploadCache.key_for(memoryview(data), "imgbb")
@@ -0,0 +1,189 @@
+from typing import Callable, Dict, Any, Iterator, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import os
+import re
+import threading
+from common.log import logger
+from .metrics import metrics
+
+_CACHE_FILE = re.compile(r"^[0-9a-f]{64}\.mp4$")
+
+class VideoCache:
+    """Size-capped on-disk LRU cache of generated videos
+
+    Files are named after a SHA-256 digest of their key (the task ID) and
+    only ever appear through an atomic rename, so a cached file is always
+    complete and the cache survives restarts by scanning its directory.
+    Callers use a file through ``use``, which pins it: the path is handed
+    to every chat the video goes to without copying it, and a pinned file
+    is never evicted while it is being sent. Least recently used files are
+    evicted once the total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        """Initialize cache
+
+        Args:
+            directory: Directory holding the cached files
+            max_bytes: Total size of the cached files to keep
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        # file name -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._creating: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def name_for(key: str) -> str:
+        """File name of a cache key"""
+        return hashlib.sha256(key.encode('utf-8')).hexdigest() + ".mp4"
+
+    def load(self) -> None:
+        """Index the files already in the directory, oldest access first
+
+        Partial downloads left by a previous run are deleted; they are
+        never resumed after a restart.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".part"):
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f"[Image2Video] Failed to remove partial video {entry.name}: {e}")
+            elif entry.is_file() and _CACHE_FILE.match(entry.name):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            for _, name, size in sorted(found):
+                self._entries[name] = size
+                self.total_bytes += size
+        self._evict()
+        logger.info(f"[Image2Video] Loaded {len(self._entries)} cached videos ({self.total_bytes} bytes)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached file, or None; marks it as recently used"""
+        name = self.name_for(key)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            # The modification time keeps the LRU order across restarts
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back
+            self._forget(name)
+            return None
+        return path
+
+    def add(self, key: str, path: str) -> str:
+        """Move a complete file into the cache and return its cached path
+
+        The file should be on the same filesystem as the cache directory so
+        the move is an atomic rename.
+        """
+        name = self.name_for(key)
+        target = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        os.replace(path, target)
+        size = os.path.getsize(target)
+        with self._lock:
+            self.total_bytes += size - self._entries.get(name, 0)
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+        self._evict()
+        return target
+
+    @contextmanager
+    def use(self, key: str, create: Callable[[str], str]) -> Iterator[str]:
+        """Pin the file of a key for the duration of the block, creating it on a miss
+
+        ``create`` is called with a suggested file name and returns the path
+        of the file it wrote; concurrent misses of one key call it once.
+        """
+        name = self.name_for(key)
+        self._pin(name)
+        try:
+            path = self.get(key)
+            if path is None:
+                with self._lock:
+                    creating = self._creating.setdefault(name, threading.Lock())
+                try:
+                    with creating:
+                        path = self.get(key)
+                        if path is None:
+                            with self._lock:
+                                self.misses += 1
+                            metrics.inc("video_cache_requests_total", result="miss")
+                            path = self.add(key, create(name))
+                        else:
+                            self._count_hit()
+                finally:
+                    # Also after a failed create, or every failed key would keep its lock
+                    with self._lock:
+                        self._creating.pop(name, None)
+            else:
+                self._count_hit()
+            yield path
+        finally:
+            self._unpin(name)
+        self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get entry count, size and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _count_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+        metrics.inc("video_cache_requests_total", result="hit")
+
+    def _pin(self, name: str) -> None:
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+
+    def _unpin(self, name: str) -> None:
+        with self._lock:
+            self._pins[name] -= 1
+            if not self._pins[name]:
+                del self._pins[name]
+
+    def _forget(self, name: str) -> None:
+        with self._lock:
+            self.total_bytes -= self._entries.pop(name, 0)
+
+    def _evict(self) -> None:
+        """Remove least recently used files that are not in use until under the cap"""
+        removed = []
+        with self._lock:
+            for name in list(self._entries):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if name in self._pins:
+                    continue
+                self.total_bytes -= self._entries.pop(name)
+                removed.append(name)
+        for name in removed:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"[Image2Video] Failed to remove cached video {name}: {e}")
+        if removed:
+            logger.debug(f"[Image2Video] Evicted {len(removed)} cached videos")
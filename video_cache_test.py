@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+import pytest
+from .video_cache import VideoCache
+
+def writer(directory, size, calls=None):
+    def create(name):
+        if calls is not None:
+            calls.append(name)
+        path = os.path.join(str(directory), name + ".part")
+        with open(path, 'wb') as file:
+            file.write(b'v' * size)
+        return path
+    return create
+
+def test_use_downloads_once_and_then_hits(tmp_path):
+    cache = VideoCache(str(tmp_path), max_bytes=1000)
+    calls = []
+    with cache.use("task-1", writer(tmp_path, 100, calls)) as path:
+        assert os.path.getsize(path) == 100
+    with cache.use("task-1", writer(tmp_path, 100, calls)) as again:
+        assert again == path
+    assert len(calls) == 1
+    assert cache.stats() == {'entries': 1, 'bytes': 100, 'hits': 1, 'misses': 1}
+    assert sorted(os.listdir(tmp_path)) == [VideoCache.name_for("task-1")]
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = VideoCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b"):
+        with cache.use(key, writer(tmp_path, 100)):
+            pass
+    assert cache.get("a")
+    with cache.use("c", writer(tmp_path, 100)):
+        pass
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.total_bytes == 200
+    assert not os.path.exists(tmp_path / VideoCache.name_for("b"))
+
+def test_files_in_use_are_not_evicted(tmp_path):
+    cache = VideoCache(str(tmp_path), max_bytes=150)
+    with cache.use("a", writer(tmp_path, 100)) as pinned:
+        with cache.use("b", writer(tmp_path, 100)):
+            assert os.path.exists(pinned)
+        # b was the only evictable file
+        assert cache.get("b") is None
+        assert os.path.exists(pinned)
+    assert cache.stats()['entries'] == 1
+
+def test_concurrent_misses_create_once(tmp_path):
+    cache = VideoCache(str(tmp_path))
+    calls = []
+    create = writer(tmp_path, 10, calls)
+
+    def slow_create(name):
+        time.sleep(0.1)
+        return create(name)
+
+    paths = []
+
+    def deliver():
+        with cache.use("task", slow_create) as path:
+            paths.append(path)
+
+    threads = [threading.Thread(target=deliver) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(paths)) == 1 and len(paths) == 4
+
+def test_load_restores_lru_order(tmp_path):
+    cache = VideoCache(str(tmp_path), max_bytes=1000)
+    for key in ("old", "new"):
+        with cache.use(key, writer(tmp_path, 100)):
+            pass
+    os.utime(tmp_path / VideoCache.name_for("old"), (1, 1))
+    (tmp_path / "unrelated.txt").write_text("x")
+
+    restored = VideoCache(str(tmp_path), max_bytes=150)
+    restored.load()
+    assert restored.get("old") is None
+    assert restored.get("new")
+    assert (tmp_path / "unrelated.txt").exists()
+
+def test_load_deletes_partial_downloads(tmp_path):
+    (tmp_path / (VideoCache.name_for("task-1") + ".part")).write_bytes(b'v' * 10)
+    cache = VideoCache(str(tmp_path))
+    cache.load()
+    assert os.listdir(tmp_path) == []
+    assert cache.total_bytes == 0
+
+def test_failed_create_releases_its_lock(tmp_path):
+    cache = VideoCache(str(tmp_path))
+    
+    def fail(name):
+        raise OSError("download failed")
+    
+    for key in ("a", "b"):
+        with pytest.raises(OSError):
+            with cache.use(key, fail):
+                pass
+    assert cache._creating == {}
+    assert cache.stats()['entries'] == 0
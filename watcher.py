@@ -0,0 +1,66 @@
+from typing import Callable, Optional, Tuple
+import os
+import threading
+from common.log import logger
+
+class ConfigWatcher:
+    """Calls back when a file's modification time or size changes
+
+    Polls with ``os.stat`` from a daemon thread, which works the same on
+    every platform and costs one system call per interval.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], None], interval: float = 2.0):
+        """Initialize watcher
+
+        Args:
+            path: File to watch
+            on_change: Called from the watcher thread after each change
+            interval: Seconds between checks
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stamp = self._read_stamp()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """Run the callback if the file changed since the last check"""
+        stamp = self._read_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            self.on_change()
+        except Exception as e:
+            logger.error(f"[Image2Video] Error handling change of {self.path}: {e}")
+        return True
+
+    def start(self) -> None:
+        """Start watching"""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop,
+                                        name="image2video-config-watcher",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop watching"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
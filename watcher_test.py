@@ -0,0 +1,27 @@
+import os
+from .watcher import ConfigWatcher
+
+def test_callback_runs_once_per_change(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"a": 1}')
+    calls = []
+    watcher = ConfigWatcher(str(path), lambda: calls.append(path.read_text()))
+    
+    assert not watcher.check()
+    path.write_text('{"a": 22}')
+    assert watcher.check()
+    assert not watcher.check()
+    assert calls == ['{"a": 22}']
+
+def test_missing_file_and_failing_callback_are_tolerated(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{}')
+    
+    def fail():
+        raise ValueError("bad config")
+    
+    watcher = ConfigWatcher(str(path), fail)
+    os.remove(path)
+    assert not watcher.check()
+    path.write_text('{"a": 1}')
+    assert watcher.check()